@@ -0,0 +1,600 @@
+"""Content-addressed store for uploaded images in ``assets/``.
+
+Uploads are streamed to a temporary file in the assets directory while they
+are hashed, then renamed to ``<sha256 prefix><ext>``. Names therefore never
+collide, and uploading identical bytes again (the same image pasted twice)
+returns the existing file instead of storing another copy. The directory is
+still served as-is by the ``/assets`` static mount.
+
+A small metadata index (size, MIME type, pixel dimensions, reference count,
+creation and last-use times) is kept in memory and written through to SQLite.
+Files already in the directory when the index is first created are imported
+under their existing names, so links to them keep working.
+
+``collect`` (run periodically by the server) garbage-collects from the index
+alone, without listing the directory: unreferenced assets (reference count 0,
+e.g. TinyCats slides, which are uploaded as ephemeral) are deleted once unused
+for ``ASSET_UNREFERENCED_TTL``, and while the directory is over
+``ASSET_QUOTA_BYTES`` the least recently used unreferenced assets are evicted.
+Referenced assets, and any asset used within ``ASSET_LINK_GRACE``, are never
+collected.
+
+Uploads start with one reference, and nothing tells the backend when an image
+is deleted from a note. So the server passes ``collect`` the links that
+``find_asset_links`` counts in the workspaces' text files. These replace the
+stored reference counts, and an image no note links to any more becomes
+collectable. The grace period covers images uploaded into a note that has not
+been saved yet.
+
+All methods do blocking I/O and are meant to be called off the event loop.
+
+Settings:
+    ASSETS_DIR          directory served at /assets (default "assets")
+    ASSET_INDEX_PATH    SQLite file for the metadata index (default "asset_index.sqlite3")
+    ASSET_QUOTA_BYTES   disk budget for assets (default 1 GB)
+    ASSET_UNREFERENCED_TTL  seconds an unreferenced asset is kept after its last use (default 7 days)
+    ASSET_LINK_GRACE    seconds after its last use before an asset can be collected at all (default 1 day)
+"""
+import base64
+import binascii
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+import sqlite3
+import struct
+import tempfile
+import threading
+import time
+from typing import BinaryIO, Dict, Iterable, Optional, Tuple
+from urllib.parse import unquote
+
+from search_index import SEARCH_MAX_FILE_BYTES, SKIPPED_DIRECTORIES, is_indexable
+
+ASSETS_DIR = os.getenv("ASSETS_DIR", "assets")
+ASSET_INDEX_PATH = os.getenv("ASSET_INDEX_PATH", "asset_index.sqlite3")
+ASSET_QUOTA_BYTES = int(os.getenv("ASSET_QUOTA_BYTES", str(1024 * 1024 * 1024)))
+ASSET_UNREFERENCED_TTL = float(os.getenv("ASSET_UNREFERENCED_TTL", str(7 * 24 * 3600)))
+ASSET_LINK_GRACE = float(os.getenv("ASSET_LINK_GRACE", str(24 * 3600)))
+
+HASH_NAME_LENGTH = 32  # Hex digits of the SHA-256 used in file names
+_CHUNK_SIZE = 256 * 1024
+_TEMP_PREFIX = ".upload-"
+_TEMP_SUFFIX = ".tmp"
+_EPHEMERAL_PREFIXES = ("tinycats_",)  # Legacy generated images, collectable like ephemeral uploads
+_TOUCH_PERSIST_INTERVAL = 3600  # Seconds between index writes for reads of the same asset
+_EXTENSION_RE = re.compile(r"^\.[a-z0-9]{1,8}$")
+# "/assets/<name>" in a note, whether a relative link or http://host/assets/<name>
+_LINK_RE = re.compile(rb"/assets/([^\s\"'()<>?#\\/]+)")
+_MIME_EXTENSIONS = {
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+    "image/gif": ".gif",
+    "image/webp": ".webp",
+    "image/bmp": ".bmp",
+    "image/svg+xml": ".svg",
+}
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+# --- Image probing ---
+
+def _jpeg_size(f: BinaryIO) -> Optional[Tuple[int, int]]:
+    """Walk JPEG segments up to the frame header; only segment headers are read"""
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        while byte and byte != b"\xff":
+            byte = f.read(1)
+        while byte == b"\xff":
+            byte = f.read(1)
+        if not byte:
+            return None
+        marker = byte[0]
+        if marker in (0xD9, 0xDA):
+            return None  # End of image, or scan data before any frame header
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            continue  # Markers without a length
+        header = f.read(2)
+        if len(header) < 2:
+            return None
+        length = struct.unpack(">H", header)[0]
+        if marker in _JPEG_SOF_MARKERS:
+            frame = f.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack(">HH", frame[1:5])
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def probe_image(path: str) -> Tuple[Optional[str], Optional[int], Optional[int]]:
+    """(MIME type, width, height) of an image file from its header; None where unknown"""
+    with open(path, "rb") as f:
+        head = f.read(64)
+        if head.startswith(b"\x89PNG\r\n\x1a\n") and len(head) >= 24:
+            width, height = struct.unpack(">II", head[16:24])
+            return "image/png", width, height
+        if head[:6] in (b"GIF87a", b"GIF89a") and len(head) >= 10:
+            width, height = struct.unpack("<HH", head[6:10])
+            return "image/gif", width, height
+        if head[:4] == b"RIFF" and head[8:12] == b"WEBP" and len(head) >= 30:
+            chunk = head[12:16]
+            if chunk == b"VP8 ":
+                width, height = struct.unpack("<HH", head[26:30])
+                return "image/webp", width & 0x3FFF, height & 0x3FFF
+            if chunk == b"VP8L":
+                bits = struct.unpack("<I", head[21:25])[0]
+                return "image/webp", (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+            if chunk == b"VP8X":
+                width = int.from_bytes(head[24:27], "little") + 1
+                height = int.from_bytes(head[27:30], "little") + 1
+                return "image/webp", width, height
+            return "image/webp", None, None
+        if head[:2] == b"BM" and len(head) >= 26:
+            width, height = struct.unpack("<ii", head[18:26])
+            return "image/bmp", width, abs(height)
+        if head[:2] == b"\xff\xd8":
+            try:
+                size = _jpeg_size(f)
+            except (OSError, struct.error):
+                size = None
+            return ("image/jpeg",) + (size or (None, None))
+        f.seek(0)
+        if b"<svg" in f.read(4096).lower():
+            return "image/svg+xml", None, None
+    return None, None, None
+
+
+def _extension_for(mime: Optional[str], original_name: Optional[str]) -> str:
+    if mime in _MIME_EXTENSIONS:
+        return _MIME_EXTENSIONS[mime]
+    extension = os.path.splitext(original_name or "")[1].lower()
+    if _EXTENSION_RE.match(extension):
+        return extension
+    return mimetypes.guess_extension(mime or "") or ".bin"
+
+
+# --- Incremental base64 decoding ---
+
+class Base64StreamDecoder:
+    """Decodes base64 text that arrives in arbitrary pieces, holding back at most 3 characters.
+
+    Whitespace is ignored and a leading ``data:<mime>;base64,`` prefix (as
+    produced by canvas ``toDataURL``) is skipped. Raises ``ValueError`` on
+    anything that is not base64.
+    """
+
+    _PREFIX_LIMIT = 256
+    _WHITESPACE = b" \t\r\n"
+
+    def __init__(self):
+        self._pending = b""
+        self._started = False
+
+    def feed(self, chunk: bytes) -> bytes:
+        data = self._pending + chunk.translate(None, self._WHITESPACE)
+        if not self._started:
+            if data.startswith(b"data:"[:len(data)]) and len(data) < len(b"data:"):
+                self._pending = data  # Too short yet to tell whether a prefix follows
+                return b""
+            if data.startswith(b"data:"):
+                comma = data.find(b",", 0, self._PREFIX_LIMIT)
+                if comma < 0:
+                    if len(data) >= self._PREFIX_LIMIT:
+                        raise ValueError("Malformed data URL")
+                    self._pending = data
+                    return b""
+                data = data[comma + 1:]
+            self._started = True
+        usable = len(data) - len(data) % 4
+        self._pending = data[usable:]
+        return self._decode(data[:usable])
+
+    def finish(self) -> bytes:
+        if self._pending and not self._started:
+            raise ValueError("Malformed data URL")
+        pending, self._pending = self._pending, b""
+        if len(pending) % 4:
+            pending += b"=" * (-len(pending) % 4)  # Tolerate missing padding
+        return self._decode(pending)
+
+    @staticmethod
+    def _decode(data: bytes) -> bytes:
+        try:
+            return base64.b64decode(data, validate=True)
+        except binascii.Error as e:
+            raise ValueError(f"Invalid base64 data: {e}") from e
+
+
+def decode_base64_file(text: str, path: str):
+    """Decode base64 text (or a ``data:`` URL) into ``path`` a chunk at a time"""
+    decoder = Base64StreamDecoder()
+    try:
+        with open(path, "wb") as f:
+            for start in range(0, len(text), _CHUNK_SIZE):
+                # Non-ASCII text raises UnicodeEncodeError, a ValueError like the decoder's own
+                f.write(decoder.feed(text[start:start + _CHUNK_SIZE].encode("ascii")))
+            f.write(decoder.finish())
+    except BaseException:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+# --- Store ---
+
+class AssetWriter:
+    """An upload in progress: chunks go to a temporary file and into the hash.
+
+    ``write`` as data arrives, then ``commit`` to move the file into place
+    under its content name (or drop it as a duplicate), or ``abort``.
+    """
+
+    def __init__(self, store: "AssetStore"):
+        self.store = store
+        self.size = 0
+        self._digest = hashlib.sha256()
+        fd, self.temp_path = tempfile.mkstemp(prefix=_TEMP_PREFIX, suffix=_TEMP_SUFFIX, dir=store.directory)
+        self._file = os.fdopen(fd, "wb")
+
+    def write(self, chunk: bytes):
+        if chunk:
+            self._digest.update(chunk)
+            self._file.write(chunk)
+            self.size += len(chunk)
+
+    def commit(self, original_name: Optional[str] = None, mime: Optional[str] = None, reference: bool = True) -> dict:
+        self._file.close()
+        try:
+            return self.store._commit(self.temp_path, self._digest.hexdigest(), self.size, original_name, mime,
+                                      reference)
+        finally:
+            self._remove_temp()
+
+    def abort(self):
+        self._file.close()
+        self._remove_temp()
+
+    def _remove_temp(self):
+        try:
+            os.remove(self.temp_path)
+        except FileNotFoundError:
+            pass
+
+
+# --- References ---
+
+def find_asset_links(roots: Iterable[str]) -> Optional[Dict[str, int]]:
+    """Count links to ``/assets/<name>`` in the text files under ``roots``, by asset name.
+
+    Returns None when there is no root or one is missing (e.g. an unmounted
+    drive): links kept there cannot be seen, and counting without them could
+    make images that are still in use collectable.
+    """
+    roots = list(roots)
+    missing = [root for root in roots if not os.path.isdir(root)]
+    if not roots or missing:
+        if missing:
+            logging.warning(f"Not counting asset links: workspace {missing[0]} is not available")
+        return None
+    links: Dict[str, int] = {}
+    for root in roots:
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if d not in SKIPPED_DIRECTORIES and not d.startswith(".")]
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                if not is_indexable(os.path.relpath(path, root)):
+                    continue
+                try:
+                    if os.path.getsize(path) > SEARCH_MAX_FILE_BYTES:
+                        continue
+                    with open(path, "rb") as f:
+                        data = f.read()
+                except OSError:
+                    continue
+                for match in _LINK_RE.finditer(data):
+                    name = unquote(match.group(1).decode("utf-8", "replace"))
+                    links[name] = links.get(name, 0) + 1
+    return links
+
+
+class AssetStore:
+    """Deduplicating, content-named image store with a write-through metadata index"""
+
+    def __init__(self, directory: str = ASSETS_DIR, index_path: Optional[str] = ASSET_INDEX_PATH,
+                 quota_bytes: int = ASSET_QUOTA_BYTES, unreferenced_ttl: float = ASSET_UNREFERENCED_TTL,
+                 link_grace: float = ASSET_LINK_GRACE):
+        self.directory = os.path.abspath(directory)  # Requests may resolve paths after a chdir
+        self.index_path = index_path
+        self.quota_bytes = quota_bytes
+        self.unreferenced_ttl = unreferenced_ttl
+        self.link_grace = link_grace
+        self.last_collection: Optional[dict] = None
+        # name -> {"name", "sha256", "size", "mime_type", "width", "height", "refcount", "created", "last_used"}
+        self._assets: Dict[str, dict] = {}
+        self._by_hash: Dict[str, str] = {}
+        self._persisted_use: Dict[str, float] = {}  # name -> last use time written by touch()
+        self._total_bytes = 0
+        self._lock = threading.RLock()
+        self._db: Optional[sqlite3.Connection] = None
+        os.makedirs(directory, exist_ok=True)
+        self._remove_stale_temp_files()
+        self._open_index()
+
+    # --- Index ---
+
+    def _open_index(self):
+        created = True
+        if self.index_path:
+            try:
+                created = not os.path.exists(self.index_path)
+                self._db = sqlite3.connect(self.index_path, check_same_thread=False, isolation_level=None)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS assets ("
+                    " name TEXT PRIMARY KEY, sha256 TEXT NOT NULL, size INTEGER NOT NULL, mime_type TEXT,"
+                    " width INTEGER, height INTEGER, refcount INTEGER NOT NULL,"
+                    " created REAL NOT NULL, last_used REAL NOT NULL)"
+                )
+                rows = self._db.execute(
+                    "SELECT name, sha256, size, mime_type, width, height, refcount, created, last_used FROM assets"
+                ).fetchall()
+            except sqlite3.Error as e:
+                logging.error(f"Could not open asset index {self.index_path}: {e}", exc_info=True)
+                self._db = None
+                rows = []
+            for row in rows:
+                entry = dict(zip(("name", "sha256", "size", "mime_type", "width", "height", "refcount",
+                                  "created", "last_used"), row))
+                if os.path.exists(os.path.join(self.directory, entry["name"])):
+                    self._add(entry)
+                else:
+                    self._unpersist(entry["name"])
+        if created or not self._db:
+            self._import_existing()
+
+    def _import_existing(self):
+        """Index files that were in the directory before the index existed (done once)"""
+        imported = 0
+        with os.scandir(self.directory) as it:
+            for item in it:
+                if not item.is_file() or item.name.startswith(".") or item.name in self._assets:
+                    continue
+                if self.adopt(item.name) is not None:
+                    imported += 1
+        if imported:
+            logging.info(f"Indexed {imported} existing assets in {self.directory}")
+
+    def _remove_stale_temp_files(self):
+        with os.scandir(self.directory) as it:
+            for item in it:
+                if item.name.startswith(_TEMP_PREFIX) and item.name.endswith(_TEMP_SUFFIX):
+                    try:
+                        os.remove(item.path)
+                    except OSError:
+                        pass
+
+    def _persist(self, entry: dict):
+        if not self._db:
+            return
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO assets (name, sha256, size, mime_type, width, height, refcount, created,"
+                " last_used) VALUES (:name, :sha256, :size, :mime_type, :width, :height, :refcount, :created,"
+                " :last_used)", entry,
+            )
+        except sqlite3.Error as e:
+            logging.error(f"Could not update asset index for {entry['name']}: {e}", exc_info=True)
+
+    def _unpersist(self, name: str):
+        if not self._db:
+            return
+        try:
+            self._db.execute("DELETE FROM assets WHERE name = ?", (name,))
+        except sqlite3.Error as e:
+            logging.error(f"Could not remove {name} from the asset index: {e}", exc_info=True)
+
+    def adopt(self, name: str) -> Optional[dict]:
+        """Index a file that was written into the directory by other means, under its own name"""
+        path = os.path.join(self.directory, name)
+        try:
+            digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(_CHUNK_SIZE), b""):
+                    digest.update(block)
+            stats = os.stat(path)
+            mime, width, height = probe_image(path)
+        except OSError as e:
+            logging.warning(f"Could not index asset {name}: {e}")
+            return None
+        entry = {
+            "name": name, "sha256": digest.hexdigest(), "size": stats.st_size,
+            "mime_type": mime or mimetypes.guess_type(name)[0], "width": width, "height": height,
+            "refcount": 0 if name.startswith(_EPHEMERAL_PREFIXES) else 1,
+            "created": stats.st_mtime, "last_used": stats.st_mtime,
+        }
+        with self._lock:
+            previous = self._assets.get(name)
+            if previous:
+                self._discard(previous)
+            self._add(entry)
+            self._persist(entry)
+        return dict(entry)
+
+    def _add(self, entry: dict):
+        self._assets[entry["name"]] = entry
+        self._by_hash.setdefault(entry["sha256"], entry["name"])
+        self._total_bytes += entry["size"]
+
+    def _discard(self, entry: dict):
+        del self._assets[entry["name"]]
+        self._persisted_use.pop(entry["name"], None)
+        if self._by_hash.get(entry["sha256"]) == entry["name"]:
+            del self._by_hash[entry["sha256"]]
+        self._total_bytes -= entry["size"]
+
+    # --- Writing ---
+
+    def open_writer(self) -> AssetWriter:
+        return AssetWriter(self)
+
+    def put_file(self, source: BinaryIO, original_name: Optional[str] = None, mime: Optional[str] = None,
+                 reference: bool = True) -> dict:
+        """Store the contents of a file object; returns the asset entry (see ``_commit``)"""
+        writer = self.open_writer()
+        try:
+            for chunk in iter(lambda: source.read(_CHUNK_SIZE), b""):
+                writer.write(chunk)
+        except BaseException:
+            writer.abort()
+            raise
+        return writer.commit(original_name, mime, reference)
+
+    def _commit(self, temp_path: str, content_hash: str, size: int, original_name: Optional[str],
+                mime: Optional[str], reference: bool = True) -> dict:
+        """Move an uploaded temp file into place, or count a reference to the identical existing asset.
+
+        Without ``reference`` the upload is ephemeral: it does not add to the
+        reference count and may be collected once unused. The returned entry
+        carries ``deduplicated``: True if the bytes were already stored.
+        """
+        now = time.time()
+        with self._lock:
+            existing = self._by_hash.get(content_hash)
+            if existing and existing in self._assets:
+                entry = self._assets[existing]
+                entry["refcount"] += 1 if reference else 0
+                entry["last_used"] = now
+                self._persist(entry)
+                return {**entry, "deduplicated": True}
+
+            probed_mime, width, height = probe_image(temp_path)
+            mime = probed_mime or (mime if mime and mime != "application/octet-stream" else None) \
+                or mimetypes.guess_type(original_name or "")[0]
+            name = f"{content_hash[:HASH_NAME_LENGTH]}{_extension_for(mime, original_name)}"
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, os.path.join(self.directory, name))
+            entry = {
+                "name": name, "sha256": content_hash, "size": size, "mime_type": mime,
+                "width": width, "height": height, "refcount": 1 if reference else 0,
+                "created": now, "last_used": now,
+            }
+            self._add(entry)
+            self._persist(entry)
+            return {**entry, "deduplicated": False}
+
+    # --- Reading and references ---
+
+    def get(self, name: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._assets.get(name)
+            return dict(entry) if entry else None
+
+    def touch(self, name: str):
+        """Mark an asset as used now (e.g. it was served); the index is updated at most hourly"""
+        now = time.time()
+        with self._lock:
+            entry = self._assets.get(name)
+            if entry:
+                entry["last_used"] = now
+                if now - self._persisted_use.get(name, 0) >= _TOUCH_PERSIST_INTERVAL:
+                    self._persisted_use[name] = now
+                    self._persist(entry)
+
+    def release(self, name: str) -> Optional[dict]:
+        """Drop one reference to an asset; the file itself stays until it is collected.
+
+        When the server collects with link counts, the next collection
+        replaces this count with the number of links found.
+        """
+        with self._lock:
+            entry = self._assets.get(name)
+            if entry is None:
+                return None
+            entry["refcount"] = max(0, entry["refcount"] - 1)
+            self._persist(entry)
+            return dict(entry)
+
+    # --- Garbage collection ---
+
+    def _apply_links(self, links: Dict[str, int]):
+        for entry in self._assets.values():
+            count = links.get(entry["name"], 0)
+            if entry["refcount"] != count:
+                entry["refcount"] = count
+                self._persist(entry)
+
+    def collect(self, links: Optional[Dict[str, int]] = None) -> dict:
+        """Delete expired and, while over quota, least recently used unreferenced assets.
+
+        ``links`` (from ``find_asset_links``) first replaces every asset's
+        reference count. Works from the index only. Returns a report of what
+        was reclaimed, which is also kept as ``last_collection``.
+        """
+        started = time.time()
+        with self._lock:
+            if links is not None:
+                self._apply_links(links)
+            unreferenced = sorted((entry for entry in self._assets.values()
+                                   if entry["refcount"] == 0 and started - entry["last_used"] >= self.link_grace),
+                                  key=lambda entry: entry["last_used"])
+            expired = [entry for entry in unreferenced if started - entry["last_used"] >= self.unreferenced_ttl]
+            victims = {entry["name"]: "expired" for entry in expired}
+            remaining = self._total_bytes - sum(entry["size"] for entry in expired)
+            for entry in unreferenced:
+                if remaining <= self.quota_bytes:
+                    break
+                if entry["name"] not in victims:
+                    victims[entry["name"]] = "quota"
+                    remaining -= entry["size"]
+            removed = []
+            for name, reason in victims.items():
+                entry = self._assets[name]
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logging.warning(f"Could not delete asset {name}: {e}")
+                    continue
+                self._discard(entry)
+                self._unpersist(name)
+                removed.append({"name": name, "size": entry["size"], "reason": reason})
+            report = {
+                "collected_at": started,
+                "removed": len(removed),
+                "bytes_reclaimed": sum(item["size"] for item in removed),
+                "expired": sum(1 for item in removed if item["reason"] == "expired"),
+                "evicted_for_quota": sum(1 for item in removed if item["reason"] == "quota"),
+                "bytes_in_use": self._total_bytes,
+                "quota_bytes": self.quota_bytes,
+                "over_quota": self._total_bytes > self.quota_bytes,
+                "links_counted": links is not None,
+                "duration_ms": round((time.time() - started) * 1000, 2),
+                "assets": removed[:100],
+            }
+            self.last_collection = report
+        if report["over_quota"]:
+            logging.warning(f"Assets use {self._total_bytes} bytes, over the {self.quota_bytes} byte quota, "
+                            f"and nothing more can be collected")
+        return report
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "assets": len(self._assets),
+                "bytes": self._total_bytes,
+                "quota_bytes": self.quota_bytes,
+                "unreferenced": sum(1 for entry in self._assets.values() if entry["refcount"] == 0),
+                "last_collection": self.last_collection,
+            }
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,141 @@
+"""Benchmark the HTML extraction engines over a corpus of saved pages.
+
+Run from src/backend:
+
+    python benchmarks/extract_benchmark.py [CORPUS_DIR] [--fetch URL ...] [--repeat N]
+
+Every ``*.html`` / ``*.htm`` file in CORPUS_DIR (default
+benchmarks/html_corpus) is extracted by each available engine. ``--fetch``
+first saves the given pages into the corpus, so a realistic corpus can be
+built once and re-used offline. If the corpus is empty, synthetic pages of
+increasing size are generated instead.
+
+For each engine the report gives total time, per-page median and p95,
+throughput, speed-up against the BeautifulSoup engine and how many pages
+differ from its output (field by field).
+"""
+import argparse
+import hashlib
+import os
+import random
+import statistics
+import sys
+import time
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from web_extract import available_engines, extract_page  # noqa: E402
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "html_corpus")
+FIELDS = ("title", "description", "text", "main_content", "links")
+REFERENCE_ENGINE = "bs4"
+
+
+def fetch_pages(urls, corpus_dir):
+    import requests
+    os.makedirs(corpus_dir, exist_ok=True)
+    for url in urls:
+        try:
+            response = requests.get(url, headers={"User-Agent": "Mozilla/5.0 (scribe extract benchmark)"}, timeout=30)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            print(f"  skipped {url}: {e}")
+            continue
+        host = urlparse(url).hostname or "page"
+        name = f"{host}-{hashlib.sha256(url.encode()).hexdigest()[:10]}.html"
+        with open(os.path.join(corpus_dir, name), "w", encoding="utf-8") as f:
+            f.write(response.text)
+        print(f"  saved {url} -> {name} ({len(response.text) // 1024} KB)")
+
+
+def synthetic_page(paragraphs: int, rng: random.Random) -> str:
+    words = ["scribe", "workspace", "notes", "video", "canvas", "gemini", "editor", "files", "search", "the",
+             "a", "of", "and", "to", "in", "with", "for", "page", "content", "&amp;", "caf&eacute;"]
+    body = []
+    for number in range(paragraphs):
+        sentence = " ".join(rng.choice(words) for _ in range(rng.randint(20, 60)))
+        body.append(f'<p class="para">{sentence}  <a href="/page/{number}">more</a> <b>{number}</b></p>')
+        if number % 10 == 0:
+            body.append(f'<script>var x{number} = "<p>not text</p>";</script><!-- comment {number} -->')
+    return (
+        "<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>Synthetic page</title>"
+        "<meta name=\"description\" content=\"Generated for the extraction benchmark\">"
+        "<style>p { color: red; }</style></head><body>"
+        "<nav><a href=\"/\">Home</a> | <a href=\"/about\">About</a></nav>"
+        f"<div id=\"content\"><article><h1>Heading</h1>{''.join(body)}</article></div>"
+        "<footer>Footer text<br>line two</footer></body></html>"
+    )
+
+
+def load_corpus(corpus_dir):
+    pages = []
+    if os.path.isdir(corpus_dir):
+        for name in sorted(os.listdir(corpus_dir)):
+            if name.lower().endswith((".html", ".htm")):
+                with open(os.path.join(corpus_dir, name), encoding="utf-8", errors="replace") as f:
+                    pages.append((name, f.read()))
+    if not pages:
+        print(f"No saved pages in {corpus_dir}; using synthetic pages")
+        rng = random.Random(42)
+        pages = [(f"synthetic-{size}.html", synthetic_page(size, rng)) for size in (10, 50, 200, 1000, 3000)]
+    return pages
+
+
+def run_engine(engine, pages, repeat):
+    timings = []
+    outputs = []
+    for _, html in pages:
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = extract_page(html, include_links=True, engine=engine)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        timings.append(best)
+        outputs.append(result)
+    return timings, outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("corpus", nargs="?", default=DEFAULT_CORPUS, help="directory of saved HTML pages")
+    parser.add_argument("--fetch", nargs="+", metavar="URL", help="save these pages into the corpus first")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per page; the fastest is kept")
+    parser.add_argument("--engines", nargs="+", help="engines to compare (default: all available)")
+    args = parser.parse_args()
+
+    if args.fetch:
+        print(f"Fetching {len(args.fetch)} pages into {args.corpus}")
+        fetch_pages(args.fetch, args.corpus)
+    pages = load_corpus(args.corpus)
+    total_bytes = sum(len(html.encode("utf-8")) for _, html in pages)
+    engines = args.engines or available_engines()
+    print(f"{len(pages)} pages, {total_bytes / 1024 / 1024:.2f} MB; engines: {', '.join(engines)}\n")
+
+    results = {engine: run_engine(engine, pages, max(1, args.repeat)) for engine in engines}
+    reference = results.get(REFERENCE_ENGINE)
+
+    print(f"{'engine':<8} {'total ms':>10} {'median ms':>10} {'p95 ms':>9} {'MB/s':>8} {'speed-up':>9}  differs")
+    for engine, (timings, outputs) in results.items():
+        total = sum(timings)
+        ordered = sorted(timings)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        speedup = f"{sum(reference[0]) / total:.1f}x" if reference and total else "-"
+        differs = "-"
+        if reference and engine != REFERENCE_ENGINE:
+            mismatched = {}
+            for name_output, expected in zip(outputs, reference[1]):
+                for field in FIELDS:
+                    if name_output.get(field) != expected.get(field):
+                        mismatched[field] = mismatched.get(field, 0) + 1
+            differs = ", ".join(f"{field}: {count}" for field, count in mismatched.items()) or "none"
+        print(f"{engine:<8} {total * 1000:>10.1f} {statistics.median(timings) * 1000:>10.2f} {p95 * 1000:>9.2f} "
+              f"{total_bytes / 1024 / 1024 / total if total else 0:>8.2f} {speedup:>9}  {differs}")
+
+    slowest = sorted(zip(results[engines[0]][0], (name for name, _ in pages)), reverse=True)[:3]
+    print(f"\nSlowest pages ({engines[0]}): " + ", ".join(f"{name} ({ms * 1000:.1f} ms)" for ms, name in slowest))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,380 @@
+"""Local stand-ins for Gemini, Groq, web sites and the log server, with injectable latency.
+
+The load benchmark points the real SDKs at these servers, so a run exercises
+the backend's request building, streaming and response parsing without
+network access or API keys:
+
+    gemini  google.generativeai over REST (GEMINI_API_ENDPOINT) and google.genai
+            (GOOGLE_GEMINI_BASE_URL): generateContent, streamGenerateContent
+            (JSON array or SSE) and the resumable Files API upload
+    groq    OpenAI-style /openai/v1/chat/completions (GROQ_BASE_URL)
+    web     a synthetic site: /page/<n> articles linking to each other, with
+            Cache-Control and ETag so the backend's HTTP cache can be exercised
+    log     the log server's /log and gzip /log/batch endpoints (LOG_SERVER_URL)
+
+Every response waits ``base + uniform(0, jitter)`` seconds first; streamed
+responses spread that over ``chunks`` pieces. Run standalone to keep the
+services up for manual testing:
+
+    python benchmarks/fake_services.py [--gemini-latency S] [--groq-latency S] [--web-latency S] [--jitter S]
+"""
+import argparse
+import gzip
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlparse
+from uuid import uuid4
+
+ANSWER_WORDS = ("scribe", "notes", "canvas", "answer", "the", "workspace", "of", "summary", "and", "a", "document")
+
+
+@dataclass
+class Latency:
+    """Delay injected before (and, when streaming, between parts of) each response"""
+    base: float = 0.0
+    jitter: float = 0.0
+    chunks: int = 5  # Parts a streamed response is split into
+
+    def delay(self, rng: random.Random) -> float:
+        return self.base + (rng.uniform(0, self.jitter) if self.jitter else 0.0)
+
+
+class FakeService:
+    """Threaded HTTP server on 127.0.0.1 with request counting"""
+
+    name = "service"
+
+    def __init__(self, latency: Optional[Latency] = None, seed: int = 0):
+        self.latency = latency or Latency()
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                service._dispatch(self, "GET")
+
+            def do_POST(self):
+                service._dispatch(self, "POST")
+
+            def do_DELETE(self):
+                service._dispatch(self, "DELETE")
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self) -> "FakeService":
+        self._thread = threading.Thread(target=self.server.serve_forever, name=f"fake-{self.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def sleep(self):
+        with self._lock:
+            delay = self.latency.delay(self._rng)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _dispatch(self, handler: BaseHTTPRequestHandler, method: str):
+        with self._lock:
+            self.requests += 1
+        length = int(handler.headers.get("Content-Length") or 0)
+        body = handler.rfile.read(length) if length else b""
+        try:
+            self.handle(handler, method, urlparse(handler.path), body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def handle(self, handler, method, url, body):
+        raise NotImplementedError
+
+    # --- Response helpers ---
+
+    @staticmethod
+    def send(handler, status: int, body: bytes, content_type: str = "application/json",
+             headers: Optional[Dict[str, str]] = None):
+        handler.send_response(status)
+        handler.send_header("Content-Type", content_type)
+        handler.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def send_json(self, handler, payload, status: int = 200, headers: Optional[Dict[str, str]] = None):
+        self.send(handler, status, json.dumps(payload).encode("utf-8"), headers=headers)
+
+    @staticmethod
+    def start_chunked(handler, content_type: str):
+        handler.send_response(200)
+        handler.send_header("Content-Type", content_type)
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.end_headers()
+
+    @staticmethod
+    def write_chunk(handler, data: bytes):
+        handler.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        handler.wfile.flush()
+
+    def answer_text(self, words: int = 40) -> str:
+        with self._lock:
+            return " ".join(self._rng.choice(ANSWER_WORDS) for _ in range(words)) + "."
+
+
+class FakeGemini(FakeService):
+    name = "gemini"
+
+    def __init__(self, latency: Optional[Latency] = None, seed: int = 0):
+        super().__init__(latency, seed)
+        self.files: Dict[str, dict] = {}
+        self.uploads = 0
+
+    @staticmethod
+    def _response(text: str, prompt_tokens: int, final: bool = True) -> dict:
+        candidate = {"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}
+        if final:
+            candidate["finishReason"] = "STOP"
+        return {
+            "candidates": [candidate],
+            "usageMetadata": {
+                "promptTokenCount": prompt_tokens,
+                "candidatesTokenCount": len(text.split()),
+                "totalTokenCount": prompt_tokens + len(text.split()),
+            },
+        }
+
+    def handle(self, handler, method, url, body):
+        path = url.path
+        query = parse_qs(url.query)
+        if path.startswith("/upload/") and path.endswith("/files"):
+            return self._start_upload(handler, body)
+        if path.startswith("/upload-session/"):
+            return self._finish_upload(handler, path.rsplit("/", 1)[-1], body)
+        match = re.match(r"^/v1\w*/(files/[\w-]+)$", path)
+        if match:
+            name = match.group(1)
+            if method == "DELETE":
+                self.files.pop(name, None)
+                return self.send_json(handler, {})
+            if name in self.files:
+                return self.send_json(handler, self.files[name])
+            return self.send_json(handler, {"error": {"code": 404, "message": "File not found"}}, status=404)
+        match = re.match(r"^/v1\w*/models/([^:]+):(generateContent|streamGenerateContent)$", path)
+        if not match:
+            return self.send_json(handler, {"error": {"code": 404, "message": f"Unknown path {path}"}}, status=404)
+        prompt_tokens = max(1, len(body) // 4)
+        text = self.answer_text()
+        if match.group(2) == "generateContent":
+            self.sleep()
+            return self.send_json(handler, self._response(text, prompt_tokens))
+        self._stream(handler, text, prompt_tokens, sse=query.get("alt", [""])[0] == "sse")
+
+    def _stream(self, handler, text: str, prompt_tokens: int, sse: bool):
+        words = text.split(" ")
+        parts = max(1, min(self.latency.chunks, len(words)))
+        size = -(-len(words) // parts)
+        pieces = [" ".join(words[i:i + size]) + " " for i in range(0, len(words), size)]
+        with self._lock:
+            delay = self.latency.delay(self._rng)
+        self.start_chunked(handler, "text/event-stream" if sse else "application/json")
+        if not sse:
+            self.write_chunk(handler, b"[")
+        for number, piece in enumerate(pieces):
+            time.sleep(delay / len(pieces))
+            payload = json.dumps(self._response(piece, prompt_tokens, final=number == len(pieces) - 1))
+            if sse:
+                data = f"data: {payload}\r\n\r\n"
+            else:
+                data = ("," if number else "") + payload
+            self.write_chunk(handler, data.encode("utf-8"))
+        if not sse:
+            self.write_chunk(handler, b"]")
+        self.write_chunk(handler, b"")
+
+    def _start_upload(self, handler, body):
+        try:
+            metadata = json.loads(body or b"{}").get("file", {})
+        except ValueError:
+            metadata = {}
+        session = uuid4().hex
+        self.files[f"pending/{session}"] = metadata
+        self.send_json(handler, {}, headers={
+            "X-Goog-Upload-URL": f"{self.url}/upload-session/{session}",
+            "X-Goog-Upload-Status": "active",
+        })
+
+    def _finish_upload(self, handler, session, body):
+        self.sleep()
+        metadata = self.files.pop(f"pending/{session}", {})
+        name = f"files/{uuid4().hex[:12]}"
+        expires = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() + 48 * 3600))
+        record = {
+            "name": name,
+            "displayName": metadata.get("displayName", name),
+            "mimeType": metadata.get("mimeType") or handler.headers.get("X-Goog-Upload-Header-Content-Type") or "image/png",
+            "sizeBytes": str(len(body)),
+            "uri": f"{self.url}/v1beta/{name}",
+            "state": "ACTIVE",
+            "expirationTime": expires,
+        }
+        self.files[name] = record
+        self.uploads += 1
+        self.send_json(handler, {"file": record}, headers={"X-Goog-Upload-Status": "final"})
+
+
+class FakeGroq(FakeService):
+    name = "groq"
+
+    def handle(self, handler, method, url, body):
+        if not url.path.endswith("/chat/completions"):
+            return self.send_json(handler, {"error": {"message": f"Unknown path {url.path}"}}, status=404)
+        request = json.loads(body or b"{}")
+        self.sleep()
+        text = self.answer_text(60)
+        prompt_tokens = max(1, len(body) // 4)
+        self.send_json(handler, {
+            "id": f"chatcmpl-{uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "fake"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(text.split()),
+                      "total_tokens": prompt_tokens + len(text.split())},
+        })
+
+
+class FakeWeb(FakeService):
+    """Synthetic site: ``/page/<n>`` articles (cacheable for ``max_age`` seconds) linking to each other"""
+
+    name = "web"
+
+    def __init__(self, latency: Optional[Latency] = None, seed: int = 0, pages: int = 1000,
+                 paragraphs: int = 60, max_age: int = 300):
+        super().__init__(latency, seed)
+        self.pages = pages
+        self.paragraphs = paragraphs
+        self.max_age = max_age
+
+    def page(self, number: int) -> str:
+        rng = random.Random(number)
+        body = []
+        for index in range(self.paragraphs):
+            sentence = " ".join(rng.choice(ANSWER_WORDS) for _ in range(rng.randint(20, 50)))
+            link = rng.randrange(self.pages)
+            body.append(f'<p>{sentence} <a href="/page/{link}">related {link}</a></p>')
+        return (
+            f"<!DOCTYPE html><html><head><title>Page {number}</title>"
+            f'<meta name="description" content="Synthetic page {number}">'
+            "<style>p { margin: 0 }</style><script>var tracking = 1;</script></head><body>"
+            '<nav><a href="/">Home</a> <a href="/page/0">First</a></nav>'
+            f"<main><article><h1>Page {number}</h1>{''.join(body)}</article></main>"
+            "<footer>Footer</footer></body></html>"
+        )
+
+    def handle(self, handler, method, url, body):
+        match = re.match(r"^/page/(\d+)$", url.path)
+        if url.path == "/":
+            number = 0
+        elif match:
+            number = int(match.group(1))
+        else:
+            return self.send(handler, 404, b"Not found", "text/plain")
+        etag = f'"page-{number}"'
+        if handler.headers.get("If-None-Match") == etag:
+            self.sleep()
+            return self.send(handler, 304, b"", headers={"ETag": etag})
+        self.sleep()
+        cache = "no-cache" if parse_qs(url.query).get("nocache") else f"max-age={self.max_age}"
+        self.send(handler, 200, self.page(number).encode("utf-8"), "text/html; charset=utf-8",
+                  headers={"Cache-Control": cache, "ETag": etag})
+
+
+class FakeLogServer(FakeService):
+    """Accepts the log server's single and gzip batch endpoints and counts the records"""
+
+    name = "log"
+
+    def __init__(self, latency: Optional[Latency] = None, seed: int = 0):
+        super().__init__(latency, seed)
+        self.records = 0
+
+    def handle(self, handler, method, url, body):
+        if handler.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        payload = json.loads(body or b"{}")
+        self.sleep()
+        if url.path == "/log/batch":
+            accepted = len(payload.get("logs") or [])
+        elif url.path == "/log":
+            accepted = 1 if payload.get("log") else 0
+        else:
+            return self.send_json(handler, {"error": "Unknown path"}, status=404)
+        with self._lock:
+            self.records += accepted
+        self.send_json(handler, {"success": True, "accepted": accepted})
+
+
+def start_services(gemini: Latency, groq: Latency, web: Latency, log: Latency, seed: int = 0) -> Dict[str, FakeService]:
+    return {
+        "gemini": FakeGemini(gemini, seed).start(),
+        "groq": FakeGroq(groq, seed + 1).start(),
+        "web": FakeWeb(web, seed + 2).start(),
+        "log": FakeLogServer(log, seed + 3).start(),
+    }
+
+
+def backend_environment(services: Dict[str, FakeService]) -> Dict[str, str]:
+    """Environment that points the backend at the running stand-ins"""
+    return {
+        "GEMINI_API_KEY": "benchmark-key",
+        "LLAMA_API_KEY": "benchmark-key",
+        "GEMINI_API_ENDPOINT": services["gemini"].url,
+        "GOOGLE_GEMINI_BASE_URL": services["gemini"].url,
+        "GROQ_BASE_URL": services["groq"].url,
+        "LOG_SERVER_URL": f"{services['log'].url}/log",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--gemini-latency", type=float, default=0.3, help="seconds per Gemini response")
+    parser.add_argument("--groq-latency", type=float, default=0.2, help="seconds per Groq response")
+    parser.add_argument("--web-latency", type=float, default=0.05, help="seconds per web page")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra uniform random delay, in seconds")
+    args = parser.parse_args()
+
+    services = start_services(Latency(args.gemini_latency, args.jitter), Latency(args.groq_latency, args.jitter),
+                              Latency(args.web_latency, args.jitter), Latency())
+    for name, value in backend_environment(services).items():
+        print(f"export {name}={value}")
+    print(f"# web pages: {services['web'].url}/page/<n>; Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        for service in services.values():
+            service.stop()
+
+
+if __name__ == "__main__":
+    main()
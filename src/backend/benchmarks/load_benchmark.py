@@ -0,0 +1,570 @@
+"""Load and latency benchmark for the backend, fully offline.
+
+Run from src/backend:
+
+    python benchmarks/load_benchmark.py [--concurrency 1 8 32] [--requests N] [--scenarios PATTERN ...]
+                                        [--workspace-sizes 1000 10000 100000] [--output results.json]
+                                        [--compare baseline.json] [--tolerance 0.25]
+
+The backend is started with uvicorn in a scratch directory (so its caches,
+stores and workspace config start empty and the real ones are untouched) and
+pointed at the stand-ins in fake_services.py: Gemini, Groq, a synthetic web
+site and the log server, each with its own injected latency. Every scenario
+is then driven at each concurrency level and reported with throughput, p50,
+p95 and p99 latency and, for streamed responses, the median time to first
+byte.
+
+File scenarios (list, read, write, batch, search) run against synthetic
+workspaces of each ``--workspace-sizes`` size, built once under
+``--workspace-dir`` and reused by later runs. LLM scenarios send
+``Cache-Control: no-store`` so they measure the provider path; the ``*_cached``
+variants measure the LLM, PDF and HTTP caches.
+
+``--output`` writes the results as JSON. ``--compare`` checks a run against
+such a file and exits with status 1 when a scenario's p95 grew, or its
+throughput fell, by more than ``--tolerance``, so the benchmark can gate
+deploys.
+"""
+import argparse
+import asyncio
+import base64
+import fnmatch
+import itertools
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, BENCHMARK_DIR)
+
+from fake_services import Latency, backend_environment, start_services  # noqa: E402
+from synthetic_data import NEEDLES, WORDS, build_workspace, synthetic_pdf, synthetic_png  # noqa: E402
+
+DEFAULT_WORKSPACE_DIR = os.path.join(BENCHMARK_DIR, "workspaces")
+NO_STORE = {"Cache-Control": "no-store"}
+WRITE_DIR = "_benchmark_writes"
+# p95 changes smaller than this are noise, whatever the tolerance says
+P95_NOISE_FLOOR = 0.002
+
+# (ok, seconds to first byte for streamed responses)
+CallResult = Tuple[bool, Optional[float]]
+
+
+@dataclass
+class Context:
+    """State shared by the scenarios of one run"""
+    rng: random.Random
+    files: List[str] = field(default_factory=list)
+    workspace_label: str = ""
+    web_url: str = ""
+    pdf: bytes = b""
+    pdf_doc_id: Optional[str] = None
+    image_url: Optional[str] = None
+    _ids: itertools.count = field(default_factory=itertools.count)
+
+    def next_id(self) -> int:
+        """Unique across scenarios and concurrency levels, so "uncached" requests never repeat"""
+        return next(self._ids)
+
+
+@dataclass
+class Scenario:
+    name: str
+    call: Callable[[httpx.AsyncClient, Context], Awaitable[CallResult]]
+    workspace: bool = False  # Run once per workspace size
+
+
+# --- Request helpers ---
+
+async def send(client: httpx.AsyncClient, method: str, url: str, **kwargs) -> CallResult:
+    response = await client.request(method, url, **kwargs)
+    return 200 <= response.status_code < 300 or response.status_code == 304, None
+
+
+async def send_stream(client: httpx.AsyncClient, method: str, url: str, **kwargs) -> CallResult:
+    """Read an SSE (or any streamed) response to the end; fails on an error event"""
+    started = time.perf_counter()
+    first_byte = None
+    tail = b""
+    async with client.stream(method, url, **kwargs) as response:
+        async for chunk in response.aiter_bytes():
+            if first_byte is None:
+                first_byte = time.perf_counter() - started
+            tail = (tail + chunk)[-4096:]
+            if b'"error"' in chunk:
+                return False, first_byte
+        ok = response.status_code == 200
+    return ok and b'"error"' not in tail, first_byte
+
+
+def conversation(turns: int = 4) -> List[dict]:
+    return [
+        {"text": f"Message {turn} about the project notes", "sender": "user" if turn % 2 == 0 else "ai",
+         "timestamp": "2025-01-01T00:00:00"}
+        for turn in range(turns)
+    ]
+
+
+# --- Scenarios ---
+
+def workspace_scenarios() -> List[Scenario]:
+    async def list_top(client, ctx):
+        return await send(client, "GET", "/api/files/list", params={"depth": 1})
+
+    async def list_full(client, ctx):
+        return await send(client, "GET", "/api/files/list")
+
+    async def read(client, ctx):
+        return await send(client, "GET", "/api/files/read", params={"path": ctx.rng.choice(ctx.files)})
+
+    async def read_raw(client, ctx):
+        return await send(client, "GET", "/api/files/read", params={"path": ctx.rng.choice(ctx.files), "raw": "true"})
+
+    async def write(client, ctx):
+        path = f"{WRITE_DIR}/note{ctx.next_id() % 50}.md"
+        content = " ".join(ctx.rng.choice(WORDS) for _ in range(200))
+        return await send(client, "POST", "/api/files/write", json={"path": path, "content": content})
+
+    async def batch(client, ctx):
+        prefix = f"{WRITE_DIR}/batch{ctx.next_id()}"
+        operations = [{"op": "create", "path": f"{prefix}-{n}.md", "type": "file"} for n in range(5)]
+        operations += [{"op": "write", "path": f"{prefix}-{n}.md", "content": "batch text\n" * 20} for n in range(5)]
+        operations += [{"op": "delete", "path": f"{prefix}-{n}.md"} for n in range(5)]
+        return await send(client, "POST", "/api/files/batch", json={"operations": operations})
+
+    async def search(client, ctx):
+        query = ctx.rng.choice(NEEDLES) if ctx.rng.random() < 0.5 else f"{ctx.rng.choice(WORDS)} {ctx.rng.choice(WORDS)}"
+        return await send(client, "GET", "/api/search", params={"q": query})
+
+    return [
+        Scenario("files.list", list_top, workspace=True),
+        Scenario("files.list_full", list_full, workspace=True),
+        Scenario("files.read", read, workspace=True),
+        Scenario("files.read_raw", read_raw, workspace=True),
+        Scenario("files.write", write, workspace=True),
+        Scenario("files.batch", batch, workspace=True),
+        Scenario("search", search, workspace=True),
+    ]
+
+
+def chat_scenarios() -> List[Scenario]:
+    async def create_session(client, ctx):
+        return await send(client, "POST", "/create-session")
+
+    def ask_body(ctx, stream):
+        return {"question": f"What is in my notes? ({ctx.next_id()})", "session_id": f"bench-{ctx.next_id()}",
+                "conversation_history": [], "stream": stream}
+
+    async def ask(client, ctx):
+        return await send(client, "POST", "/ask-ai", json=ask_body(ctx, False))
+
+    async def ask_stream(client, ctx):
+        return await send_stream(client, "POST", "/ask-ai", json=ask_body(ctx, True))
+
+    async def title(client, ctx):
+        return await send(client, "POST", "/generate-title", headers=NO_STORE,
+                          json={"session_id": f"bench-{ctx.next_id()}", "conversation_history": conversation()})
+
+    async def ai_chat(client, ctx):
+        return await send(client, "POST", "/api/ai-chat", headers=NO_STORE,
+                          json={"user_prompt": f"Summarise point {ctx.next_id()}"})
+
+    async def ai_chat_cached(client, ctx):
+        return await send(client, "POST", "/api/ai-chat", json={"user_prompt": "Summarise the benchmark notes"})
+
+    async def ai_chat_stream(client, ctx):
+        return await send_stream(client, "POST", "/api/ai-chat", headers=NO_STORE,
+                                 json={"user_prompt": f"Summarise point {ctx.next_id()}", "stream": True})
+
+    async def youtube_analyze(client, ctx):
+        return await send(client, "POST", "/api/youtube/analyze", headers=NO_STORE,
+                          json={"youtube_url": f"https://www.youtube.com/watch?v=bench{ctx.next_id()}"})
+
+    async def youtube_code(client, ctx):
+        return await send(client, "POST", "/api/youtube/extract-code", headers=NO_STORE,
+                          json={"youtube_url": f"https://www.youtube.com/watch?v=bench{ctx.next_id()}"})
+
+    return [
+        Scenario("chat.create_session", create_session),
+        Scenario("chat.ask", ask),
+        Scenario("chat.ask_stream", ask_stream),
+        Scenario("chat.generate_title", title),
+        Scenario("chat.ai_chat", ai_chat),
+        Scenario("chat.ai_chat_cached", ai_chat_cached),
+        Scenario("chat.ai_chat_stream", ai_chat_stream),
+        Scenario("youtube.analyze", youtube_analyze),
+        Scenario("youtube.extract_code", youtube_code),
+    ]
+
+
+def pdf_scenarios() -> List[Scenario]:
+    async def extract(client, ctx):
+        pdf = synthetic_pdf(seed=10_000 + ctx.next_id())
+        return await send(client, "POST", "/api/pdf/extract-text",
+                          files={"file": ("bench.pdf", pdf, "application/pdf")})
+
+    async def extract_cached(client, ctx):
+        return await send(client, "POST", "/api/pdf/extract-text",
+                          files={"file": ("bench.pdf", ctx.pdf, "application/pdf")})
+
+    async def extract_stream(client, ctx):
+        pdf = synthetic_pdf(seed=10_000 + ctx.next_id())
+        return await send_stream(client, "POST", "/api/pdf/extract-text", data={"stream": "true"},
+                                 files={"file": ("bench.pdf", pdf, "application/pdf")})
+
+    async def ask(client, ctx):
+        return await send(client, "POST", "/api/pdf/ask", headers=NO_STORE,
+                          json={"doc_id": ctx.pdf_doc_id, "question": f"What does page {ctx.next_id() % 20} say?"})
+
+    return [
+        Scenario("pdf.extract", extract),
+        Scenario("pdf.extract_cached", extract_cached),
+        Scenario("pdf.extract_stream", extract_stream),
+        Scenario("pdf.ask", ask),
+    ]
+
+
+def web_scenarios() -> List[Scenario]:
+    async def scrape(client, ctx):
+        return await send(client, "POST", "/api/scrape", json={"url": f"{ctx.web_url}/page/{ctx.next_id()}?nocache=1"})
+
+    async def scrape_cached(client, ctx):
+        return await send(client, "POST", "/api/scrape", json={"url": f"{ctx.web_url}/page/{ctx.rng.randrange(10)}"})
+
+    async def scrape_batch(client, ctx):
+        start = ctx.next_id() * 10
+        urls = [f"{ctx.web_url}/page/{start + n}?nocache=1" for n in range(10)]
+        return await send(client, "POST", "/api/scrape/batch", json={"urls": urls, "stream": False})
+
+    return [
+        Scenario("scrape.page", scrape),
+        Scenario("scrape.page_cached", scrape_cached),
+        Scenario("scrape.batch", scrape_batch),
+    ]
+
+
+def asset_scenarios() -> List[Scenario]:
+    async def upload_stream(client, ctx):
+        image = synthetic_png(seed=ctx.next_id())
+        return await send(client, "POST", "/api/files/upload-stream", params={"filename": "bench.png", "ephemeral": "true"},
+                          content=image)
+
+    async def upload_multipart(client, ctx):
+        image = synthetic_png(seed=ctx.next_id())
+        return await send(client, "POST", "/api/files/upload", files={"file": ("bench.png", image, "image/png")})
+
+    async def upload_base64(client, ctx):
+        upload = ctx.next_id()
+        encoded = base64.b64encode(synthetic_png(seed=upload)).decode("ascii")
+        return await send(client, "POST", "/api/files/upload-base64",
+                          json={"base64_data": encoded, "filename": f"bench{upload}.png"})
+
+    async def image_process(client, ctx):
+        return await send(client, "POST", "/api/image/process", json={"image_url": ctx.image_url, "prompt_text": "Describe"})
+
+    async def image_process_new(client, ctx):
+        response = await client.post("/api/files/upload-stream", params={"filename": "bench.png", "ephemeral": "true"},
+                                      content=synthetic_png(seed=ctx.next_id()))
+        if response.status_code != 200:
+            return False, None
+        return await send(client, "POST", "/api/image/process",
+                          json={"image_url": response.json()["path"], "prompt_text": "Describe"})
+
+    async def write_log(client, ctx):
+        return await send(client, "POST", "/api/write-log", json={"log": f"benchmark entry {ctx.next_id()}\n"})
+
+    async def write_logs(client, ctx):
+        entry = ctx.next_id()
+        return await send(client, "POST", "/api/write-logs",
+                          json={"logs": [{"level": "info", "message": f"benchmark entry {entry}.{n}"} for n in range(100)]})
+
+    async def metrics(client, ctx):
+        return await send(client, "GET", "/metrics")
+
+    return [
+        Scenario("upload.stream", upload_stream),
+        Scenario("upload.multipart", upload_multipart),
+        Scenario("upload.base64", upload_base64),
+        Scenario("image.process", image_process),
+        Scenario("image.process_new", image_process_new),
+        Scenario("log.write", write_log),
+        Scenario("log.write_bulk", write_logs),
+        Scenario("metrics", metrics),
+    ]
+
+
+def all_scenarios() -> List[Scenario]:
+    return workspace_scenarios() + chat_scenarios() + pdf_scenarios() + web_scenarios() + asset_scenarios()
+
+
+# --- Running ---
+
+def percentile(ordered: List[float], q: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))]
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario: Scenario, ctx: Context, concurrency: int,
+                       requests: int, warmup: int) -> dict:
+    for _ in range(warmup):
+        try:
+            await scenario.call(client, ctx)
+        except httpx.HTTPError:
+            pass
+
+    latencies: List[float] = []
+    first_bytes: List[float] = []
+    errors = 0
+    remaining = itertools.count()
+
+    async def worker():
+        nonlocal errors
+        while next(remaining) < requests:
+            started = time.perf_counter()
+            try:
+                ok, first_byte = await scenario.call(client, ctx)
+            except httpx.HTTPError:
+                ok, first_byte = False, None
+            latencies.append(time.perf_counter() - started)
+            if first_byte is not None:
+                first_bytes.append(first_byte)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    ordered = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(wall, 4),
+        "throughput": round(len(latencies) / wall, 2) if wall else None,
+        "p50": percentile(ordered, 0.50),
+        "p95": percentile(ordered, 0.95),
+        "p99": percentile(ordered, 0.99),
+        "ttfb_p50": percentile(sorted(first_bytes), 0.50),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_backend(work_dir: str, env: Dict[str, str], port: int) -> subprocess.Popen:
+    log = open(os.path.join(work_dir, "backend.log"), "w")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", BACKEND_DIR, "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning", "--no-access-log"],
+        cwd=work_dir, env={**os.environ, **env}, stdout=log, stderr=subprocess.STDOUT,
+    )
+
+
+async def wait_for_backend(client: httpx.AsyncClient, process: subprocess.Popen, timeout: float = 120.0) -> float:
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"Backend exited with status {process.returncode}")
+        try:
+            if (await client.get("/api/metrics")).status_code == 200:
+                return time.perf_counter() - started
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError(f"Backend did not answer within {timeout:.0f}s")
+
+
+async def prepare(client: httpx.AsyncClient, ctx: Context, needed: List[Scenario]):
+    """One-off state some scenarios depend on: a stored PDF and an uploaded image"""
+    names = {scenario.name for scenario in needed}
+    if names & {"pdf.ask", "pdf.extract_cached"}:
+        response = await client.post("/api/pdf/extract-text", files={"file": ("bench.pdf", ctx.pdf, "application/pdf")})
+        response.raise_for_status()
+        ctx.pdf_doc_id = response.json().get("doc_id")
+    if "image.process" in names:
+        response = await client.post("/api/files/upload-stream", params={"filename": "bench.png"},
+                                     content=synthetic_png(seed=424242))
+        response.raise_for_status()
+        ctx.image_url = response.json()["path"]
+
+
+def format_ms(value: Optional[float]) -> str:
+    return f"{value * 1000:.1f}" if value is not None else "-"
+
+
+def print_row(name: str, concurrency: int, result: dict):
+    print(f"{name:<28} {concurrency:>4} {result['requests']:>6} {result['errors']:>6} {result['throughput'] or 0:>9.1f} "
+          f"{format_ms(result['p50']):>9} {format_ms(result['p95']):>9} {format_ms(result['p99']):>9} "
+          f"{format_ms(result['ttfb_p50']):>9}", flush=True)
+
+
+def compare(results: Dict[str, dict], baseline_path: str, tolerance: float) -> List[str]:
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    regressions = []
+    for key, result in results.items():
+        before = baseline.get(key)
+        if not before or result["p95"] is None or before.get("p95") is None:
+            continue
+        if result["p95"] > before["p95"] * (1 + tolerance) and result["p95"] - before["p95"] > P95_NOISE_FLOOR:
+            regressions.append(f"{key}: p95 {format_ms(before['p95'])} -> {format_ms(result['p95'])} ms")
+        if before.get("throughput") and result["throughput"] < before["throughput"] * (1 - tolerance):
+            regressions.append(f"{key}: throughput {before['throughput']:.1f} -> {result['throughput']:.1f} req/s")
+        if result["errors"] > before.get("errors", 0):
+            regressions.append(f"{key}: errors {before.get('errors', 0)} -> {result['errors']}")
+    return regressions
+
+
+async def run(args) -> int:
+    scenarios = [scenario for scenario in all_scenarios()
+                 if not args.scenarios or any(fnmatch.fnmatch(scenario.name, pattern) for pattern in args.scenarios)]
+    if args.list:
+        for scenario in all_scenarios():
+            print(f"{scenario.name}{'  (per workspace size)' if scenario.workspace else ''}")
+        return 0
+    if not scenarios:
+        print("No scenarios match")
+        return 2
+
+    services = start_services(
+        Latency(args.gemini_latency, args.jitter, args.stream_chunks),
+        Latency(args.groq_latency, args.jitter),
+        Latency(args.web_latency, args.jitter),
+        Latency(),
+        seed=args.seed,
+    )
+    work_dir = tempfile.mkdtemp(prefix="scribe-bench-")
+    env = {**backend_environment(services), "SCRAPE_HOST_INTERVAL": str(args.scrape_host_interval)}
+    for item in args.backend_env or []:
+        name, _, value = item.partition("=")
+        env[name] = value
+    port = free_port()
+    process = start_backend(work_dir, env, port)
+    ctx = Context(rng=random.Random(args.seed), web_url=services["web"].url, pdf=synthetic_pdf(seed=args.seed))
+    results: Dict[str, dict] = {}
+    limits = httpx.Limits(max_connections=max(args.concurrency) + 4, max_keepalive_connections=max(args.concurrency) + 4)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=args.timeout, limits=limits) as client:
+            startup = await wait_for_backend(client, process)
+            print(f"Backend ready in {startup:.2f}s (port {port}, scratch dir {work_dir})")
+            print(f"Latency: gemini {args.gemini_latency}s, groq {args.groq_latency}s, web {args.web_latency}s, "
+                  f"jitter {args.jitter}s; {args.requests} requests per scenario\n")
+            print(f"{'scenario':<28} {'conc':>4} {'reqs':>6} {'errors':>6} {'req/s':>9} {'p50 ms':>9} "
+                  f"{'p95 ms':>9} {'p99 ms':>9} {'ttfb ms':>9}")
+
+            workspace_runs = [scenario for scenario in scenarios if scenario.workspace]
+            if workspace_runs:
+                for size in args.workspace_sizes:
+                    started = time.perf_counter()
+                    root, ctx.files = build_workspace(args.workspace_dir, size, args.seed)
+                    label = f"{size // 1000}k" if size >= 1000 else str(size)
+                    print(f"-- workspace {label}: {len(ctx.files)} files ({time.perf_counter() - started:.1f}s to prepare)")
+                    os.makedirs(os.path.join(root, WRITE_DIR), exist_ok=True)
+                    (await client.post("/api/workspace/set", json={"directory": root})).raise_for_status()
+                    try:
+                        for scenario in workspace_runs:
+                            for concurrency in args.concurrency:
+                                result = await run_scenario(client, scenario, ctx, concurrency, args.requests, args.warmup)
+                                name = f"{scenario.name}[{label}]"
+                                results[f"{name}@{concurrency}"] = result
+                                print_row(name, concurrency, result)
+                    finally:
+                        shutil.rmtree(os.path.join(root, WRITE_DIR), ignore_errors=True)
+
+            other_runs = [scenario for scenario in scenarios if not scenario.workspace]
+            if other_runs:
+                print("-- services")
+                await prepare(client, ctx, other_runs)
+                for scenario in other_runs:
+                    for concurrency in args.concurrency:
+                        result = await run_scenario(client, scenario, ctx, concurrency, args.requests, args.warmup)
+                        results[f"{scenario.name}@{concurrency}"] = result
+                        print_row(scenario.name, concurrency, result)
+
+            server_metrics = (await client.get("/api/metrics")).json()
+    except Exception:
+        process.terminate()
+        with open(os.path.join(work_dir, "backend.log"), encoding="utf-8", errors="replace") as f:
+            print("Backend log (last lines):\n" + "".join(f.readlines()[-30:]))
+        raise
+    finally:
+        if process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        for service in services.values():
+            service.stop()
+
+    print("\nFake service requests: " + ", ".join(f"{name} {service.requests}" for name, service in services.items()))
+    ratios = server_metrics.get("cache_hit_ratios", {})
+    if ratios:
+        print("Backend cache hit ratios: " + ", ".join(f"{name} {ratio}" for name, ratio in ratios.items()))
+
+    if args.output:
+        report = {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "arguments": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+            "results": results,
+            "server_metrics": server_metrics,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regressions against {args.compare}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print(f"\nNo regressions against {args.compare} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8], help="concurrent clients (default 1 8)")
+    parser.add_argument("--requests", type=int, default=100, help="timed requests per scenario and concurrency")
+    parser.add_argument("--warmup", type=int, default=3, help="untimed requests before each measurement")
+    parser.add_argument("--scenarios", nargs="+", metavar="PATTERN", help="glob patterns, e.g. 'files.*' 'chat.ask*'")
+    parser.add_argument("--list", action="store_true", help="list the scenarios and exit")
+    parser.add_argument("--workspace-sizes", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="files in each synthetic workspace (default 1000 10000 100000)")
+    parser.add_argument("--workspace-dir", default=DEFAULT_WORKSPACE_DIR, help="where synthetic workspaces are kept")
+    parser.add_argument("--gemini-latency", type=float, default=0.3, help="seconds per Gemini response")
+    parser.add_argument("--groq-latency", type=float, default=0.2, help="seconds per Groq response")
+    parser.add_argument("--web-latency", type=float, default=0.05, help="seconds per web page")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra uniform random latency, in seconds")
+    parser.add_argument("--stream-chunks", type=int, default=5, help="chunks per streamed Gemini response")
+    parser.add_argument("--scrape-host-interval", type=float, default=0.0,
+                        help="backend SCRAPE_HOST_INTERVAL; all fake pages share one host (default 0)")
+    parser.add_argument("--backend-env", nargs="+", metavar="NAME=VALUE", help="extra environment for the backend")
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds per request")
+    parser.add_argument("--seed", type=int, default=1, help="seed for generated data and request mix")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare with an earlier --output file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression (default 0.25)")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
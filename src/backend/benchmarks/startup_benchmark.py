@@ -0,0 +1,201 @@
+"""Import-time profile and cold start benchmark for the backend.
+
+Run from src/backend:
+
+    python benchmarks/startup_benchmark.py [--runs N] [--top N] [--check] [--output results.json]
+
+Three measurements, each in fresh processes so nothing is already imported:
+
+1. ``import main`` under ``python -X importtime``: the median import time,
+   the slowest modules main.py imports directly, self time by top-level
+   package, and which of the modules meant to load on first use
+   (providers.PROVIDER_MODULES, aiohttp, requests, tkinter) were imported
+   anyway. ``--check`` exits with status 1 if any were.
+2. Cold start: from launching uvicorn to the first answered request.
+3. The first /api/ai-chat request after that, against the local Gemini
+   stand-in from fake_services.py, with PROVIDER_PRELOAD on and off. This is
+   the cost of loading the SDK that startup no longer pays, and shows how
+   much of it the background preload hides.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+import httpx
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, BENCHMARK_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+from fake_services import Latency, backend_environment, start_services  # noqa: E402
+from load_benchmark import free_port, start_backend  # noqa: E402
+from providers import PROVIDER_MODULES  # noqa: E402
+
+DEFERRED_MODULES = PROVIDER_MODULES + ("aiohttp", "requests", "tkinter")
+# Prints the loaded module names after the -X importtime report on stderr
+IMPORT_SCRIPT = "import json, sys, main; print(json.dumps(sorted(sys.modules)))"
+
+# (depth, self µs, cumulative µs, module)
+ImportEntry = Tuple[int, int, int, str]
+
+
+def parse_importtime(stderr: str) -> List[ImportEntry]:
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        name = name.rstrip()
+        stripped = name.lstrip(" ")
+        # One space after the bar, then two per nesting level
+        depth = (len(name) - len(stripped) - 1) // 2
+        entries.append((depth, int(self_us), int(cumulative_us), stripped))
+    return entries
+
+
+def imports_of(entries: List[ImportEntry], module: str) -> List[ImportEntry]:
+    """Everything imported while ``module`` (a top-level import) was being imported"""
+    start = 0
+    for index, (depth, _, _, name) in enumerate(entries):
+        if depth == 0:
+            if name == module:
+                return entries[start:index + 1]
+            start = index + 1
+    return []
+
+
+def profile_import(work_dir: str, env: Dict[str, str]) -> Tuple[List[ImportEntry], List[str], float]:
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", IMPORT_SCRIPT],
+        cwd=work_dir, env={**os.environ, **env, "PYTHONPATH": BACKEND_DIR}, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"import main failed:\n{result.stderr[-2000:]}")
+    modules = json.loads(result.stdout.strip().splitlines()[-1])
+    return imports_of(parse_importtime(result.stderr), "main"), modules, wall
+
+
+def wait_ready(client: httpx.Client, process: subprocess.Popen, started: float, timeout: float = 60.0) -> float:
+    while time.perf_counter() - started < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"Backend exited with status {process.returncode}")
+        try:
+            if client.get("/api/metrics").status_code == 200:
+                return time.perf_counter() - started
+        except httpx.TransportError:
+            pass
+        time.sleep(0.01)
+    raise RuntimeError(f"Backend did not answer within {timeout:.0f}s")
+
+
+def cold_start(env: Dict[str, str], preload: bool) -> Dict[str, float]:
+    """Launch the backend; time to the first answered request and the first two AI chat requests"""
+    work_dir = tempfile.mkdtemp(prefix="scribe-startup-")
+    port = free_port()
+    started = time.perf_counter()
+    process = start_backend(work_dir, {**env, "PROVIDER_PRELOAD": "1" if preload else "0"}, port)
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+            ready = wait_ready(client, process, started)
+            timings = {"ready": ready}
+            for label in ("first_ai_chat", "second_ai_chat"):
+                request_started = time.perf_counter()
+                response = client.post("/api/ai-chat", headers={"Cache-Control": "no-store"},
+                                       json={"user_prompt": f"Say hello ({label})"})
+                response.raise_for_status()
+                timings[label] = time.perf_counter() - request_started
+            return timings
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def package_of(module: str) -> str:
+    root = module.split(".")[0]
+    return "google." + module.split(".")[1] if root == "google" and "." in module else root
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--runs", type=int, default=5, help="processes per measurement (default 5)")
+    parser.add_argument("--top", type=int, default=15, help="rows in the import tables (default 15)")
+    parser.add_argument("--skip-cold-start", action="store_true", help="only profile the import")
+    parser.add_argument("--check", action="store_true", help="exit 1 if `import main` loads a deferred module")
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    services = start_services(Latency(), Latency(), Latency(), Latency())
+    env = backend_environment(services)
+    work_dir = tempfile.mkdtemp(prefix="scribe-import-")
+    report = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "runs": args.runs}
+    try:
+        # 1. Import profile
+        profiles = [profile_import(work_dir, env) for _ in range(args.runs)]
+        import_ms = [entries[-1][2] / 1000 for entries, _, _ in profiles]
+        process_ms = [wall * 1000 for _, _, wall in profiles]
+        entries, modules, _ = min(profiles, key=lambda profile: profile[0][-1][2])
+        print(f"import main: median {statistics.median(import_ms):.0f} ms, min {min(import_ms):.0f} ms "
+              f"({statistics.median(process_ms):.0f} ms for the whole interpreter process, {args.runs} runs)\n")
+
+        direct = sorted((entry for entry in entries[:-1] if entry[0] == 1), key=lambda entry: -entry[2])
+        print("Slowest direct imports of main.py (fastest run, cumulative)")
+        for _, _, cumulative_us, name in direct[:args.top]:
+            print(f"  {name:<40} {cumulative_us / 1000:>8.1f} ms")
+
+        by_package: Dict[str, int] = defaultdict(int)
+        for _, self_us, _, name in entries:
+            by_package[package_of(name)] += self_us
+        print("\nSelf time by package")
+        for package, self_us in sorted(by_package.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"  {package:<40} {self_us / 1000:>8.1f} ms")
+
+        loaded = [module for module in DEFERRED_MODULES if module in modules]
+        print(f"\nDeferred modules loaded by `import main`: {', '.join(loaded) or 'none'}")
+        report.update({
+            "import_ms": import_ms,
+            "process_ms": process_ms,
+            "direct_imports_ms": {name: cumulative_us / 1000 for _, _, cumulative_us, name in direct},
+            "package_self_ms": {package: self_us / 1000 for package, self_us in by_package.items()},
+            "deferred_loaded": loaded,
+        })
+
+        # 2 and 3. Cold start and first LLM request
+        if not args.skip_cold_start:
+            print(f"\n{'cold start':<24} {'ready ms':>10} {'1st ai-chat ms':>15} {'2nd ai-chat ms':>15}")
+            for preload in (True, False):
+                runs = [cold_start(env, preload) for _ in range(args.runs)]
+                medians = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+                label = f"PROVIDER_PRELOAD={'1' if preload else '0'}"
+                print(f"{label:<24} {medians['ready'] * 1000:>10.0f} {medians['first_ai_chat'] * 1000:>15.0f} "
+                      f"{medians['second_ai_chat'] * 1000:>15.0f}")
+                report[f"cold_start_preload_{int(preload)}"] = runs
+    finally:
+        for service in services.values():
+            service.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    if args.check and report["deferred_loaded"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Deterministic inputs for the load benchmark: workspaces, PDFs and PNG images.
+
+Everything is generated from a seed, so two runs with the same arguments send
+the backend byte-identical data. Workspaces are kept on disk between runs
+(building 100k files takes a while) and rebuilt only when missing or
+incomplete.
+"""
+import os
+import random
+import shutil
+import struct
+import zlib
+from typing import List, Tuple
+
+WORDS = (
+    "scribe", "workspace", "notes", "canvas", "gemini", "editor", "files", "search", "video", "summary",
+    "project", "meeting", "design", "draft", "review", "python", "react", "layout", "render", "index",
+    "the", "a", "of", "and", "to", "in", "with", "for", "on", "is",
+)
+EXTENSIONS = (".md", ".txt", ".py", ".js", ".json")
+FILES_PER_DIRECTORY = 25
+DIRECTORIES_PER_LEVEL = 8
+COMPLETE_MARKER = ".benchmark-complete"
+# Words planted in a known number of files, so search results have a predictable size
+NEEDLES = ("zephyrine", "quillwort", "marrowfat")
+
+
+def _text(rng: random.Random, min_words: int, max_words: int) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words))]
+    lines = [" ".join(words[i:i + 12]) for i in range(0, len(words), 12)]
+    return "\n".join(lines) + "\n"
+
+
+def _directory_of(index: int) -> str:
+    """Spread files over a tree DIRECTORIES_PER_LEVEL wide, FILES_PER_DIRECTORY files per directory"""
+    bucket = index // FILES_PER_DIRECTORY
+    parts = []
+    while True:
+        parts.append(f"dir{bucket % DIRECTORIES_PER_LEVEL}")
+        bucket //= DIRECTORIES_PER_LEVEL
+        if not bucket:
+            break
+    return os.path.join(*reversed(parts))
+
+
+def build_workspace(base_dir: str, files: int, seed: int = 1) -> Tuple[str, List[str]]:
+    """Create (or reuse) a workspace of ``files`` text files; returns (root, relative file paths)"""
+    home = os.path.join(base_dir, f"ws-{files}-{seed}")
+    root = os.path.join(home, "tree")
+    manifest = os.path.join(home, "manifest.txt")
+    if os.path.exists(os.path.join(home, COMPLETE_MARKER)):
+        with open(manifest, encoding="utf-8") as f:
+            return root, f.read().splitlines()
+
+    shutil.rmtree(home, ignore_errors=True)
+    rng = random.Random(seed * 1_000_003 + files)
+    paths = []
+    for index in range(files):
+        relative = os.path.join(_directory_of(index), f"note{index}{EXTENSIONS[index % len(EXTENSIONS)]}")
+        path = os.path.join(root, relative)
+        if index % FILES_PER_DIRECTORY == 0:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        content = _text(rng, 30, 250)
+        if index % 97 == 0:
+            content += f"{NEEDLES[index % len(NEEDLES)]}\n"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        paths.append(relative.replace(os.sep, "/"))
+    with open(manifest, "w", encoding="utf-8") as f:
+        f.write("\n".join(paths))
+    with open(os.path.join(home, COMPLETE_MARKER), "w") as f:
+        f.write(str(files))
+    return root, paths
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def synthetic_pdf(pages: int = 20, lines_per_page: int = 40, seed: int = 1) -> bytes:
+    """A text PDF (Helvetica, one content stream per page) that pypdf can extract"""
+    rng = random.Random(seed)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Page tree, filled in once the page objects are numbered
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for page in range(pages):
+        lines = [f"Page {page + 1} seed {seed}"]
+        lines += [" ".join(rng.choice(WORDS) for _ in range(12)) for _ in range(lines_per_page)]
+        stream = "BT /F1 10 Tf 14 TL 50 760 Td " + " ".join(f"({_pdf_escape(line)}) Tj T*" for line in lines) + " ET"
+        content = stream.encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+        content_number = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_number
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % number for number in kids), len(kids))
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(output)
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+
+def synthetic_png(width: int = 256, height: int = 256, seed: int = 1) -> bytes:
+    """An RGB PNG of seeded noise; different seeds give different content hashes"""
+    rng = random.Random(seed)
+    row_bytes = width * 3
+    raw = b"".join(b"\x00" + rng.randbytes(row_bytes) for _ in range(height))
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + _png_chunk(b"IHDR", header)
+            + _png_chunk(b"IDAT", zlib.compress(raw, 6)) + _png_chunk(b"IEND", b""))
@@ -0,0 +1,175 @@
+"""Content-addressed store for extracted documents.
+
+Extraction endpoints (PDF text, scraped pages, YouTube transcripts) put their
+text here and hand the client a ``doc_id`` (the SHA-256 of the text), which
+downstream endpoints accept instead of the text itself. Large documents then
+cross the network once, on extraction, instead of with every question.
+
+Documents are kept in memory up to ``DOC_STORE_MAX_BYTES`` and written to
+``DOC_STORE_DIR`` (gzipped JSON) up to ``DOC_STORE_MAX_DISK_BYTES``; beyond
+either budget the least recently used documents are evicted. A ``doc_id``
+that has been evicted is reported as unknown and the client re-extracts.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+DOC_STORE_DIR = os.getenv("DOC_STORE_DIR", "doc_store")
+DOC_STORE_MAX_BYTES = int(os.getenv("DOC_STORE_MAX_BYTES", str(128 * 1024 * 1024)))
+DOC_STORE_MAX_DISK_BYTES = int(os.getenv("DOC_STORE_MAX_DISK_BYTES", str(1024 * 1024 * 1024)))
+
+_DOC_ID_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def document_id(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+class DocumentStore:
+    """LRU-bounded document store: hot documents in memory, the rest on disk"""
+
+    def __init__(self, directory: Optional[str] = DOC_STORE_DIR, max_bytes: int = DOC_STORE_MAX_BYTES,
+                 max_disk_bytes: int = DOC_STORE_MAX_DISK_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        # doc_id -> {"text", "kind", "metadata", "created", "size"}
+        self._memory: "OrderedDict[str, dict]" = OrderedDict()
+        self._memory_bytes = 0
+        # doc_id -> compressed size on disk, least recently used first
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        self._lock = threading.RLock()
+        if directory:
+            self._scan_disk()
+
+    def _path(self, doc_id: str) -> str:
+        return os.path.join(self.directory, f"{doc_id}.json.gz")
+
+    def _scan_disk(self):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            entries = []
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    doc_id = entry.name[:-len(".json.gz")]
+                    if entry.name.endswith(".json.gz") and _DOC_ID_RE.match(doc_id):
+                        stats = entry.stat()
+                        entries.append((stats.st_mtime, doc_id, stats.st_size))
+        except OSError as e:
+            logging.error(f"Could not open document store {self.directory}: {e}", exc_info=True)
+            self.directory = None
+            return
+        for _, doc_id, size in sorted(entries):
+            self._disk[doc_id] = size
+            self._disk_bytes += size
+
+    # --- Memory ---
+
+    def _remember(self, doc_id: str, document: dict):
+        previous = self._memory.pop(doc_id, None)
+        if previous:
+            self._memory_bytes -= previous["size"]
+        self._memory[doc_id] = document
+        self._memory_bytes += document["size"]
+        # The newest document is always kept, even if it alone exceeds the budget
+        while len(self._memory) > 1 and self._memory_bytes > self.max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted["size"]
+
+    # --- Disk ---
+
+    def _write(self, doc_id: str, document: dict):
+        if not self.directory:
+            return
+        path = self._path(doc_id)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with gzip.open(temp_path, "wt", encoding="utf-8") as f:
+                json.dump({key: value for key, value in document.items() if key != "size"}, f)
+            os.replace(temp_path, path)
+            size = os.path.getsize(path)
+        except OSError as e:
+            logging.error(f"Could not write document {doc_id}: {e}", exc_info=True)
+            return
+        self._disk_bytes += size - self._disk.pop(doc_id, 0)
+        self._disk[doc_id] = size
+        while len(self._disk) > 1 and self._disk_bytes > self.max_disk_bytes:
+            evicted_id, evicted_size = self._disk.popitem(last=False)
+            self._disk_bytes -= evicted_size
+            try:
+                os.remove(self._path(evicted_id))
+            except OSError:
+                pass
+
+    def _read(self, doc_id: str) -> Optional[dict]:
+        if not self.directory or doc_id not in self._disk:
+            return None
+        path = self._path(doc_id)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                document = json.load(f)
+            os.utime(path)  # Keeps LRU order across restarts
+        except (OSError, ValueError) as e:
+            logging.warning(f"Dropping unreadable document {doc_id}: {e}")
+            self._disk_bytes -= self._disk.pop(doc_id, 0)
+            return None
+        self._disk.move_to_end(doc_id)
+        document["size"] = len(document["text"].encode("utf-8", "surrogatepass"))
+        return document
+
+    # --- Public API ---
+
+    def put(self, text: str, kind: str, metadata: Optional[Dict] = None) -> str:
+        """Store a document and return its id; storing the same text again is a no-op"""
+        doc_id = document_id(text)
+        with self._lock:
+            document = self._memory.get(doc_id)
+            if document is None:
+                document = {
+                    "text": text,
+                    "kind": kind,
+                    "metadata": metadata or {},
+                    "created": time.time(),
+                    "size": len(text.encode("utf-8", "surrogatepass")),
+                }
+            self._remember(doc_id, document)
+            if doc_id in self._disk:
+                self._disk.move_to_end(doc_id)
+            else:
+                self._write(doc_id, document)
+        return doc_id
+
+    def get(self, doc_id: str) -> Optional[dict]:
+        """``{"text", "kind", "metadata", "created", "size"}`` for a document, or None"""
+        if not _DOC_ID_RE.match(doc_id or ""):
+            return None
+        with self._lock:
+            document = self._memory.get(doc_id)
+            if document is not None:
+                self._memory.move_to_end(doc_id)
+                if doc_id in self._disk:
+                    self._disk.move_to_end(doc_id)
+                return document
+            document = self._read(doc_id)
+            if document is not None:
+                self._remember(doc_id, document)
+            return document
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "documents_in_memory": len(self._memory),
+                "bytes_in_memory": self._memory_bytes,
+                "documents_on_disk": len(self._disk),
+                "bytes_on_disk": self._disk_bytes,
+                "max_bytes": self.max_bytes,
+                "max_disk_bytes": self.max_disk_bytes,
+            }
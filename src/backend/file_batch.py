@@ -0,0 +1,253 @@
+"""Apply a list of workspace file operations in one request.
+
+``apply_file_operations`` runs create / write / rename / delete operations in
+order and reports a result per operation. It does blocking filesystem work and
+is meant to be called from a worker thread.
+
+With ``atomic=True`` the batch is all-or-nothing: every applied operation
+records how to undo itself, deleted items are parked in a hidden staging
+directory instead of being removed, and the first failure rolls back
+everything applied before it, in reverse order. Without it, a failed
+operation is reported and the rest still run.
+"""
+import logging
+import os
+import shutil
+from typing import Callable, List, Optional
+
+from file_io import (
+    VersionConflict, path_lock, check_version, atomic_write_text, make_staging_dir,
+)
+
+MAX_BATCH_OPERATIONS = int(os.getenv("MAX_BATCH_OPERATIONS", "5000"))
+
+
+class FileOperationError(Exception):
+    """An operation that cannot be applied, with the HTTP status it maps to"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def resolve_workspace_path(workspace_dir: str, relative_path: Optional[str]) -> str:
+    """Absolute path for a workspace-relative path, refusing anything outside the workspace"""
+    if not relative_path:
+        raise FileOperationError(400, "Path is required")
+    if os.path.isabs(relative_path):
+        raise FileOperationError(400, "Path must be relative to the workspace")
+    root = os.path.abspath(workspace_dir)
+    full_path = os.path.abspath(os.path.join(root, relative_path))
+    if full_path == root or os.path.commonpath([root, full_path]) != root:
+        raise FileOperationError(400, f"Path is outside the workspace: {relative_path}")
+    return full_path
+
+
+def _make_parent_dirs(full_path: str) -> Optional[str]:
+    """Create missing parent directories; returns the topmost one created, if any"""
+    parent = os.path.dirname(full_path)
+    topmost = None
+    while parent and not os.path.exists(parent):
+        topmost = parent
+        parent = os.path.dirname(parent)
+    if topmost:
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    return topmost
+
+
+def _remove(full_path: str):
+    if os.path.isdir(full_path) and not os.path.islink(full_path):
+        shutil.rmtree(full_path)
+    elif os.path.lexists(full_path):
+        os.remove(full_path)
+
+
+def _item_type(full_path: str) -> str:
+    return "folder" if os.path.isdir(full_path) else "file"
+
+
+class _Batch:
+    def __init__(self, workspace_dir: str, atomic: bool):
+        self.workspace_dir = os.path.abspath(workspace_dir)
+        self.atomic = atomic
+        self.undo: List[Callable[[], None]] = []
+        self._staging_dir = None
+        self._staged = 0
+
+    def _relative(self, full_path: str) -> str:
+        return os.path.relpath(full_path, self.workspace_dir)
+
+    def _undo_created(self, full_path: str, topmost_dir: Optional[str]):
+        """Register undo for something that did not exist before, plus any parents made for it"""
+        if not self.atomic:
+            return
+        self.undo.append(lambda: _remove(topmost_dir or full_path))
+
+    def _staging_path(self) -> str:
+        """Fresh path in the batch's staging directory, which holds backups until the batch ends"""
+        if self._staging_dir is None:
+            # Named so that listings and the watcher skip it
+            self._staging_dir = make_staging_dir(self.workspace_dir)
+        self._staged += 1
+        return os.path.join(self._staging_dir, str(self._staged))
+
+    # --- Operations ---
+
+    def create(self, operation) -> dict:
+        full_path = resolve_workspace_path(self.workspace_dir, operation.path)
+        item_type = operation.type or "file"
+        if item_type not in ("file", "folder"):
+            raise FileOperationError(400, f"Unknown item type: {item_type}")
+        if os.path.lexists(full_path):
+            if item_type == "folder" and os.path.isdir(full_path):
+                return {"id": self._relative(full_path), "type": "folder"}
+            raise FileOperationError(409, "Already exists")
+        topmost = _make_parent_dirs(full_path)
+        if item_type == "folder":
+            os.mkdir(full_path)
+        else:
+            with open(full_path, "x", encoding="utf-8"):
+                pass
+        self._undo_created(full_path, topmost)
+        return {"id": self._relative(full_path), "type": item_type, "change": ("add", self._relative(full_path), None)}
+
+    def write(self, operation) -> dict:
+        full_path = resolve_workspace_path(self.workspace_dir, operation.path)
+        if os.path.isdir(full_path):
+            raise FileOperationError(409, "Path is a folder")
+        with path_lock(full_path):
+            check_version(full_path, operation.base_version)
+            existed = os.path.exists(full_path)
+            topmost = None
+            if existed and self.atomic:
+                backup = self._staging_path()
+                shutil.copy2(full_path, backup)
+                self.undo.append(lambda: os.replace(backup, full_path))
+            elif not existed:
+                topmost = _make_parent_dirs(full_path)
+            version = atomic_write_text(full_path, operation.content or "")
+            if not existed:
+                self._undo_created(full_path, topmost)
+        op = "modify" if existed else "add"
+        return {"id": self._relative(full_path), "type": "file", "version": version,
+                "change": (op, self._relative(full_path), None)}
+
+    def rename(self, operation) -> dict:
+        old_full_path = resolve_workspace_path(self.workspace_dir, operation.path)
+        new_full_path = resolve_workspace_path(self.workspace_dir, operation.new_path)
+        if not os.path.lexists(old_full_path):
+            raise FileOperationError(404, "File not found")
+        if os.path.lexists(new_full_path):
+            raise FileOperationError(409, "Destination already exists")
+        if os.path.commonpath([old_full_path, new_full_path]) == old_full_path:
+            raise FileOperationError(400, "Cannot move a folder into itself")
+        topmost = _make_parent_dirs(new_full_path)
+        shutil.move(old_full_path, new_full_path)
+        if self.atomic:
+            def undo():
+                shutil.move(new_full_path, old_full_path)
+                if topmost:
+                    _remove(topmost)
+            self.undo.append(undo)
+        new_path, old_path = self._relative(new_full_path), self._relative(old_full_path)
+        return {"id": new_path, "type": _item_type(new_full_path), "change": ("rename", new_path, old_path)}
+
+    def delete(self, operation) -> dict:
+        full_path = resolve_workspace_path(self.workspace_dir, operation.path)
+        if not os.path.lexists(full_path):
+            raise FileOperationError(404, "File not found")
+        item_type = _item_type(full_path)
+        if self.atomic:
+            # Parked rather than removed, so rollback can restore it
+            staged_path = self._staging_path()
+            os.replace(full_path, staged_path)
+            self.undo.append(lambda: os.replace(staged_path, full_path))
+        else:
+            _remove(full_path)
+        return {"id": self._relative(full_path), "type": item_type, "change": ("remove", self._relative(full_path), None)}
+
+    # --- Completion ---
+
+    def rollback(self):
+        for undo in reversed(self.undo):
+            try:
+                undo()
+            except Exception as e:
+                logging.error(f"Error rolling back batch file operation: {e}", exc_info=True)
+        self.undo.clear()
+
+    def cleanup(self):
+        if self._staging_dir:
+            shutil.rmtree(self._staging_dir, ignore_errors=True)
+            self._staging_dir = None
+
+
+def apply_file_operations(workspace_dir: str, operations, atomic: bool = False) -> dict:
+    """Apply ``operations`` in order; returns per-operation results and the changes made.
+
+    Each operation has ``op`` ("create", "write", "rename" or "delete"),
+    ``path`` and, depending on ``op``, ``type``, ``content``, ``base_version``
+    or ``new_path``. ``changes`` lists ``(op, path, old_path, item_type)`` for
+    the change feed; it is empty when an atomic batch was rolled back.
+    """
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        raise FileOperationError(413, f"At most {MAX_BATCH_OPERATIONS} operations per batch")
+    batch = _Batch(workspace_dir, atomic)
+    handlers = {"create": batch.create, "write": batch.write, "rename": batch.rename, "delete": batch.delete}
+    results = []
+    changes = []
+    failed = False
+    try:
+        for index, operation in enumerate(operations):
+            if failed and atomic:
+                results.append({"index": index, "op": operation.op, "status": "skipped"})
+                continue
+            handler = handlers.get(operation.op)
+            try:
+                if handler is None:
+                    raise FileOperationError(400, f"Unknown operation: {operation.op}")
+                result = handler(operation)
+            except VersionConflict as conflict:
+                failed = True
+                results.append({"index": index, "op": operation.op, "status": "error", "status_code": 409,
+                                "error": "File was modified since it was loaded",
+                                "current_version": conflict.current_version})
+                continue
+            except FileOperationError as e:
+                failed = True
+                results.append({"index": index, "op": operation.op, "status": "error",
+                                "status_code": e.status_code, "error": str(e)})
+                continue
+            except OSError as e:
+                failed = True
+                logging.error(f"Error applying batch file operation {index} ({operation.op}): {e}", exc_info=True)
+                results.append({"index": index, "op": operation.op, "status": "error",
+                                "status_code": 500, "error": str(e)})
+                continue
+            change = result.pop("change", None)
+            if change:
+                changes.append(change + (result["type"],))
+            results.append({"index": index, "op": operation.op, "status": "success", **result})
+
+        if failed and atomic:
+            batch.rollback()
+            changes = []
+            for result in results:
+                if result["status"] == "success":
+                    result["status"] = "rolled_back"
+                    result.pop("version", None)
+    except BaseException:
+        if atomic:
+            batch.rollback()
+        raise
+    finally:
+        batch.cleanup()
+
+    return {
+        "status": "error" if failed else "success",
+        "atomic": atomic,
+        "applied": sum(1 for result in results if result["status"] == "success"),
+        "failed": sum(1 for result in results if result["status"] == "error"),
+        "results": results,
+        "changes": changes,
+    }
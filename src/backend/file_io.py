@@ -0,0 +1,281 @@
+"""Helpers for serving and storing workspace files.
+
+Reads are served without holding whole files in memory: content types are
+sniffed from the first bytes, ranges are streamed in fixed-size chunks, and
+validators (ETags) come from ``os.stat`` so conditional requests cost no I/O
+beyond the stat itself.
+
+Writes are atomic (temp file + fsync + rename) and versioned: the version of a
+file is derived from its mtime and size, and a write can be made conditional
+on the version the client last saw.
+"""
+import codecs
+import mimetypes
+import os
+import re
+import threading
+import weakref
+from typing import Iterator, List, Optional, Tuple
+from uuid import uuid4
+
+from fastapi import HTTPException
+
+SNIFF_BYTES = 8192
+READ_CHUNK_SIZE = 64 * 1024
+TEMP_FILE_SUFFIX = ".tmp"
+
+# ".<target>.scribe-<uuid>.tmp" (atomic writes) and ".scribe-batch-<uuid>.tmp"
+# (batch staging); user files that merely look temporary are not matched
+_TEMP_NAME_RE = re.compile(r"\.(?:.+\.scribe|scribe-batch)-[0-9a-f]{32}" + re.escape(TEMP_FILE_SUFFIX))
+
+# Read once at import: os.umask can only be queried by setting it, which is not thread-safe
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+# (offset, signature, content type) for common binary formats
+_MAGIC_SIGNATURES = [
+    (0, b"\x89PNG\r\n\x1a\n", "image/png"),
+    (0, b"\xff\xd8\xff", "image/jpeg"),
+    (0, b"GIF87a", "image/gif"),
+    (0, b"GIF89a", "image/gif"),
+    (8, b"WEBP", "image/webp"),
+    (0, b"BM", "image/bmp"),
+    (0, b"%PDF-", "application/pdf"),
+    (0, b"PK\x03\x04", "application/zip"),
+    (0, b"\x1f\x8b", "application/gzip"),
+    (0, b"OggS", "audio/ogg"),
+    (0, b"ID3", "audio/mpeg"),
+    (8, b"WAVE", "audio/wav"),
+    (4, b"ftyp", "video/mp4"),
+    (0, b"\x1a\x45\xdf\xa3", "video/webm"),
+]
+
+
+def looks_like_text(head: bytes) -> bool:
+    """True if the leading bytes are NUL-free, valid (possibly truncated) UTF-8"""
+    if b"\x00" in head:
+        return False
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
+def sniff_content_type(head: bytes, filename: str) -> Tuple[str, bool]:
+    """Content type and text-ness of a file from its first bytes, falling back to its name"""
+    for offset, signature, content_type in _MAGIC_SIGNATURES:
+        if head[offset:offset + len(signature)] == signature:
+            return content_type, False
+    is_text = looks_like_text(head)
+    guessed, _ = mimetypes.guess_type(filename)
+    if is_text:
+        if guessed and (guessed.startswith("text/") or guessed in ("application/json", "application/javascript")):
+            return f"{guessed}; charset=utf-8", True
+        return "text/plain; charset=utf-8", True
+    return guessed or "application/octet-stream", False
+
+
+def read_head(full_path: str, size: int = SNIFF_BYTES) -> bytes:
+    with open(full_path, "rb") as f:
+        return f.read(size)
+
+
+def file_version(stats: os.stat_result) -> str:
+    """Version token from mtime and size, cheap enough to compute on every request"""
+    return f"{stats.st_mtime_ns:x}-{stats.st_size:x}"
+
+
+def file_etag(stats: os.stat_result) -> str:
+    return f'W/"{file_version(stats)}"'
+
+
+# Marks the ETag of the JSON form of /api/files/read, so it never matches the raw file's
+JSON_ETAG_SUFFIX = "-text"
+
+
+def json_etag(etag: str) -> str:
+    return etag[:-1] + JSON_ETAG_SUFFIX + '"'
+
+
+def version_from_tag(tag: str) -> str:
+    """Accept a bare version or any ETag form of it (weak, quoted, JSON variant)"""
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    tag = tag.strip('"')
+    if tag.endswith(JSON_ETAG_SUFFIX):
+        return tag[:-len(JSON_ETAG_SUFFIX)]
+    return tag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def parse_byte_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single ``bytes=`` range into inclusive (start, end).
+
+    Returns None when the header is absent or not a single byte range, in which
+    case the whole file is served. Raises 416 if the range cannot be satisfied.
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    start_text, _, end_text = range_header[len("bytes="):].strip().partition("-")
+    try:
+        if start_text:
+            start = int(start_text)
+            end = int(end_text) if end_text else size - 1
+        else:
+            # Suffix range: the last N bytes
+            length = int(end_text)
+            if length <= 0:
+                raise ValueError
+            start, end = max(0, size - length), size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return start, min(end, size - 1)
+
+
+def iter_file_range(full_path: str, start: int, end: int, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield bytes ``start``..``end`` (inclusive) of a file in bounded chunks"""
+    remaining = end - start + 1
+    with open(full_path, "rb") as f:
+        f.seek(start)
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+class VersionConflict(Exception):
+    """The file changed since the version the client based its write on"""
+
+    def __init__(self, current_version: Optional[str]):
+        super().__init__(f"File has changed (current version: {current_version})")
+        self.current_version = current_version
+
+
+_path_locks: "weakref.WeakValueDictionary[str, threading.Lock]" = weakref.WeakValueDictionary()
+_path_locks_guard = threading.Lock()
+
+
+def path_lock(full_path: str) -> threading.Lock:
+    """Lock serializing check-and-write sequences on one file within this process"""
+    key = os.path.normcase(os.path.abspath(full_path))
+    with _path_locks_guard:
+        lock = _path_locks.get(key)
+        if lock is None:
+            lock = threading.Lock()
+            _path_locks[key] = lock
+        return lock
+
+
+def current_version(full_path: str) -> Optional[str]:
+    try:
+        return file_version(os.stat(full_path))
+    except FileNotFoundError:
+        return None
+
+
+def check_version(full_path: str, base_version: Optional[str]):
+    """Raise VersionConflict unless the file is still at ``base_version`` (None skips the check)"""
+    if base_version is None:
+        return
+    version = current_version(full_path)
+    if version != version_from_tag(base_version):
+        raise VersionConflict(version)
+
+
+def _fsync_directory(directory: str):
+    if os.name != "posix":
+        return  # Directories cannot be opened for fsync on Windows
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write_bytes(full_path: str, data: bytes) -> str:
+    """Replace a file's content atomically and durably; returns the new version.
+
+    The data goes to a temp file in the same directory, is fsynced, and is then
+    renamed over the target, so readers and crashes see either the old or the
+    new content, never a truncated file. Existing permissions are kept.
+    """
+    directory = os.path.dirname(full_path) or "."
+    temp_path = os.path.join(directory, f".{os.path.basename(full_path)}.scribe-{uuid4().hex}{TEMP_FILE_SUFFIX}")
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0), 0o600)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            os.chmod(temp_path, os.stat(full_path).st_mode & 0o7777)
+        except FileNotFoundError:
+            os.chmod(temp_path, 0o666 & ~_UMASK)
+        os.replace(temp_path, full_path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    _fsync_directory(directory)
+    return file_version(os.stat(full_path))
+
+
+def is_atomic_write_temp(path: str) -> bool:
+    """True for the hidden temp files atomic_write_bytes renames into place (and staging directories)"""
+    return _TEMP_NAME_RE.fullmatch(os.path.basename(path)) is not None
+
+
+def make_staging_dir(parent: str) -> str:
+    """Create a hidden directory under ``parent`` that is_atomic_write_temp recognises"""
+    path = os.path.join(parent, f".scribe-batch-{uuid4().hex}{TEMP_FILE_SUFFIX}")
+    os.mkdir(path, 0o700)
+    return path
+
+
+def in_temp_area(rel_path: str) -> bool:
+    """True if any component of a path is one of our hidden temp files or staging directories"""
+    return any(is_atomic_write_temp(part) for part in rel_path.replace("\\", "/").split("/"))
+
+
+def atomic_write_text(full_path: str, text: str) -> str:
+    return atomic_write_bytes(full_path, text.encode("utf-8"))
+
+
+def apply_text_edits(text: str, edits: List[Tuple[int, int, str]]) -> str:
+    """Apply non-overlapping (start, end, replacement) edits to ``text``.
+
+    Offsets are UTF-16 code units into the original text, which is how
+    JavaScript strings index, so browser-computed offsets apply unchanged.
+    """
+    encoded = text.encode("utf-16-le")
+    length = len(encoded) // 2
+    previous_start = None
+    for start, end, replacement in sorted(edits, key=lambda edit: edit[0], reverse=True):
+        if not 0 <= start <= end <= length:
+            raise ValueError(f"Edit range {start}-{end} is outside the document (length {length})")
+        if previous_start is not None and end > previous_start:
+            raise ValueError("Edits must not overlap")
+        encoded = encoded[:start * 2] + replacement.encode("utf-16-le") + encoded[end * 2:]
+        previous_start = start
+    try:
+        return encoded.decode("utf-16-le")
+    except UnicodeDecodeError:
+        raise ValueError("Edit offsets split a surrogate pair")
@@ -0,0 +1,216 @@
+"""Registry of images uploaded to the Gemini Files API, keyed by content hash.
+
+Analysing an image needs it uploaded to Gemini first, and the upload used to
+happen on every request. The registry remembers each upload under the SHA-256
+of the file's bytes (and the API key it was made with) until shortly before
+the remote file expires, so follow-up questions about the same image, or the
+same image saved under another name, reuse the existing file URI and skip the
+upload round trip.
+
+Entries are persisted to ``GEMINI_FILE_REGISTRY_PATH`` so they survive a
+restart. A background sweep drops expired entries, and entries evicted to keep
+the registry within ``GEMINI_FILE_REGISTRY_MAX`` have their remote file
+deleted instead of being left to pile up until Gemini expires them.
+
+Settings:
+    GEMINI_FILE_REGISTRY_PATH   JSON file for the registry (default "gemini_files.json"; empty keeps it in memory)
+    GEMINI_FILE_REGISTRY_MAX    uploads remembered at once (default 500)
+    GEMINI_FILE_TTL             seconds an upload is assumed to live when Gemini gives no expiry (default 172800)
+    GEMINI_FILE_EXPIRY_MARGIN   seconds before expiry at which an upload is no longer reused (default 3600)
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+GEMINI_FILE_REGISTRY_PATH = os.getenv("GEMINI_FILE_REGISTRY_PATH", "gemini_files.json")
+GEMINI_FILE_REGISTRY_MAX = int(os.getenv("GEMINI_FILE_REGISTRY_MAX", "500"))
+GEMINI_FILE_TTL = float(os.getenv("GEMINI_FILE_TTL", str(48 * 3600)))
+GEMINI_FILE_EXPIRY_MARGIN = float(os.getenv("GEMINI_FILE_EXPIRY_MARGIN", "3600"))
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def api_key_fingerprint(api_key: str) -> str:
+    """Short hash identifying the project an upload belongs to, without storing the key"""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+def _expiry_of(uploaded_file, uploaded_at: float) -> float:
+    expiration = getattr(uploaded_file, "expiration_time", None)
+    if expiration is not None:
+        try:
+            return expiration.timestamp()
+        except (AttributeError, OverflowError, ValueError):
+            pass
+    return uploaded_at + GEMINI_FILE_TTL
+
+
+class GeminiFileRegistry:
+    """Content hash -> live Gemini upload ``{"name", "uri", "mime_type", "expires", "uploaded"}``"""
+
+    def __init__(self, path: Optional[str] = GEMINI_FILE_REGISTRY_PATH, max_entries: int = GEMINI_FILE_REGISTRY_MAX):
+        self.path = path
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()  # Least recently used first
+        self._lock = threading.Lock()
+        self._upload_locks: Dict[str, asyncio.Lock] = {}
+        # (path, mtime_ns, size) -> SHA-256, so unchanged assets are not re-hashed on every request
+        self._hashes: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+        # Remote files evicted while still alive, deleted by the next sweep
+        self._orphans: List[dict] = []
+        self.uploads = 0
+        self.reuses = 0
+        if path:
+            self._load()
+
+    # --- Persistence ---
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable Gemini file registry {self.path}: {e}")
+            return
+        now = time.time()
+        for key, entry in sorted(entries.items(), key=lambda item: item[1].get("last_used", 0)):
+            if entry.get("expires", 0) > now:
+                self._entries[key] = entry
+
+    def _save(self):
+        if not self.path:
+            return
+        with self._lock:
+            snapshot = dict(self._entries)
+        temp_path = f"{self.path}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logging.error(f"Could not save Gemini file registry {self.path}: {e}", exc_info=True)
+
+    # --- Hashing ---
+
+    def content_hash(self, file_path: str) -> str:
+        stats = os.stat(file_path)
+        version = (os.path.abspath(file_path), stats.st_mtime_ns, stats.st_size)
+        with self._lock:
+            known = self._hashes.get(version)
+            if known:
+                self._hashes.move_to_end(version)
+                return known
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+                digest.update(block)
+        content_hash = digest.hexdigest()
+        with self._lock:
+            self._hashes[version] = content_hash
+            while len(self._hashes) > self.max_entries:
+                self._hashes.popitem(last=False)
+        return content_hash
+
+    # --- Entries ---
+
+    def lookup(self, key: str) -> Optional[dict]:
+        """A reusable upload for ``key``: one that is not about to expire"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry["expires"] - GEMINI_FILE_EXPIRY_MARGIN <= time.time():
+                return None
+            entry["last_used"] = time.time()
+            self._entries.move_to_end(key)
+            return entry
+
+    def record(self, key: str, uploaded_file) -> dict:
+        now = time.time()
+        entry = {
+            "name": uploaded_file.name,
+            "uri": uploaded_file.uri,
+            "mime_type": uploaded_file.mime_type,
+            "expires": _expiry_of(uploaded_file, now),
+            "uploaded": now,
+            "last_used": now,
+        }
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._orphans.append(evicted)
+        return entry
+
+    def forget(self, key: str):
+        """Drop an entry whose remote file turned out to be unusable"""
+        with self._lock:
+            self._entries.pop(key, None)
+        self._save()
+
+    async def get_or_upload(self, api_key: str, file_path: str,
+                            upload: Callable[[str], Awaitable]) -> Tuple[dict, bool, str]:
+        """The Gemini upload of ``file_path``, uploading with ``await upload(file_path)`` only on a miss.
+
+        Returns ``(entry, reused, key)``. Concurrent requests for the same
+        content wait for a single upload.
+        """
+        content_hash = await asyncio.to_thread(self.content_hash, file_path)
+        key = f"{api_key_fingerprint(api_key)}:{content_hash}"
+        entry = self.lookup(key)
+        if entry is not None:
+            self.reuses += 1
+            return entry, True, key
+        lock = self._upload_locks.setdefault(key, asyncio.Lock())
+        try:
+            async with lock:
+                entry = self.lookup(key)
+                if entry is not None:
+                    self.reuses += 1
+                    return entry, True, key
+                uploaded_file = await upload(file_path)
+                self.uploads += 1
+                entry = self.record(key, uploaded_file)
+        finally:
+            if not lock.locked():
+                self._upload_locks.pop(key, None)
+        await asyncio.to_thread(self._save)
+        return entry, False, key
+
+    # --- Cleanup ---
+
+    def sweep(self, delete_remote: Optional[Callable[[str], None]] = None) -> int:
+        """Drop expired entries and delete evicted-but-live remote files; returns entries removed"""
+        now = time.time()
+        with self._lock:
+            expired = [key for key, entry in self._entries.items() if entry["expires"] <= now]
+            for key in expired:
+                del self._entries[key]
+            orphans, self._orphans = self._orphans, []
+        for entry in orphans:
+            if delete_remote is None or entry["expires"] <= now:
+                continue
+            try:
+                delete_remote(entry["name"])
+            except Exception as e:
+                logging.warning(f"Could not delete Gemini file {entry['name']}: {e}")
+        if expired or orphans:
+            self._save()
+        return len(expired) + len(orphans)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "uploads": self.uploads,
+                "reuses": self.reuses,
+                "pending_deletes": len(self._orphans),
+            }
@@ -0,0 +1,223 @@
+"""Disk-backed cache of LLM responses.
+
+Responses are stored in SQLite under the SHA-256 of (provider, model,
+generation config, full prompt), so re-running a canvas flow or asking the
+same question about the same document returns the stored answer in
+milliseconds instead of calling the provider again. Entries expire after a
+per-endpoint TTL, and the least recently used ones are evicted once the
+cached responses exceed ``LLM_CACHE_MAX_BYTES``.
+
+Clients opt out per request with ``Cache-Control: no-store`` (or
+``X-LLM-Cache: bypass``), which neither reads nor writes the cache, or
+``Cache-Control: no-cache`` (or ``X-LLM-Cache: refresh``), which skips the
+stored answer and replaces it with a fresh one.
+
+Settings:
+    LLM_CACHE_PATH          SQLite database file (default "llm_cache.sqlite3"; empty disables the cache)
+    LLM_CACHE_MAX_BYTES     total size of cached responses (default 64 MB)
+    LLM_CACHE_DEFAULT_TTL   seconds an entry lives when its endpoint has no TTL (default 86400)
+    LLM_CACHE_TTLS          per-endpoint TTLs, e.g. "ai_chat=600,generate_title=604800"
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite3")
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+LLM_CACHE_DEFAULT_TTL = float(os.getenv("LLM_CACHE_DEFAULT_TTL", "86400"))
+
+DEFAULT_TTLS = {
+    "ai_chat": 3600,
+    "generate_title": 7 * 86400,
+    "youtube_analyze": 7 * 86400,
+    "youtube_extract_code": 7 * 86400,
+    "pdf_ask": 86400,
+}
+
+
+def _parse_ttls(value: str) -> Dict[str, float]:
+    ttls: Dict[str, float] = dict(DEFAULT_TTLS)
+    for item in value.split(","):
+        name, _, seconds = item.partition("=")
+        if not name.strip():
+            continue
+        try:
+            ttls[name.strip()] = float(seconds)
+        except ValueError:
+            logging.warning(f"Ignoring invalid LLM_CACHE_TTLS entry {item!r}")
+    return ttls
+
+
+LLM_CACHE_TTLS = _parse_ttls(os.getenv("LLM_CACHE_TTLS", ""))
+
+# How often (in writes) expired entries are swept from the database
+_PURGE_EVERY = 100
+
+
+def cache_key(provider: str, model: str, config: Optional[Dict[str, Any]], prompt: Any) -> str:
+    """SHA-256 over everything that determines a response; ``prompt`` may be text or a message list"""
+    material = json.dumps([provider, model, config or {}, prompt], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(material.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+@dataclass
+class CacheLookup:
+    """Outcome of looking a call up: ``status`` is "hit", "miss", "refresh" or "bypass"."""
+    key: Optional[str]  # None when the response must not be stored
+    endpoint: str
+    status: str
+    text: Optional[str] = None
+
+
+class LLMResponseCache:
+    """SQLite-backed, size-bounded LRU cache of response texts with per-endpoint TTLs"""
+
+    def __init__(self, path: Optional[str] = LLM_CACHE_PATH, max_bytes: int = LLM_CACHE_MAX_BYTES,
+                 ttls: Optional[Dict[str, float]] = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttls = ttls if ttls is not None else LLM_CACHE_TTLS
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._total_bytes = 0
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        if path:
+            self._open()
+
+    @property
+    def enabled(self) -> bool:
+        return self._db is not None
+
+    def _open(self):
+        try:
+            db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, endpoint TEXT NOT NULL, response TEXT NOT NULL, size INTEGER NOT NULL,"
+                " created REAL NOT NULL, expires REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+            db.execute("DELETE FROM responses WHERE expires <= ?", (time.time(),))
+            self._total_bytes = db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        except sqlite3.Error as e:
+            logging.error(f"Could not open LLM response cache {self.path}: {e}", exc_info=True)
+            return
+        self._db = db
+
+    @property
+    def total_bytes(self) -> int:
+        """Size of the cached responses, kept up to date by writes (no query, no lock)"""
+        return self._total_bytes
+
+    def ttl_for(self, endpoint: str) -> float:
+        return self.ttls.get(endpoint, LLM_CACHE_DEFAULT_TTL)
+
+    def get(self, key: str) -> Optional[str]:
+        if not self._db:
+            return None
+        now = time.time()
+        with self._lock:
+            try:
+                row = self._db.execute("SELECT response, expires FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is None or row[1] <= now:
+                    self.misses += 1
+                    return None
+                self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            except sqlite3.Error as e:
+                logging.error(f"LLM cache lookup failed: {e}", exc_info=True)
+                return None
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, endpoint: str, response: str):
+        ttl = self.ttl_for(endpoint)
+        if not self._db or ttl <= 0:
+            return
+        size = len(response.encode("utf-8", "surrogatepass"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            try:
+                previous = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, endpoint, response, size, created, expires, last_used)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, endpoint, response, size, now, now + ttl, now),
+                )
+                self._total_bytes += size - (previous[0] if previous else 0)
+                self._writes += 1
+                if self._writes % _PURGE_EVERY == 0:
+                    self._purge_expired(now)
+                if self._total_bytes > self.max_bytes:
+                    self._evict()
+            except sqlite3.Error as e:
+                logging.error(f"LLM cache write failed: {e}", exc_info=True)
+
+    def _purge_expired(self, now: float):
+        freed = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses WHERE expires <= ?", (now,)).fetchone()[0]
+        if freed:
+            self._db.execute("DELETE FROM responses WHERE expires <= ?", (now,))
+            self._total_bytes -= freed
+
+    def _evict(self):
+        """Drop least recently used entries until the cache is back under 90% of its budget"""
+        target = self.max_bytes * 0.9
+        rows = self._db.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall()
+        evicted = []
+        for key, size in rows:
+            if self._total_bytes <= target:
+                break
+            evicted.append((key,))
+            self._total_bytes -= size
+        self._db.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+    def clear(self):
+        if not self._db:
+            return
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._total_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] if self._db else 0
+            return {
+                "enabled": self.enabled,
+                "entries": entries,
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+def cache_mode(headers) -> str:
+    """"use", "refresh" or "bypass" for a request, from its Cache-Control / X-LLM-Cache headers"""
+    requested = (headers.get("x-llm-cache") or "").strip().lower()
+    if requested in ("bypass", "off", "no-store"):
+        return "bypass"
+    if requested in ("refresh", "no-cache"):
+        return "refresh"
+    directives = {part.strip().lower() for part in (headers.get("cache-control") or "").split(",")}
+    if "no-store" in directives:
+        return "bypass"
+    if "no-cache" in directives:
+        return "refresh"
+    return "use"
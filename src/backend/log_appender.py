@@ -0,0 +1,191 @@
+"""Buffered, rotating appender behind ``/api/write-log`` and ``/api/write-logs``.
+
+Frontend log entries used to be written by opening the day's
+``scribe_ai_<date>.log``, appending one entry and closing it again, on the
+event loop, for every request. ``LogAppender`` buffers entries in memory and a
+single writer thread keeps the current file open, writing the buffer out every
+``CLIENT_LOG_FLUSH_INTERVAL`` seconds, or sooner once
+``CLIENT_LOG_BUFFER_BYTES`` are waiting.
+
+A new file is started when the date changes; a file that reaches
+``CLIENT_LOG_MAX_BYTES`` is renamed to ``scribe_ai_<date>.<n>.log`` and
+writing continues in a fresh ``scribe_ai_<date>.log``. If the writer falls
+more than ``CLIENT_LOG_MAX_PENDING_BYTES`` behind, ``append`` refuses new
+entries instead of growing without bound.
+
+Settings:
+    CLIENT_LOG_DIR                directory for the log files (default "logs")
+    CLIENT_LOG_FLUSH_INTERVAL     seconds between writes of the buffer (default 1.0)
+    CLIENT_LOG_BUFFER_BYTES       buffered bytes that trigger an early write (default 256 KB)
+    CLIENT_LOG_MAX_BYTES          size at which a day's file is rotated (default 50 MB)
+    CLIENT_LOG_MAX_PENDING_BYTES  buffered bytes beyond which entries are refused (default 8 MB)
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+CLIENT_LOG_DIR = os.getenv("CLIENT_LOG_DIR", "logs")
+CLIENT_LOG_FLUSH_INTERVAL = float(os.getenv("CLIENT_LOG_FLUSH_INTERVAL", "1.0"))
+CLIENT_LOG_BUFFER_BYTES = int(os.getenv("CLIENT_LOG_BUFFER_BYTES", str(256 * 1024)))
+CLIENT_LOG_MAX_BYTES = int(os.getenv("CLIENT_LOG_MAX_BYTES", str(50 * 1024 * 1024)))
+CLIENT_LOG_MAX_PENDING_BYTES = int(os.getenv("CLIENT_LOG_MAX_PENDING_BYTES", str(8 * 1024 * 1024)))
+
+LOG_FILE_PREFIX = "scribe_ai_"
+
+
+class LogAppender:
+    """Buffers text appended from request handlers and writes it from one thread"""
+
+    def __init__(self, directory: str = CLIENT_LOG_DIR, flush_interval: float = CLIENT_LOG_FLUSH_INTERVAL,
+                 buffer_bytes: int = CLIENT_LOG_BUFFER_BYTES, max_bytes: int = CLIENT_LOG_MAX_BYTES,
+                 max_pending_bytes: int = CLIENT_LOG_MAX_PENDING_BYTES):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.buffer_bytes = buffer_bytes
+        self.max_bytes = max_bytes
+        self.max_pending_bytes = max_pending_bytes
+        self._pending: List[str] = []
+        self._pending_bytes = 0
+        self._condition = threading.Condition()
+        self._closed = False
+        self._file = None
+        self._file_date: Optional[str] = None
+        self._file_bytes = 0
+        self._appended = 0
+        self.entries_written = 0
+        self.bytes_written = 0
+        self.failed = 0
+        self.rejected = 0
+        self.rotations = 0
+        self._thread: Optional[threading.Thread] = None
+
+    def _ensure_started(self):
+        # Started on first use so importing the backend does not spawn a thread nobody needs
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="client-log-writer", daemon=True)
+            self._thread.start()
+
+    def append(self, texts: Iterable[str]) -> bool:
+        """Queue ``texts`` for writing; False if the writer is too far behind to take them"""
+        texts = [text for text in texts if text]
+        size = sum(len(text) for text in texts)
+        with self._condition:
+            if self._closed or self._pending_bytes + size > self.max_pending_bytes:
+                self.rejected += len(texts)
+                return False
+            self._ensure_started()
+            self._pending.extend(texts)
+            self._pending_bytes += size
+            self._appended += len(texts)
+            if self._pending_bytes >= self.buffer_bytes:
+                self._condition.notify()
+        return True
+
+    # --- Writer thread ---
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._closed and self._pending_bytes < self.buffer_bytes:
+                    self._condition.wait(self.flush_interval)
+                texts, self._pending = self._pending, []
+                self._pending_bytes = 0
+                closed = self._closed
+            if texts:
+                try:
+                    self._write(texts)
+                except OSError as e:
+                    logging.error(f"Could not write client log entries: {e}", exc_info=True)
+                    self._close_file()
+                    with self._condition:
+                        self.failed += len(texts)
+                        self._condition.notify_all()
+            if closed:
+                self._close_file()
+                return
+
+    def _path(self, date: str) -> str:
+        return os.path.join(self.directory, f"{LOG_FILE_PREFIX}{date}.log")
+
+    def _open(self, date: str):
+        self._close_file()
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(date)
+        self._file = open(path, "ab")
+        self._file_date = date
+        self._file_bytes = os.path.getsize(path)
+
+    def _rotate(self):
+        """Move the full file aside as scribe_ai_<date>.<n>.log and start an empty one"""
+        date = self._file_date
+        self._close_file()
+        number = 1
+        while os.path.exists(os.path.join(self.directory, f"{LOG_FILE_PREFIX}{date}.{number}.log")):
+            number += 1
+        os.replace(self._path(date), os.path.join(self.directory, f"{LOG_FILE_PREFIX}{date}.{number}.log"))
+        self.rotations += 1
+        self._open(date)
+
+    def _write(self, texts: List[str]):
+        date = datetime.now().strftime("%Y-%m-%d")
+        if self._file is None or date != self._file_date:
+            self._open(date)
+        data = "".join(texts).encode("utf-8", "surrogatepass")
+        if self._file_bytes and self._file_bytes + len(data) > self.max_bytes:
+            self._rotate()
+        self._file.write(data)
+        self._file.flush()
+        self._file_bytes += len(data)
+        with self._condition:
+            self.entries_written += len(texts)
+            self.bytes_written += len(data)
+            self._condition.notify_all()
+
+    def _close_file(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+        self._file = None
+        self._file_date = None
+
+    # --- Lifecycle ---
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until everything appended so far has been written (or has failed to be)"""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            target = self._appended
+            while self.entries_written + self.failed < target:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._thread is None or not self._thread.is_alive():
+                    return False
+                # Wakes the writer, which then writes without waiting out the flush interval
+                self._condition.notify_all()
+                self._condition.wait(min(remaining, 0.05))
+        return True
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {
+                "pending_entries": len(self._pending),
+                "pending_bytes": self._pending_bytes,
+                "entries_written": self.entries_written,
+                "bytes_written": self.bytes_written,
+                "rejected": self.rejected,
+                "failed": self.failed,
+                "rotations": self.rotations,
+                "current_file": self._path(self._file_date) if self._file_date else None,
+            }
+
+    def close(self, timeout: float = 5.0):
+        """Write out what is buffered and stop the writer"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
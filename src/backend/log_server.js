@@ -71,7 +71,8 @@ const memoryLogs = {};
 
 // Initialize Express middleware
 app.use(cors());
-app.use(express.json());
+// Batches from the Python shipper arrive gzip-encoded; express.json inflates them, the limit applies after inflation
+app.use(express.json({ limit: '10mb' }));
 
 // Initialize memory logs and ensure log directory exists
 function initializeLogSystem() {
@@ -209,6 +210,62 @@ app.get('/ascii', (req, res) => {
   res.type('text/plain').send(SCRIBE_ASCII);
 });
 
+// Map a request's type/application to one of LOG_SOURCES
+function resolveSourceType(type = 'worker', application = null) {
+  let sourceType = String(type).toLowerCase();
+  
+  // Map application-specific logs
+  if (application) {
+    switch(String(application).toLowerCase()) {
+      case 'python':
+      case 'fastapi':
+      case 'uvicorn':
+        sourceType = 'python';
+        break;
+      case 'node':
+      case 'express':
+      case 'vite':
+        sourceType = 'nodejs';
+        break;
+      case 'filesystem':
+      case 'files':
+        sourceType = 'filesystem';
+        break;
+      case 'supabase':
+      case 'postgres':
+      case 'database':
+        sourceType = 'supabase';
+        break;
+    }
+  }
+  
+  // Validate source type
+  if (!LOG_SOURCES[sourceType]) {
+    sourceType = 'worker'; // Default to worker if invalid source
+  }
+  return sourceType;
+}
+
+// Parse, store, persist and broadcast a list of log entries with a single file write
+function ingestLogs(logs, sourceType) {
+  const parsedLogs = logs.map(log => parseLogEntry(log, sourceType));
+  
+  // Store in memory
+  parsedLogs.forEach(parsedLog => addLogToMemory(sourceType, parsedLog));
+  
+  // Write to file
+  const content = parsedLogs.map(parsedLog => JSON.stringify(parsedLog) + '\n').join('');
+  fs.appendFileSync(LOG_SOURCES[sourceType].file, content);
+  
+  // Notify clients
+  parsedLogs.forEach(parsedLog => sendEventToClients({
+    type: 'log',
+    source: sourceType,
+    payload: parsedLog
+  }));
+  return parsedLogs.length;
+}
+
 // Main log ingestion endpoint
 app.post('/log', (req, res) => {
   try {
@@ -218,60 +275,30 @@ app.post('/log', (req, res) => {
       return res.status(400).json({ error: 'Log entry is required' });
     }
     
-    // Determine the source type
-    let sourceType = type.toLowerCase();
+    ingestLogs([log], resolveSourceType(type, application));
     
-    // Map application-specific logs
-    if (application) {
-      switch(application.toLowerCase()) {
-        case 'python':
-        case 'fastapi':
-        case 'uvicorn':
-          sourceType = 'python';
-          break;
-        case 'node':
-        case 'express':
-        case 'vite':
-          sourceType = 'nodejs';
-          break;
-        case 'filesystem':
-        case 'files':
-          sourceType = 'filesystem';
-          break;
-        case 'supabase':
-        case 'postgres':
-        case 'database':
-          sourceType = 'supabase';
-          break;
-      }
-    }
+    return res.status(200).json({ success: true });
+  } catch (error) {
+    console.error('Error writing log:', error);
+    return res.status(500).json({ error: 'Failed to write log' });
+  }
+});
+
+// Batch ingestion endpoint: { logs: [entry, ...], type, application }, optionally gzip-encoded
+app.post('/log/batch', (req, res) => {
+  try {
+    const { logs, type = 'worker', application = null } = req.body;
     
-    // Validate source type
-    if (!LOG_SOURCES[sourceType]) {
-      sourceType = 'worker'; // Default to worker if invalid source
+    if (!Array.isArray(logs)) {
+      return res.status(400).json({ error: 'An array of log entries is required' });
     }
     
-    // Parse and validate log entry
-    const parsedLog = parseLogEntry(log, sourceType);
-    
-    // Store in memory
-    addLogToMemory(sourceType, parsedLog);
-    
-    // Write to file
-    const logEntry = JSON.stringify(parsedLog) + '\n';
-    fs.appendFileSync(LOG_SOURCES[sourceType].file, logEntry);
+    const accepted = ingestLogs(logs.filter(Boolean), resolveSourceType(type, application));
     
-    // Notify clients
-    sendEventToClients({
-      type: 'log',
-      source: sourceType,
-      payload: parsedLog
-    });
-    
-    return res.status(200).json({ success: true });
+    return res.status(200).json({ success: true, accepted });
   } catch (error) {
-    console.error('Error writing log:', error);
-    return res.status(500).json({ error: 'Failed to write log' });
+    console.error('Error writing log batch:', error);
+    return res.status(500).json({ error: 'Failed to write log batch' });
   }
 });
 
@@ -0,0 +1,362 @@
+"""Ships Python log records to the Node.js log server in compressed batches.
+
+Records used to be posted one request at a time from an unbounded queue, so a
+burst of INFO lines meant thousands of tiny requests and a queue that grew
+without limit. ``LogShipper`` instead collects records into batches of up to
+``LOG_SHIP_BATCH_SIZE`` (or whatever arrived within ``LOG_SHIP_FLUSH_INTERVAL``
+seconds), gzips each batch and posts it to the log server's ``/log/batch``
+endpoint over one keep-alive connection.
+
+The queue is bounded. Once it is more than half full, records below WARNING
+are sampled at ``LOG_SHIP_SAMPLE_RATE``; once it is full, ``LOG_SHIP_OVERFLOW``
+decides whether the new record ("drop_new") or the oldest queued one
+("drop_oldest") is discarded. Dropped records are counted and reported to the
+log server in the next batch.
+
+While the log server is unreachable, batches are appended to a local JSON
+lines spool (at most ``LOG_SPOOL_MAX_BYTES``) and replayed, oldest first, once
+it answers again.
+
+requests is imported by the worker thread when it sends its first batch,
+not when the backend starts.
+
+Settings:
+    LOG_SERVER_URL            log server ingestion endpoint (default "http://localhost:9999/log")
+    LOG_SHIP_BATCH_SIZE       records per batch (default 200)
+    LOG_SHIP_FLUSH_INTERVAL   seconds a partial batch waits before it is sent (default 1.0)
+    LOG_SHIP_QUEUE_SIZE       records waiting to be shipped at most (default 10000)
+    LOG_SHIP_OVERFLOW         "drop_new" or "drop_oldest" when the queue is full (default "drop_new")
+    LOG_SHIP_SAMPLE_RATE      fraction of sub-WARNING records kept while the queue is over half full (default 1.0)
+    LOG_SHIP_TIMEOUT          seconds per batch request (default 2.0)
+    LOG_SPOOL_MAX_BYTES       size of the local spool (default 20 MB)
+"""
+import gzip
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import traceback
+from datetime import datetime
+from typing import List, Optional
+
+LOG_SERVER_URL = os.getenv("LOG_SERVER_URL", "http://localhost:9999/log")
+LOG_SHIP_BATCH_SIZE = int(os.getenv("LOG_SHIP_BATCH_SIZE", "200"))
+LOG_SHIP_FLUSH_INTERVAL = float(os.getenv("LOG_SHIP_FLUSH_INTERVAL", "1.0"))
+LOG_SHIP_QUEUE_SIZE = int(os.getenv("LOG_SHIP_QUEUE_SIZE", "10000"))
+LOG_SHIP_OVERFLOW = os.getenv("LOG_SHIP_OVERFLOW", "drop_new")
+LOG_SHIP_SAMPLE_RATE = float(os.getenv("LOG_SHIP_SAMPLE_RATE", "1.0"))
+LOG_SHIP_TIMEOUT = float(os.getenv("LOG_SHIP_TIMEOUT", "2.0"))
+LOG_SPOOL_MAX_BYTES = int(os.getenv("LOG_SPOOL_MAX_BYTES", str(20 * 1024 * 1024)))
+
+OVERFLOW_POLICIES = ("drop_new", "drop_oldest")
+
+# Seconds between delivery attempts while the log server is down, doubling up to the maximum
+_RETRY_MIN = 1.0
+_RETRY_MAX = 30.0
+# Spooled batches replayed per idle tick, so a large spool does not hold up fresh records
+_REPLAY_BATCHES_PER_TICK = 10
+
+_STOP = object()
+
+
+def format_traceback(tb):
+    """Format a traceback object into a list of strings"""
+    if tb:
+        return traceback.format_tb(tb)
+    return []
+
+
+def record_to_entry(record: logging.LogRecord) -> dict:
+    """The JSON document the log server stores for ``record``"""
+    entry = {
+        "timestamp": datetime.fromtimestamp(record.created).isoformat(),
+        "level": record.levelname,
+        "message": record.getMessage(),
+        "source": "python",
+        "application": "python",
+        "loggerName": record.name,
+        "fileName": record.filename,
+        "lineNumber": record.lineno,
+    }
+    if record.exc_info:
+        exc_type, exc_value, exc_traceback = record.exc_info
+        if exc_type and exc_value:
+            entry["error"] = {
+                "type": exc_type.__name__,
+                "message": str(exc_value),
+                "traceback": format_traceback(exc_traceback) if exc_traceback else None,
+            }
+    return entry
+
+
+class LogShipper:
+    """Bounded queue of log records drained by one thread that ships them in gzipped batches"""
+
+    def __init__(self, url: str = LOG_SERVER_URL, spool_path: Optional[str] = None,
+                 batch_size: int = LOG_SHIP_BATCH_SIZE, flush_interval: float = LOG_SHIP_FLUSH_INTERVAL,
+                 queue_size: int = LOG_SHIP_QUEUE_SIZE, overflow: str = LOG_SHIP_OVERFLOW,
+                 sample_rate: float = LOG_SHIP_SAMPLE_RATE):
+        if overflow not in OVERFLOW_POLICIES:
+            logging.warning(f"Unknown LOG_SHIP_OVERFLOW {overflow!r}; using 'drop_new'")
+            overflow = "drop_new"
+        self.url = url
+        self.batch_url = url.rstrip("/") + "/batch"
+        self.spool_path = spool_path
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.sample_rate = sample_rate
+        self.queue: "queue.Queue" = queue.Queue(maxsize=max(1, queue_size))
+        self._high_water = self.queue.maxsize // 2
+        self._session = None  # requests.Session, created by the worker for its first batch
+        self._lock = threading.Lock()
+        self._retry_delay = 0.0
+        self._retry_at = 0.0
+        self._spool_pending = bool(spool_path) and (
+            os.path.exists(spool_path) or os.path.exists(self._replay_path))
+        self._unreported_drops = 0
+        self.shipped = 0
+        self.batches = 0
+        self.dropped = 0
+        self.sampled = 0
+        self.spooled = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self._thread = threading.Thread(target=self._run, name="log-shipper", daemon=True)
+        self._thread.start()
+
+    @property
+    def thread_id(self) -> Optional[int]:
+        return self._thread.ident
+
+    @property
+    def _replay_path(self) -> str:
+        return f"{self.spool_path}.replay"
+
+    # --- Producer side ---
+
+    def submit(self, record: logging.LogRecord):
+        """Queue ``record`` without ever blocking the caller"""
+        if (self.sample_rate < 1.0 and record.levelno < logging.WARNING
+                and self.queue.qsize() > self._high_water and random.random() >= self.sample_rate):
+            self._count_drop(sampled=True)
+            return
+        try:
+            self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+        if self.overflow == "drop_oldest":
+            try:
+                self.queue.get_nowait()
+                self.queue.put_nowait(record)
+            except (queue.Empty, queue.Full):
+                pass
+        self._count_drop()
+
+    def _count_drop(self, sampled: bool = False):
+        with self._lock:
+            if sampled:
+                self.sampled += 1
+            else:
+                self.dropped += 1
+            self._unreported_drops += 1
+
+    # --- Worker ---
+
+    def _run(self):
+        batch: List[dict] = []
+        deadline = 0.0
+        while True:
+            timeout = max(0.0, deadline - time.monotonic()) if batch else self.flush_interval
+            try:
+                record = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                record = None
+            if record is _STOP:
+                if batch:
+                    self._ship(batch)
+                return
+            if record is not None:
+                try:
+                    batch.append(record_to_entry(record))
+                except Exception as e:
+                    self.last_error = f"Unformattable log record: {e}"
+                if len(batch) == 1:
+                    deadline = time.monotonic() + self.flush_interval
+            if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._ship(batch)
+                batch = []
+            if not batch and self._spool_pending and time.monotonic() >= self._retry_at:
+                self._replay_spool()
+
+    def _ship(self, entries: List[dict]):
+        with self._lock:
+            drops, self._unreported_drops = self._unreported_drops, 0
+        if drops:
+            entries.append({
+                "timestamp": datetime.now().isoformat(),
+                "level": "WARNING",
+                "message": f"{drops} log records were dropped or sampled out while the log queue was full",
+                "source": "python",
+                "application": "python",
+                "loggerName": "log-shipper",
+            })
+        if self._spool_pending or time.monotonic() < self._retry_at:
+            # Keep spooled records ahead of newer ones; they are replayed in order once the server is back
+            self._spool(entries)
+            return
+        if self._deliver(entries):
+            self.shipped += len(entries)
+        else:
+            self._spool(entries)
+
+    def _deliver(self, entries: List[dict]) -> bool:
+        body = gzip.compress(
+            json.dumps({"logs": entries, "type": "python", "application": "python"}).encode("utf-8"),
+            compresslevel=5,
+        )
+        import requests
+        if self._session is None:
+            self._session = requests.Session()
+        try:
+            response = self._session.post(
+                self.batch_url,
+                data=body,
+                headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+                timeout=LOG_SHIP_TIMEOUT,
+            )
+            response.raise_for_status()
+        except requests.RequestException as e:
+            self.failures += 1
+            self.last_error = str(e)
+            self._retry_delay = min(_RETRY_MAX, max(_RETRY_MIN, self._retry_delay * 2))
+            self._retry_at = time.monotonic() + self._retry_delay
+            return False
+        self.batches += 1
+        self._retry_delay = 0.0
+        self._retry_at = 0.0
+        return True
+
+    # --- Spool ---
+
+    def _spool(self, entries: List[dict]):
+        if not self.spool_path:
+            self._count_lost(len(entries))
+            return
+        try:
+            size = os.path.getsize(self.spool_path) if os.path.exists(self.spool_path) else 0
+            if size >= LOG_SPOOL_MAX_BYTES:
+                self._count_lost(len(entries))
+                return
+            with open(self.spool_path, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(entry) + "\n" for entry in entries))
+        except OSError as e:
+            self.last_error = f"Could not write log spool {self.spool_path}: {e}"
+            self._count_lost(len(entries))
+            return
+        self.spooled += len(entries)
+        self._spool_pending = True
+
+    def _count_lost(self, count: int):
+        with self._lock:
+            self.dropped += count
+
+    def _replay_spool(self):
+        """Send up to a few batches from the spool, oldest first"""
+        replay_path = self._replay_path
+        try:
+            if not os.path.exists(replay_path):
+                if not os.path.exists(self.spool_path):
+                    self._spool_pending = False
+                    return
+                # New failures keep appending to the spool while this file is drained
+                os.replace(self.spool_path, replay_path)
+            with open(replay_path, "r", encoding="utf-8") as f:
+                lines = [line for line in f if line.strip()]
+        except OSError as e:
+            self.last_error = f"Could not read log spool {self.spool_path}: {e}"
+            self._retry_at = time.monotonic() + _RETRY_MAX
+            return
+        sent = 0
+        for _ in range(_REPLAY_BATCHES_PER_TICK):
+            chunk = lines[sent:sent + self.batch_size]
+            if not chunk:
+                break
+            entries = []
+            for line in chunk:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+            if entries and not self._deliver(entries):
+                break
+            sent += len(chunk)
+            self.shipped += len(entries)
+        try:
+            if sent >= len(lines):
+                os.remove(replay_path)
+                self._spool_pending = os.path.exists(self.spool_path)
+            elif sent:
+                with open(replay_path, "w", encoding="utf-8") as f:
+                    f.writelines(lines[sent:])
+        except OSError as e:
+            self.last_error = f"Could not update log spool {replay_path}: {e}"
+
+    # --- Lifecycle ---
+
+    def stats(self) -> dict:
+        spool_bytes = 0
+        if self.spool_path:
+            for path in (self.spool_path, self._replay_path):
+                try:
+                    spool_bytes += os.path.getsize(path)
+                except OSError:
+                    pass
+        with self._lock:
+            return {
+                "queue_depth": self.queue.qsize(),
+                "queue_size": self.queue.maxsize,
+                "overflow": self.overflow,
+                "sample_rate": self.sample_rate,
+                "shipped": self.shipped,
+                "batches": self.batches,
+                "dropped": self.dropped,
+                "sampled": self.sampled,
+                "spooled": self.spooled,
+                "spool_bytes": spool_bytes,
+                "failures": self.failures,
+                "last_error": self.last_error,
+            }
+
+    def close(self, timeout: float = 3.0):
+        """Ship (or spool) what is queued and stop the worker"""
+        if not self._thread.is_alive():
+            return
+        try:
+            self.queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+        if self._session is not None:
+            self._session.close()
+
+
+class ShippingLogHandler(logging.Handler):
+    """A logging handler that hands records to a ``LogShipper`` for the Node.js log server."""
+
+    def __init__(self, shipper: LogShipper):
+        super().__init__()
+        self.shipper = shipper
+
+    def emit(self, record):
+        # Records raised while shipping (e.g. urllib3 debug output) would otherwise feed back into the queue
+        if record.thread == self.shipper.thread_id:
+            return
+        try:
+            self.shipper.submit(record)
+        except Exception:
+            self.handleError(record)
@@ -1,65 +1,57 @@
-from fastapi import FastAPI, HTTPException, Response, Request, UploadFile, File, Form, Query, Body
+from fastapi import FastAPI, HTTPException, Response, Request, UploadFile, File, Form, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 from dotenv import load_dotenv  # Import load_dotenv
-import google.generativeai as genai
 from uuid import uuid4  # Import uuid4 for session IDs
 import os
 import json
 import shutil
 from pathlib import Path
-from typing import List, Optional, Dict, Union
-import tkinter as tk
-from tkinter import filedialog
-from datetime import datetime
+from typing import Callable, List, Optional, Dict, Union
 import asyncio
 import logging
-import requests
-from threading import Thread
-import queue
 import time
-import httpx
-from bs4 import BeautifulSoup
-import aiohttp
-from urllib.parse import urlparse, parse_qs
-import base64
-import io
-import traceback
-
-# Imports for Gemini image processing
-from google import genai as gemini_ai # Renamed to avoid conflict with genai used for text
-from google.genai import types as gemini_types
+from urllib.parse import urlparse, parse_qs, unquote
+import hashlib
 
 # PDF Processing Imports
-from langchain_community.document_loaders import PyPDFLoader
-from groq import Groq
+from pdf_retrieval import build_document_context
+from pdf_extract import (
+    PDFExtractionError, copy_and_hash, iter_pdf_pages, extract_pdf, join_pages, shutdown_pdf_pool,
+)
 import tempfile
 
+# Provider SDKs (google.generativeai, google.genai, groq) are imported on first use, not here
+from providers import (
+    configure_gemini, gemini_client, gemini_types, groq_client, preload as preload_providers, PROVIDER_PRELOAD,
+)
+from provider_executor import run_provider_call, stream_provider_call, shutdown_provider_pool, provider_stats
+from session_store import ChatSessionStore
+from doc_store import DocumentStore
+from web_fetch import WebFetcher, ResponseTooLarge, FetchError
+from web_crawl import crawl, SCRAPE_BATCH_MAX_PAGES
+from web_extract import extract_page
+from llm_cache import LLMResponseCache, CacheLookup, cache_key, cache_mode
+from gemini_files import GeminiFileRegistry
+from asset_store import AssetStore, Base64StreamDecoder, ASSETS_DIR, decode_base64_file, find_asset_links
+from log_appender import LogAppender
+from log_shipper import LogShipper, ShippingLogHandler, LOG_SERVER_URL
+from metrics import MetricsMiddleware, cache_lookups, record_llm_usage, timed, registry as metrics_registry
+from workspace_index import get_tree_index, record_workspace_change, close_tree_indexes
+from search_index import get_search_index, save_search_indexes
+from file_batch import apply_file_operations, FileOperationError
+from file_io import (
+    read_head, sniff_content_type, file_version, file_etag, json_etag, etag_matches, parse_byte_range,
+    iter_file_range, VersionConflict, path_lock, check_version, atomic_write_text, apply_text_edits,
+)
+
 # Load environment variables from .env file
 load_dotenv()
 
 app = FastAPI()
 
-# Initialize Groq client for Llama3 PDF Q&A
-llama_api_key = os.getenv("LLAMA_API_KEY")
-groq_client = None # Initialize to None
-
-if not llama_api_key:
-    # Log a warning instead of raising an error to allow other functionalities
-    logging.warning("LLAMA_API_KEY not found in .env file. PDF Q&A feature will not work.")
-else:
-    try:
-        # Explicitly create an httpx client.
-        # This allows httpx to use its default proxy handling (e.g., from environment variables)
-        # and bypasses potential issues with Groq's internal client wrapper mis-passing the 'proxies' argument.
-        custom_httpx_client = httpx.Client()
-        groq_client = Groq(api_key=llama_api_key, http_client=custom_httpx_client)
-        logging.info("Groq client initialized successfully with custom httpx client.")
-    except Exception as e:
-        logging.error(f"Failed to initialize Groq client: {e}", exc_info=True)
-        # groq_client remains None if initialization fails
-
 # Allow CORS for frontend communication
 app.add_middleware(
     CORSMiddleware,
@@ -68,23 +60,144 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Request counts, latency, in-flight requests and payload sizes per route, exposed at /metrics
+app.add_middleware(MetricsMiddleware)
 
 # Serve static files from the assets directory
 @app.on_event("startup")
 async def startup_event():
-    if not os.path.exists("assets"):
-        os.makedirs("assets", exist_ok=True)
-    app.mount("/assets", StaticFiles(directory="assets"), name="assets")
+    if not os.path.exists(ASSETS_DIR):
+        os.makedirs(ASSETS_DIR, exist_ok=True)
+    app.mount("/assets", AssetStaticFiles(directory=ASSETS_DIR), name="assets")
+    asyncio.create_task(expire_chat_sessions_periodically())
+    asyncio.create_task(maintain_search_index_periodically())
+    asyncio.create_task(sweep_gemini_files_periodically())
+    asyncio.create_task(collect_assets_periodically())
+    if PROVIDER_PRELOAD:
+        # Off the event loop, once the app is already answering requests
+        asyncio.create_task(asyncio.to_thread(preload_providers))
+
+
+class AssetStaticFiles(StaticFiles):
+    """The /assets mount, recording when each asset was last served for LRU eviction"""
+
+    async def get_response(self, path, scope):
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            asset_store.touch(os.path.basename(path))
+        return response
+
+
+async def expire_chat_sessions_periodically():
+    """Sweep idle chat sessions out of memory and the session database"""
+    while True:
+        await asyncio.sleep(CHAT_SESSION_EXPIRY_INTERVAL)
+        try:
+            expired = await asyncio.to_thread(chat_sessions.expire_idle)
+            if expired:
+                logging.info(f"Expired {expired} idle chat sessions")
+        except Exception as e:
+            logging.error(f"Error expiring chat sessions: {e}", exc_info=True)
+
+
+async def sweep_gemini_files_periodically():
+    """Forget expired Gemini uploads and delete the remote files of evicted ones"""
+    while True:
+        await asyncio.sleep(GEMINI_FILE_SWEEP_INTERVAL)
+        try:
+            api_key = os.getenv("GEMINI_API_KEY")
+            delete_remote = None
+            if api_key:
+                client = await asyncio.to_thread(gemini_client, api_key)
+                delete_remote = lambda name: client.files.delete(name=name)
+            removed = await asyncio.to_thread(gemini_files.sweep, delete_remote)
+            if removed:
+                logging.info(f"Removed {removed} expired or evicted Gemini uploads")
+        except Exception as e:
+            logging.error(f"Error sweeping Gemini uploads: {e}", exc_info=True)
+
+
+def collect_assets():
+    """Collect assets, taking the links in every known workspace as their references"""
+    return asset_store.collect(find_asset_links(workspace_info.get("known_directories", [])))
+
+
+async def collect_assets_periodically():
+    """Garbage-collect unreferenced assets that expired or no longer fit the quota"""
+    while True:
+        await asyncio.sleep(ASSET_GC_INTERVAL)
+        try:
+            report = await asyncio.to_thread(collect_assets)
+            if report["removed"]:
+                logging.info(f"Asset GC removed {report['removed']} assets ({report['bytes_reclaimed']} bytes): "
+                             f"{report['expired']} expired, {report['evicted_for_quota']} evicted for quota")
+        except Exception as e:
+            logging.error(f"Error collecting assets: {e}", exc_info=True)
+
+
+def sync_workspace_search_index(directory):
+    """Build or update the search index of the workspace at `directory` (blocking)"""
+    if os.path.isdir(directory):
+        get_search_index(workspace_tree_index(directory)).sync()
 
-# Store chat sessions and their history in memory
-chat_sessions: Dict[str, dict] = {}
+
+async def maintain_search_index_periodically():
+    """Build the current workspace's search index in the background and save it regularly"""
+    while True:
+        try:
+            directory = workspace_info.get("last_directory")
+            if directory:
+                await asyncio.to_thread(sync_workspace_search_index, directory)
+            await asyncio.to_thread(save_search_indexes)
+        except Exception as e:
+            logging.error(f"Error maintaining search index: {e}", exc_info=True)
+        await asyncio.sleep(SEARCH_INDEX_SAVE_INTERVAL)
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    shutdown_provider_pool()
+    shutdown_pdf_pool()
+    await web_fetcher.close()
+    chat_sessions.close()
+    llm_cache.close()
+    asset_store.close()
+    save_search_indexes()
+    close_tree_indexes()
+    await asyncio.to_thread(client_log.close)
+    await asyncio.to_thread(log_shipper.close)
+
+
+# Store chat sessions and their history (bounded in memory, optionally persisted to SQLite)
+chat_sessions = ChatSessionStore.from_env()
+# Extracted PDF text, scraped pages and transcripts, referenced by doc_id
+doc_store = DocumentStore()
+# Pooled client and HTTP cache for fetching web pages
+web_fetcher = WebFetcher()
+# Responses of deterministic-enough LLM calls, keyed by model, config and prompt
+llm_cache = LLMResponseCache()
+# Images already uploaded to the Gemini Files API, reused until they expire
+gemini_files = GeminiFileRegistry()
+# Uploaded images, stored under their content hash in the directory served at /assets
+asset_store = AssetStore()
+# Frontend log entries, buffered and written to the rotating scribe_ai_<date>.log files
+client_log = LogAppender()
+CHAT_SESSION_EXPIRY_INTERVAL = 3600  # Seconds between sweeps for idle sessions
+SEARCH_INDEX_SAVE_INTERVAL = 60  # Seconds between search index syncs/saves
+GEMINI_FILE_SWEEP_INTERVAL = 600  # Seconds between sweeps of expired Gemini uploads
+ASSET_GC_INTERVAL = 3600  # Seconds between asset garbage collections
 
 # Store workspace info - will be saved to a config file
 workspace_info = {
-    "last_directory": None  # Last opened directory
+    "last_directory": None,  # Last opened directory
+    "known_directories": [],  # Workspaces opened before, most recent first; searched for asset links
 }
+MAX_KNOWN_WORKSPACES = 20
 
 CONFIG_FILE = "workspace_config.json"
+READ_FILE_JSON_LIMIT = int(os.getenv("READ_FILE_JSON_LIMIT", str(10 * 1024 * 1024)))  # Bytes
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(50 * 1024 * 1024)))  # Decoded size of a streamed upload
+UPLOAD_WRITE_BATCH = 256 * 1024  # Bytes buffered between disk writes of a streamed upload
 
 
 # Path normalization function for cross-platform compatibility
@@ -104,10 +217,18 @@ def load_config():
                 # Normalize path if it exists
                 if workspace_info.get("last_directory"):
                     workspace_info["last_directory"] = normalize_path(workspace_info["last_directory"])
+                    remember_workspace(workspace_info["last_directory"])
     except Exception as e:
         logging.error(f"Error loading config: {e}", exc_info=True)
 
 
+def remember_workspace(directory):
+    """Make `directory` the current workspace and record it among the known ones"""
+    workspace_info["last_directory"] = directory
+    known = [path for path in workspace_info.get("known_directories", []) if path != directory]
+    workspace_info["known_directories"] = ([directory] + known)[:MAX_KNOWN_WORKSPACES]
+
+
 # Save config
 def save_config():
     try:
@@ -131,6 +252,8 @@ class QuestionRequest(BaseModel):
     question: str
     session_id: str
     conversation_history: Optional[List[dict]] = []  # Accept dictionaries instead of Message objects
+    stream: bool = False  # Stream tokens back as Server-Sent Events
+    doc_ids: List[str] = []  # Stored documents to attach to the question
 
 
 class TitleRequest(BaseModel):
@@ -142,6 +265,19 @@ class TitleRequest(BaseModel):
 class FileRequest(BaseModel):
     path: str
     content: Optional[str] = None
+    base_version: Optional[str] = None  # Reject the write if the file changed since this version
+
+
+class TextEdit(BaseModel):
+    start: int  # UTF-16 code unit offsets into the base version, as JavaScript strings index
+    end: int
+    text: str = ""
+
+
+class FilePatchRequest(BaseModel):
+    path: str
+    base_version: str
+    edits: List[TextEdit]
 
 
 class DirectoryRequest(BaseModel):
@@ -165,6 +301,20 @@ class CreateFileRequest(BaseModel):
     name: str
 
 
+class FileOperation(BaseModel):
+    op: str  # "create", "write", "rename" or "delete"
+    path: str
+    new_path: Optional[str] = None  # rename target
+    type: Optional[str] = None  # create: "file" (default) or "folder"
+    content: Optional[str] = None  # write
+    base_version: Optional[str] = None  # write: reject if the file changed since this version
+
+
+class FileBatchRequest(BaseModel):
+    operations: List[FileOperation]
+    atomic: bool = False  # All-or-nothing: roll back every operation if one fails
+
+
 class WorkspaceRequest(BaseModel):
     directory: str
 
@@ -173,17 +323,25 @@ class LogEntry(BaseModel):
     log: str
 
 
+class LogBatch(BaseModel):
+    logs: List[Union[str, dict]]  # Strings are written as given, objects as JSON; one line each
+
+
 class YouTubeAnalyzeRequest(BaseModel):
-    youtube_url: str
+    youtube_url: Optional[str] = None
+    doc_id: Optional[str] = None  # A stored transcript, instead of fetching youtube_url
     prompt: Optional[str] = None
+    stream: bool = False  # Stream tokens back as Server-Sent Events
 
 
 class YouTubeCodeExtractRequest(BaseModel):
-    youtube_url: str
+    youtube_url: Optional[str] = None
+    doc_id: Optional[str] = None  # A stored transcript, instead of fetching youtube_url
 
 
 class PDFQuestionRequest(BaseModel):
-    pdf_text: str
+    pdf_text: Optional[str] = None
+    doc_id: Optional[str] = None  # The doc_id from /api/pdf/extract-text, instead of pdf_text
     question: str
 
 
@@ -210,7 +368,141 @@ def dict_to_message(message_dict):
     return message_dict  # Return as is if already a Message object
 
 
+# --- Server-Sent Events helpers ---
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # Stop reverse proxies from buffering the stream
+}
+
+
+def sse_event(payload: dict) -> str:
+    """Format a payload as a single Server-Sent Events message"""
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+def chunk_text(chunk) -> str:
+    """Return the text of a streamed Gemini chunk, or "" if it carries none"""
+    try:
+        return chunk.text or ""
+    except ValueError:
+        # google.generativeai raises when a chunk has no text parts (e.g. a safety stop)
+        return ""
+
+
+def sse_response(event_stream, headers: Optional[Dict[str, str]] = None) -> StreamingResponse:
+    """Wrap an async generator of SSE messages in a streaming response"""
+    return StreamingResponse(event_stream, media_type="text/event-stream", headers={**SSE_HEADERS, **(headers or {})})
+
+
+# --- Stored documents ---
+async def store_document(text: str, kind: str, metadata: Optional[dict] = None) -> Optional[str]:
+    """Keep extracted text server-side and return its doc_id (None if it could not be stored)"""
+    try:
+        return await asyncio.to_thread(doc_store.put, text, kind, metadata)
+    except Exception as e:
+        logging.error(f"Error storing {kind} document: {e}", exc_info=True)
+        return None
+
+
+async def load_document(doc_id: str) -> dict:
+    document = await asyncio.to_thread(doc_store.get, doc_id)
+    if document is None:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired doc_id: {doc_id}")
+    return document
+
+
+def document_label(document: dict) -> str:
+    metadata = document.get("metadata") or {}
+    return metadata.get("title") or metadata.get("filename") or metadata.get("url") or document.get("kind", "document")
+
+
+async def attach_documents(prompt: str, doc_ids: List[str]) -> str:
+    """Append the text of stored documents to a prompt"""
+    sections = [prompt]
+    for doc_id in doc_ids:
+        document = await load_document(doc_id)
+        sections.append(f"--- Document: {document_label(document)} ---\n{document['text']}")
+    return "\n\n".join(sections)
+
+
+# --- LLM response cache ---
+async def llm_cache_lookup(http_request: Request, endpoint: str, provider: str, model: str,
+                           config: Optional[dict], prompt) -> CacheLookup:
+    """Look a provider call up in the response cache, honouring the request's opt-out headers"""
+    mode = cache_mode(http_request.headers)
+    if mode == "bypass" or not llm_cache.enabled:
+        return CacheLookup(key=None, endpoint=endpoint, status="bypass")
+    key = cache_key(provider, model, config, prompt)
+    if mode == "refresh":
+        return CacheLookup(key=key, endpoint=endpoint, status="refresh")
+    text = await asyncio.to_thread(llm_cache.get, key)
+    status = "hit" if text is not None else "miss"
+    cache_lookups.inc("llm", status)
+    return CacheLookup(key=key, endpoint=endpoint, status=status, text=text)
+
+
+async def llm_cache_store(lookup: CacheLookup, text: str):
+    if lookup.key and text:
+        try:
+            await asyncio.to_thread(llm_cache.put, lookup.key, lookup.endpoint, text)
+        except Exception as e:
+            logging.error(f"Error caching {lookup.endpoint} response: {e}", exc_info=True)
+
+
+async def cached_llm_text(http_request: Request, http_response: Response, endpoint: str, provider: str,
+                          model: str, config: Optional[dict], prompt, generate,
+                          cacheable: Optional[Callable[[str], bool]] = None) -> str:
+    """Response text for a provider call: from the cache, or from ``await generate()`` (then cached).
+
+    ``cacheable(text)`` decides whether a generated answer may be stored, so
+    fallbacks like "New Chat" are not remembered; by default any non-empty
+    text is. The outcome is reported in the X-LLM-Cache response header.
+    """
+    lookup = await llm_cache_lookup(http_request, endpoint, provider, model, config, prompt)
+    http_response.headers["X-LLM-Cache"] = lookup.status
+    if lookup.text is not None:
+        return lookup.text
+    text = await generate()
+    if cacheable is None:
+        cacheable = bool
+    if cacheable(text):
+        await llm_cache_store(lookup, text)
+    return text
+
+
+TITLE_MODEL = "gemini-2.0-flash"
+TITLE_GENERATION_CONFIG = {
+    "temperature": 0.7,
+    "max_output_tokens": 50,
+    "top_p": 1,
+    "top_k": 40,
+}
+
+
 class ScribeAIResponse:
+    @staticmethod
+    def build_title_prompt(conversation_history: List[Message]) -> str:
+        # Create a prompt for title generation
+        title_prompt = """Based on the following conversation, generate a very concise and descriptive title (maximum 5 words).
+            The title should capture the main topic or theme of the conversation.
+
+            Conversation:
+            """
+
+        # Add the first few messages for context
+        context_messages = conversation_history[:3]  # Use first 3 messages
+        for msg in context_messages:
+            try:
+                role = "User" if msg.sender == "user" else "Assistant"
+                title_prompt += f"\n{role}: {msg.text}"
+            except AttributeError as e:
+                logging.warning(f"Error accessing message attributes: {e}")
+                logging.warning(f"Problematic message: {msg}")
+                continue
+
+        title_prompt += "\n\nTitle (5 words max, no quotes):"
+        return title_prompt
+
     @staticmethod
     def generate_title(conversation_history: List[Message]) -> str:
         try:
@@ -219,45 +511,23 @@ class ScribeAIResponse:
                 logging.warning("Warning: GEMINI_API_KEY not found in environment variables")
                 return "New Chat"
 
-            genai.configure(api_key=api_key)
+            genai = configure_gemini(api_key)
 
             # Validate conversation history
             if not conversation_history or len(conversation_history) < 2:
                 logging.warning("Warning: Not enough messages for title generation")
                 return "New Chat"
 
-            # Create a prompt for title generation
-            title_prompt = """Based on the following conversation, generate a very concise and descriptive title (maximum 5 words).
-            The title should capture the main topic or theme of the conversation.
-
-            Conversation:
-            """
-
-            # Add the first few messages for context
-            context_messages = conversation_history[:3]  # Use first 3 messages
-            for msg in context_messages:
-                try:
-                    role = "User" if msg.sender == "user" else "Assistant"
-                    title_prompt += f"\n{role}: {msg.text}"
-                except AttributeError as e:
-                    logging.warning(f"Error accessing message attributes: {e}")
-                    logging.warning(f"Problematic message: {msg}")
-                    continue
-
-            title_prompt += "\n\nTitle (5 words max, no quotes):"
+            title_prompt = ScribeAIResponse.build_title_prompt(conversation_history)
 
             try:
                 model = genai.GenerativeModel(
-                    model_name="gemini-2.0-flash",
-                    generation_config={
-                        "temperature": 0.7,
-                        "max_output_tokens": 50,
-                        "top_p": 1,
-                        "top_k": 40,
-                    }
+                    model_name=TITLE_MODEL,
+                    generation_config=TITLE_GENERATION_CONFIG
                 )
 
                 response = model.generate_content(title_prompt)
+                record_llm_usage("gemini", response)
 
                 if not response.text:
                     return "New Chat"
@@ -297,9 +567,10 @@ class ScribeAIResponse:
         return formatted_history
 
     @staticmethod
-    def get_scribe_response(current_question: str, conversation_history: List[Message], session_id: str):
+    def start_scribe_chat(session_id: str):
+        """Start a Gemini chat for the session, seeding new sessions with the system prompt"""
         api_key = os.getenv("GEMINI_API_KEY")
-        genai.configure(api_key=api_key)
+        genai = configure_gemini(api_key)
 
         system_prompt = """
         You are Scribe AI, a friendly, helpful, and versatile AI assistant. Your primary goal is to assist users in a wide range of tasks and conversations. You can:
@@ -323,45 +594,91 @@ class ScribeAIResponse:
             "max_output_tokens": 8192,
         }
 
+        # Initialize model
+        model = genai.GenerativeModel(
+            model_name="gemini-2.0-flash",
+            generation_config=generation_config
+        )
+
+        # Start chat with history if session exists, otherwise start new
+        history = chat_sessions.get_history(session_id)
+        if history is not None:
+            chat = model.start_chat(history=history)
+        else:
+            # Initialize with system prompt for new sessions
+            chat = model.start_chat(history=[])
+            system_message = {
+                "role": "model",
+                "parts": [{"text": system_prompt}]
+            }
+            chat.history.append(system_message)
+            chat_sessions.set_history(session_id, [system_message])
+        return chat
+
+    @staticmethod
+    def get_scribe_response(current_question: str, conversation_history: List[Message], session_id: str):
+        """Answer a question in the session's chat (blocking: /ask-ai runs it on a provider worker thread)"""
         try:
             # Format the conversation history including the system prompt
             formatted_history = ScribeAIResponse.format_messages_for_context(conversation_history)
 
-            # Initialize model
-            model = genai.GenerativeModel(
-                model_name="gemini-2.0-flash",
-                generation_config=generation_config
-            )
-
-            # Start chat with history if session exists, otherwise start new
-            if session_id in chat_sessions:
-                chat = model.start_chat(history=chat_sessions[session_id]["history"])
-            else:
-                # Initialize with system prompt for new sessions
-                chat = model.start_chat(history=[])
-                system_message = {
-                    "role": "model",
-                    "parts": [{"text": system_prompt}]
-                }
-                chat.history.append(system_message)
-                chat_sessions[session_id] = {"history": [system_message]}
+            chat = ScribeAIResponse.start_scribe_chat(session_id)
 
             # Send the current question
             response = chat.send_message(current_question)
+            record_llm_usage("gemini", response)
 
             if response.text:
                 # Update session history
-                chat_sessions[session_id]["history"] = chat.history
+                chat_sessions.set_history(session_id, chat.history)
                 return response.text
             else:
                 logging.warning("Warning: Gemini API returned a response with empty content.")
                 return ""
         except Exception as e:
             logging.error(f"Error calling Gemini API: {e}")
-            if session_id in chat_sessions:
-                del chat_sessions[session_id]  # Clear problematic session
+            chat_sessions.delete(session_id)  # Clear problematic session
             return ""
 
+    @staticmethod
+    async def stream_scribe_response(current_question: str, session_id: str):
+        """Yield the answer as SSE messages while Gemini generates it.
+
+        The session history is committed once the stream ends. If the client
+        disconnects mid-answer, the partial answer it already received is
+        recorded so the next turn sees the same conversation the user saw.
+        """
+        chunks = []
+        completed = False
+        chat = None
+        prior_history = []
+        try:
+            # Model setup and the session store (SQLite) block, so they run in threads
+            chat = await asyncio.to_thread(ScribeAIResponse.start_scribe_chat, session_id)
+            prior_history = await asyncio.to_thread(chat_sessions.get_history, session_id) or []
+            async for chunk in stream_provider_call("gemini", chat.send_message, current_question, stream=True):
+                text = chunk_text(chunk)
+                if text:
+                    chunks.append(text)
+                    yield sse_event({"text": text})
+            completed = True
+            await asyncio.to_thread(chat_sessions.set_history, session_id, chat.history)
+            yield sse_event({"done": True})
+        except Exception as e:
+            logging.error(f"Error streaming from Gemini API: {e}")
+            chunks = []  # Nothing partial to keep; drop the session like the non-streaming path
+            await asyncio.to_thread(chat_sessions.delete, session_id)
+            yield sse_event({"error": str(e)})
+        finally:
+            # Client went away before the stream completed
+            if not completed and chunks and chat is not None:
+                partial_history = prior_history + [
+                    {"role": "user", "parts": [{"text": current_question}]},
+                    {"role": "model", "parts": [{"text": "".join(chunks)}]},
+                ]
+                # Shielded: the disconnect cancels this generator, but the write should still finish
+                await asyncio.shield(asyncio.to_thread(chat_sessions.set_history, session_id, partial_history))
+
 
 # File system operations
 @app.post("/api/workspace/set")
@@ -373,7 +690,7 @@ async def set_workspace(request: WorkspaceRequest):
             raise HTTPException(status_code=404, detail="Directory not found")
 
         # Save to global config
-        workspace_info["last_directory"] = directory
+        remember_workspace(directory)
         save_config()
 
         return {"status": "success", "directory": directory}
@@ -396,8 +713,9 @@ async def get_workspace():
 
 
 @app.get("/api/files/list")
-async def list_files(directory: Optional[str] = None):
-    """List all files in a directory"""
+async def list_files(request: Request, response: Response, directory: Optional[str] = None,
+                     depth: Optional[int] = Query(None, ge=1), path: Optional[str] = None):
+    """List files in a directory (optionally only `depth` levels, or only the subtree at `path`)"""
     try:
         if not directory:
             directory = workspace_info.get("last_directory")
@@ -408,56 +726,74 @@ async def list_files(directory: Optional[str] = None):
         if not os.path.exists(directory):
             raise HTTPException(status_code=404, detail="Directory not found")
 
-        # Get file structure recursively
-        structure = read_directory_structure(directory)
+        index = await asyncio.to_thread(workspace_tree_index, directory)
+        etag = tree_etag(index, path, depth)
+        if etag and request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+
+        # Get file structure from the cached tree index
+        structure = await asyncio.to_thread(read_directory_structure, index, path, depth)
+        if etag:
+            response.headers["ETag"] = etag
+            response.headers["Cache-Control"] = "no-cache"
         return {"items": structure}
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error listing files: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-def read_directory_structure(directory, base_path=None):
-    """Read directory structure recursively with enhanced metadata"""
-    items = []
-    if base_path is None:
-        base_path = directory
+def workspace_tree_index(directory):
+    """Tree index for `directory`, watched only if it is the workspace root.
+
+    Blocking (building the index may start a watcher that walks the tree), so
+    run it in a thread.
+    """
+    directory = normalize_path(directory)
+    workspace = workspace_info.get("last_directory")
+    return get_tree_index(directory, watch=bool(workspace) and normalize_path(workspace) == directory)
+
+
+def read_directory_structure(index, subpath=None, depth=None):
+    """Read directory structure with enhanced metadata from the workspace tree index"""
+    subpath = normalize_path(subpath) if subpath else ""
+    if subpath.startswith(os.pardir) or os.path.isabs(subpath):
+        raise HTTPException(status_code=400, detail="Path must be inside the directory")
+    with timed("read_directory_structure"):
+        return index.tree(subpath, depth)
 
+
+def tree_etag(index, subpath=None, depth=None):
+    """ETag for a listing, derived from the workspace change feed version.
+
+    Only issued while the filesystem watcher is running; without it, edits made
+    outside the backend would not bump the version and a 304 could be stale.
+    """
+    if not index.watching:
+        return None
+    view = hashlib.md5(f"{subpath or ''}|{depth or ''}".encode("utf-8")).hexdigest()[:8]
+    return f'W/"{index.changes.epoch}-{index.changes.version}-{view}"'
+
+
+def notify_workspace_change(workspace_dir, op, relative_path, old_relative_path=None, item_type="file"):
+    """Feed a workspace mutation into the tree index and the change feed"""
     try:
-        for entry in os.scandir(directory):
-            relative_path = os.path.relpath(entry.path, base_path)
-            
-            # Get basic file stats
-            stats = entry.stat()
-            
-            if entry.is_dir():
-                items.append({
-                    "id": relative_path,
-                    "name": entry.name,
-                    "type": "folder",
-                    "modified": datetime.fromtimestamp(stats.st_mtime).isoformat(),
-                    "children": read_directory_structure(entry.path, base_path)
-                })
-            else:
-                # Get file extension
-                _, ext = os.path.splitext(entry.name)
-                
-                items.append({
-                    "id": relative_path,
-                    "name": entry.name,
-                    "type": "file",
-                    "size": stats.st_size,
-                    "extension": ext.lower()[1:] if ext else "",
-                    "modified": datetime.fromtimestamp(stats.st_mtime).isoformat()
-                })
-        return items
+        return record_workspace_change(workspace_dir, op, relative_path, old_relative_path, item_type)
     except Exception as e:
-        logging.error(f"Error reading directory structure: {e}", exc_info=True)
-        return []
+        # The mutation itself succeeded; a stale index only costs a rescan
+        logging.error(f"Error recording workspace change for {relative_path}: {e}", exc_info=True)
+        return None
 
 
 @app.get("/api/files/read")
-async def read_file(path: str):
-    """Read file content"""
+async def read_file(path: str, request: Request, response: Response, raw: bool = False):
+    """Read file content.
+
+    By default text files are returned as JSON (`{"content": ...}`). With
+    `raw=true` the file bytes are streamed with a sniffed content type and
+    HTTP Range support. Both forms honour If-None-Match.
+    """
     try:
         current_workspace_dir_from_config = workspace_info.get("last_directory")
         logger.info(f"[READ_FILE] Received request for path parameter: '{path}'")
@@ -532,10 +868,54 @@ async def read_file(path: str):
             raise HTTPException(status_code=400, detail=f"The specified path '{normalized_relative_path_param}' is not a regular file.")
 
         try:
-            with open(full_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            stats = os.stat(full_path)
+            head = await asyncio.to_thread(read_head, full_path)
+            content_type, is_text = sniff_content_type(head, full_path)
+            etag = file_etag(stats)
+            if_none_match = request.headers.get("if-none-match")
+
+            if raw:
+                headers = {"ETag": etag, "Accept-Ranges": "bytes", "Cache-Control": "no-cache"}
+                if etag_matches(if_none_match, etag):
+                    return Response(status_code=304, headers=headers)
+                byte_range = parse_byte_range(request.headers.get("range"), stats.st_size)
+                if byte_range is None:
+                    start, end, status_code = 0, stats.st_size - 1, 200
+                else:
+                    (start, end), status_code = byte_range, 206
+                    headers["Content-Range"] = f"bytes {start}-{end}/{stats.st_size}"
+                headers["Content-Length"] = str(end - start + 1)
+                logger.info(f"[READ_FILE] Streaming bytes {start}-{end} of '{full_path}' as {content_type}")
+                return StreamingResponse(
+                    iter_file_range(full_path, start, end),
+                    status_code=status_code,
+                    media_type=content_type,
+                    headers=headers,
+                )
+
+            # The JSON form is a different representation, so it gets its own validator
+            text_etag = json_etag(etag)
+            if etag_matches(if_none_match, text_etag):
+                return Response(status_code=304, headers={"ETag": text_etag})
+            if not is_text:
+                logger.warning(f"[READ_FILE] '{full_path}' looks binary ({content_type}).")
+                return {"content": "", "error": "Binary file content cannot be displayed.", "content_type": content_type}
+            if stats.st_size > READ_FILE_JSON_LIMIT:
+                logger.warning(f"[READ_FILE] '{full_path}' is too large for JSON ({stats.st_size} bytes).")
+                return {
+                    "content": "",
+                    "error": "File is too large to display. Request it with raw=true.",
+                    "size": stats.st_size,
+                    "content_type": content_type,
+                }
+
+            content = await asyncio.to_thread(read_text_file, full_path)
             logger.info(f"[READ_FILE] Successfully read content from: '{full_path}'")
-            return {"content": content}
+            response.headers["ETag"] = text_etag
+            response.headers["Cache-Control"] = "no-cache"
+            return {"content": content, "version": file_version(stats)}
+        except HTTPException:
+            raise
         except UnicodeDecodeError:
             logger.warning(f"[READ_FILE] UnicodeDecodeError for file: '{full_path}'. It might be a binary file.")
             return {"content": "", "error": "Binary file content cannot be displayed."}
@@ -554,9 +934,48 @@ async def read_file(path: str):
         raise HTTPException(status_code=500, detail=f"An unexpected server error occurred: {str(e)}")
 
 
+def read_text_file(full_path):
+    # Line endings are kept as stored (no universal newlines), so the offsets the client computes
+    # on this text are the ones PATCH /api/files/write applies to the file
+    with open(full_path, 'r', encoding='utf-8', newline='') as f:
+        return f.read()
+
+
+def version_conflict(conflict: VersionConflict) -> HTTPException:
+    return HTTPException(status_code=409, detail={
+        "message": "File was modified since it was loaded",
+        "current_version": conflict.current_version,
+    })
+
+
+def write_text_versioned(full_path, content, base_version=None):
+    """Atomically replace a file's text if it is still at base_version; returns (new version, existed)"""
+    with path_lock(full_path):
+        check_version(full_path, base_version)
+        existed = os.path.exists(full_path)
+        # Create directories if they don't exist
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        return atomic_write_text(full_path, content), existed
+
+
+def patch_text_versioned(full_path, base_version, edits):
+    """Apply text edits made against base_version and atomically save the result"""
+    with path_lock(full_path):
+        check_version(full_path, base_version)
+        with open(full_path, 'r', encoding='utf-8', newline='') as f:
+            content = f.read()
+        patched = apply_text_edits(content, [(edit.start, edit.end, edit.text) for edit in edits])
+        return atomic_write_text(full_path, patched)
+
+
 @app.post("/api/files/write")
-async def write_file(request: FileRequest):
-    """Write content to a file"""
+async def write_file(request: FileRequest, http_request: Request):
+    """Write content to a file.
+
+    The write is atomic. If `base_version` (or an If-Match header) is given and
+    the file has changed since that version, nothing is written and 409 is
+    returned with the current version.
+    """
     try:
         if not workspace_info.get("last_directory"):
             raise HTTPException(status_code=400, detail="No workspace set")
@@ -564,19 +983,56 @@ async def write_file(request: FileRequest):
         workspace_dir = normalize_path(workspace_info["last_directory"])
         path = normalize_path(request.path)
         full_path = os.path.join(workspace_dir, path)
+        base_version = request.base_version or http_request.headers.get("if-match")
 
-        # Create directories if they don't exist
-        os.makedirs(os.path.dirname(full_path), exist_ok=True)
-
-        with open(full_path, 'w', encoding='utf-8') as f:
-            f.write(request.content or "")
+        version, existed = await asyncio.to_thread(
+            write_text_versioned, full_path, request.content or "", base_version
+        )
 
-        return {"status": "success"}
+        notify_workspace_change(workspace_dir, "modify" if existed else "add", path)
+        return {"status": "success", "version": version}
+    except VersionConflict as conflict:
+        raise version_conflict(conflict)
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error writing file: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.patch("/api/files/write")
+async def patch_file(request: FilePatchRequest):
+    """Apply text edits to a file, so autosave sends only what changed.
+
+    Edits are `{start, end, text}` replacements in the coordinates of
+    `base_version`. If the file has moved on, 409 is returned and the client
+    should fall back to a full write.
+    """
+    try:
+        if not workspace_info.get("last_directory"):
+            raise HTTPException(status_code=400, detail="No workspace set")
+
+        workspace_dir = normalize_path(workspace_info["last_directory"])
+        path = normalize_path(request.path)
+        full_path = os.path.join(workspace_dir, path)
+        if not os.path.isfile(full_path):
+            raise HTTPException(status_code=404, detail="File not found")
+
+        version = await asyncio.to_thread(patch_text_versioned, full_path, request.base_version, request.edits)
+
+        notify_workspace_change(workspace_dir, "modify", path)
+        return {"status": "success", "version": version}
+    except VersionConflict as conflict:
+        raise version_conflict(conflict)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error patching file: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.post("/api/files/create")
 async def create_file_or_folder(request: CreateFileRequest):
     """Create a new file or folder"""
@@ -610,6 +1066,7 @@ async def create_file_or_folder(request: CreateFileRequest):
 
         # Get relative path from workspace root
         relative_path = os.path.relpath(full_path, workspace_dir)
+        notify_workspace_change(workspace_dir, "add", relative_path, item_type=request.type)
 
         return {
             "status": "success",
@@ -636,11 +1093,13 @@ async def delete_file(path: str):
         if not os.path.exists(full_path):
             raise HTTPException(status_code=404, detail="File not found")
 
-        if os.path.isdir(full_path):
+        is_folder = os.path.isdir(full_path)
+        if is_folder:
             shutil.rmtree(full_path)
         else:
             os.remove(full_path)
 
+        notify_workspace_change(workspace_dir, "remove", path, item_type="folder" if is_folder else "file")
         return {"status": "success"}
     except Exception as e:
         logging.error(f"Error deleting file: {e}", exc_info=True)
@@ -670,12 +1129,48 @@ async def rename_file(request: RenameRequest):
         # Rename/move the file
         shutil.move(old_full_path, new_full_path)
 
+        notify_workspace_change(workspace_dir, "rename", new_path, old_path,
+                                item_type="folder" if os.path.isdir(new_full_path) else "file")
         return {"status": "success"}
     except Exception as e:
         logging.error(f"Error renaming file: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/files/batch")
+async def batch_file_operations(request: FileBatchRequest):
+    """Apply an ordered list of create/write/rename/delete operations in one request.
+
+    Paths are relative to the workspace. Every operation gets a result entry;
+    with `atomic` the first failure rolls back the whole batch and the response
+    status is 409 instead of 200.
+    """
+    try:
+        if not workspace_info.get("last_directory"):
+            raise HTTPException(status_code=400, detail="No workspace set")
+
+        workspace_dir = normalize_path(workspace_info["last_directory"])
+        for operation in request.operations:
+            operation.path = normalize_path(operation.path)
+            if operation.new_path:
+                operation.new_path = normalize_path(operation.new_path)
+
+        outcome = await asyncio.to_thread(apply_file_operations, workspace_dir, request.operations, request.atomic)
+
+        for op, path, old_path, item_type in outcome.pop("changes"):
+            notify_workspace_change(workspace_dir, op, path, old_path, item_type=item_type)
+        if request.atomic and outcome["failed"]:
+            return JSONResponse(status_code=409, content=outcome)
+        return outcome
+    except FileOperationError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error applying batch file operations: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.post("/create-session")
 async def create_session():
     session_id = str(uuid4())
@@ -683,7 +1178,7 @@ async def create_session():
 
 
 @app.post("/generate-title")
-async def generate_title(request: TitleRequest):
+async def generate_title(request: TitleRequest, http_request: Request, http_response: Response):
     try:
         # Debug logging
         logging.info(f"Received title request for session: {request.session_id}")
@@ -710,7 +1205,12 @@ async def generate_title(request: TitleRequest):
             logging.warning("No valid messages after conversion")
             return {"title": "New Chat"}
 
-        title = ScribeAIResponse.generate_title(message_objects)
+        title = await cached_llm_text(
+            http_request, http_response, "generate_title", "gemini", TITLE_MODEL, TITLE_GENERATION_CONFIG,
+            ScribeAIResponse.build_title_prompt(message_objects),
+            lambda: run_provider_call("gemini", ScribeAIResponse.generate_title, message_objects),
+            cacheable=lambda title: title != "New Chat",
+        )
         logging.info(f"Generated title: {title}")
         return {"title": title}
     except Exception as e:
@@ -738,25 +1238,35 @@ async def ask_ai(request: QuestionRequest):
                 # Skip invalid messages
                 continue
 
+        question = await attach_documents(request.question, request.doc_ids)
+
+        if request.stream:
+            return sse_response(ScribeAIResponse.stream_scribe_response(
+                question,
+                request.session_id
+            ))
+
         # Get AI response with conversation history
-        ai_response = ScribeAIResponse.get_scribe_response(
-            request.question,
+        ai_response = await run_provider_call(
+            "gemini",
+            ScribeAIResponse.get_scribe_response,
+            question,
             message_objects,
             request.session_id
         )
         return {"response": ai_response}
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error in ask_ai endpoint: {str(e)}", exc_info=True)
         # Clean up session on error
-        if request.session_id in chat_sessions:
-            del chat_sessions[request.session_id]
+        await asyncio.to_thread(chat_sessions.delete, request.session_id)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.delete("/clear-session/{session_id}")
 async def clear_session(session_id: str):
-    if session_id in chat_sessions:
-        del chat_sessions[session_id]
+    await asyncio.to_thread(chat_sessions.delete, session_id)
     return {"status": "success"}
 
 
@@ -764,6 +1274,10 @@ async def clear_session(session_id: str):
 async def select_directory():
     """Open native file dialog to select directory"""
     try:
+        # Only the desktop dialogs need tkinter, so it is not imported at startup
+        import tkinter as tk
+        from tkinter import filedialog
+
         # Create a root window but hide it
         root = tk.Tk()
         root.withdraw()  # Hide the main window
@@ -784,7 +1298,7 @@ async def select_directory():
         if selected_dir:
             # Normalize path and update workspace info
             selected_dir = normalize_path(selected_dir)
-            workspace_info["last_directory"] = selected_dir
+            remember_workspace(selected_dir)
             save_config()
             return {"status": "success", "directory": selected_dir}
         else:
@@ -799,6 +1313,10 @@ async def select_directory():
 async def select_file(multiple: bool = False):
     """Open native file dialog to select file(s)"""
     try:
+        # Only the desktop dialogs need tkinter, so it is not imported at startup
+        import tkinter as tk
+        from tkinter import filedialog
+
         # Create a root window but hide it
         root = tk.Tk()
         root.withdraw()  # Hide the main window
@@ -834,7 +1352,8 @@ async def select_file(multiple: bool = False):
 
 
 @app.get("/api/workspace/browse")
-async def browse_workspace():
+async def browse_workspace(request: Request, response: Response,
+                           depth: Optional[int] = Query(None, ge=1), path: Optional[str] = None):
     """Get the file structure from the current workspace"""
     try:
         directory = workspace_info.get("last_directory")
@@ -845,66 +1364,183 @@ async def browse_workspace():
         if not os.path.exists(directory):
             raise HTTPException(status_code=404, detail="Directory not found")
             
-        # Get file structure recursively with more details
-        structure = read_directory_structure(directory)
+        index = await asyncio.to_thread(workspace_tree_index, directory)
+        etag = tree_etag(index, path, depth)
+        if etag and request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+
+        # Get file structure from the cached tree index
+        structure = await asyncio.to_thread(read_directory_structure, index, path, depth)
+        if etag:
+            response.headers["ETag"] = etag
+            response.headers["Cache-Control"] = "no-cache"
         return {
             "status": "success",
             "directory": directory,
             "items": structure
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error browsing workspace: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/api/write-log")
-async def write_log(log_entry: LogEntry):
+WORKSPACE_CHANGES_MAX_WAIT = 60  # Seconds a long-poll request may wait
+WORKSPACE_CHANGES_HEARTBEAT = 15  # Seconds between SSE keep-alive comments
+
+
+async def current_workspace_index():
+    directory = workspace_info.get("last_directory")
+    if not directory:
+        raise HTTPException(status_code=400, detail="No workspace set")
+    directory = normalize_path(directory)
+    if not os.path.exists(directory):
+        raise HTTPException(status_code=404, detail="Directory not found")
+    return await asyncio.to_thread(workspace_tree_index, directory)
+
+
+@app.get("/api/workspace/changes")
+async def workspace_changes(since: int = Query(0, ge=0), wait: float = Query(0, ge=0), epoch: Optional[str] = None):
+    """Changes to the workspace after version `since`, long-polling up to `wait` seconds.
+
+    If `reset` is true the requested version is too old (or from another epoch)
+    and the client should re-fetch the full listing, then continue from `version`.
+    """
     try:
-        # Create logs directory if it doesn't exist
-        os.makedirs("logs", exist_ok=True)
-        
-        # Get current date for the log file name
-        current_date = datetime.now().strftime("%Y-%m-%d")
-        log_file_path = f"logs/scribe_ai_{current_date}.log"
-        
-        # Append the log entry to the file
-        with open(log_file_path, "a", encoding="utf-8") as f:
-            f.write(log_entry.log)
-        
-        return {"status": "success", "message": "Log entry written successfully"}
+        index = await current_workspace_index()
+        if wait and (epoch is None or epoch == index.changes.epoch):
+            await index.changes.wait_for_change(since, min(wait, WORKSPACE_CHANGES_MAX_WAIT))
+        feed = index.changes.changes_since(since, epoch)
+        feed["watching"] = index.watching
+        return feed
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error reading workspace changes: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/workspace/changes/stream")
+async def workspace_changes_stream(request: Request, since: int = Query(0, ge=0), epoch: Optional[str] = None):
+    """Server-Sent Events feed of workspace changes after version `since`"""
+    index = await current_workspace_index()
+
+    async def event_stream():
+        version = since
+        if epoch is not None and epoch != index.changes.epoch:
+            feed = index.changes.changes_since(version, epoch)
+            version = feed["version"]
+            yield sse_event(feed)
+        while not await request.is_disconnected():
+            if await index.changes.wait_for_change(version, WORKSPACE_CHANGES_HEARTBEAT):
+                feed = index.changes.changes_since(version)
+                version = feed["version"]
+                yield sse_event(feed)
+            else:
+                yield ": keep-alive\n\n"
+
+    return sse_response(event_stream())
+
+
+@app.get("/api/search")
+async def search_workspace(q: str, limit: int = Query(20, ge=1, le=200)):
+    """Full-text search over the text files of the current workspace.
+
+    All terms must match; wrap words in double quotes to match an exact phrase.
+    """
+    try:
+        if not q.strip():
+            raise HTTPException(status_code=400, detail="Query cannot be empty")
+        started = time.perf_counter()
+        index = get_search_index(await current_workspace_index())
+        results = await asyncio.to_thread(index.search, q, limit)
+        results["query"] = q
+        results["took_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return results
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to write log: {str(e)}")
+        logging.error(f"Error searching workspace: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/docs/{doc_id}")
+async def get_document(doc_id: str, include_text: bool = True):
+    """A stored document (extracted PDF text, scraped page or transcript) by doc_id"""
+    document = await load_document(doc_id)
+    result = {
+        "doc_id": doc_id,
+        "kind": document["kind"],
+        "metadata": document["metadata"],
+        "size": document["size"],
+    }
+    if include_text:
+        result["text"] = document["text"]
+    return result
+
+
+@app.get("/api/llm-cache")
+async def llm_cache_stats():
+    """Size and hit counts of the LLM response cache"""
+    return await asyncio.to_thread(llm_cache.stats)
+
+
+@app.delete("/api/llm-cache")
+async def clear_llm_cache():
+    await asyncio.to_thread(llm_cache.clear)
+    return {"status": "success"}
+
+
+@app.post("/api/write-log")
+async def write_log(log_entry: LogEntry):
+    """Append one entry, exactly as given, to the day's scribe_ai log file.
+
+    The entry is buffered and written by the log appender's thread within
+    CLIENT_LOG_FLUSH_INTERVAL; prefer /api/write-logs for more than one entry.
+    """
+    if not client_log.append([log_entry.log]):
+        raise HTTPException(status_code=503, detail="Failed to write log: the log writer is falling behind")
+    return {"status": "success", "message": "Log entry written successfully"}
+
+
+@app.post("/api/write-logs")
+async def write_logs(batch: LogBatch):
+    """Append many entries in one request, one line each, to the day's scribe_ai log file"""
+    lines = []
+    for entry in batch.logs:
+        text = entry if isinstance(entry, str) else json.dumps(entry, ensure_ascii=False)
+        lines.append(text if text.endswith("\n") else text + "\n")
+    if not client_log.append(lines):
+        raise HTTPException(status_code=503, detail="Failed to write logs: the log writer is falling behind")
+    return {"status": "success", "written": len(lines)}
+
+
+def asset_response(entry: dict) -> dict:
+    return {
+        "status": "success",
+        "path": f"/assets/{entry['name']}",  # Relative path for markdown, with forward slashes
+        "filename": entry["name"],
+        "sha256": entry["sha256"],
+        "size": entry["size"],
+        "mime_type": entry["mime_type"],
+        "width": entry["width"],
+        "height": entry["height"],
+        "deduplicated": entry.get("deduplicated", False),
+    }
 
 
 @app.post("/api/files/upload")
 async def upload_file(file: UploadFile = File(...)):
-    """Upload a file (primarily for images)"""
+    """Upload a file (primarily for images).
+
+    The file is stored under its content hash, so identical uploads share
+    one file and names never collide; copying and hashing run off the event
+    loop.
+    """
     try:
-        # Create an assets directory in the root folder if it doesn't exist
-        assets_dir = "assets"
-        os.makedirs(assets_dir, exist_ok=True)
-
-        # Generate unique filename
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        original_filename = file.filename
-        extension = os.path.splitext(original_filename)[1]
-        new_filename = f"image_{timestamp}{extension}"
-        
-        # Full path for the file
-        file_path = os.path.join(assets_dir, new_filename)
-        
-        # Save the file
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Return the relative path for markdown with forward slashes
-        relative_path = f"/assets/{new_filename}"
-        
-        return {
-            "status": "success",
-            "path": relative_path,
-            "filename": new_filename
-        }
+        entry = await asyncio.to_thread(asset_store.put_file, file.file, file.filename, file.content_type)
+        return asset_response(entry)
     except Exception as e:
         logging.error(f"Error uploading file: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
@@ -912,24 +1548,28 @@ async def upload_file(file: UploadFile = File(...)):
 
 @app.post("/api/files/upload-base64")
 async def upload_base64_image(request: Base64UploadRequest):
-    """Upload a base64-encoded image (primarily for TinyCats feature)"""
+    """Upload a base64-encoded image (primarily for TinyCats feature).
+
+    The image is decoded and written in chunks from a worker thread; prefer
+    /api/files/upload-stream, which also avoids holding the whole JSON body.
+    """
     try:
         # Ensure the directory exists
-        os.makedirs(request.directory, exist_ok=True)
+        await asyncio.to_thread(os.makedirs, request.directory, exist_ok=True)
         
         # Generate full path for the file
         file_path = os.path.join(request.directory, request.filename)
         
-        # Decode the base64 data
+        # Decode the base64 data and save the decoded image
         try:
-            image_data = base64.b64decode(request.base64_data)
-        except Exception as e:
+            await asyncio.to_thread(decode_base64_file, request.base64_data, file_path)
+        except ValueError as e:
             logging.error(f"Error decoding base64 data: {e}")
             raise HTTPException(status_code=400, detail="Invalid base64 data")
-        
-        # Save the decoded image
-        with open(file_path, "wb") as f:
-            f.write(image_data)
+
+        # Files saved into the assets directory are tracked for garbage collection
+        if os.path.abspath(request.directory) == os.path.abspath(asset_store.directory):
+            await asyncio.to_thread(asset_store.adopt, request.filename)
         
         # Return the relative path for accessing the image
         relative_path = f"/{request.directory}/{request.filename}"
@@ -939,116 +1579,116 @@ async def upload_base64_image(request: Base64UploadRequest):
             "path": relative_path,
             "filename": request.filename
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error uploading base64 image: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/files/upload-stream")
+async def upload_stream(request: Request, filename: Optional[str] = None, encoding: Optional[str] = None,
+                        ephemeral: bool = False):
+    """Upload an image as the raw request body, without JSON or multipart framing.
+
+    The body is read as it arrives and written out in batches from a worker
+    thread, so memory use stays bounded by the batch size whatever the image
+    size. With `encoding=base64` the body is base64 text (a `data:` URL
+    prefix is allowed) and is decoded incrementally; this still avoids
+    holding the JSON string and the decoded image in memory at once, as
+    /api/files/upload-base64 does. `filename` only supplies the extension
+    when the content type cannot be recognised. `ephemeral` uploads (such as
+    generated TinyCats slides) are not counted as references, so the asset
+    garbage collector may remove them once unused. The response has the same
+    shape as /api/files/upload-base64 and /api/files/upload.
+    """
+    if encoding not in (None, "", "binary", "base64"):
+        raise HTTPException(status_code=400, detail=f"Unsupported encoding: {encoding}")
+    decoder = Base64StreamDecoder() if encoding == "base64" else None
+    writer = await asyncio.to_thread(asset_store.open_writer)
+    try:
+        buffer = bytearray()
+        received = 0
+        async for chunk in request.stream():
+            data = decoder.feed(chunk) if decoder else chunk
+            received += len(data)
+            if received > UPLOAD_MAX_BYTES:
+                raise HTTPException(status_code=413, detail=f"Upload exceeds {UPLOAD_MAX_BYTES} bytes")
+            buffer += data
+            if len(buffer) >= UPLOAD_WRITE_BATCH:
+                await asyncio.to_thread(writer.write, bytes(buffer))
+                buffer.clear()
+        if decoder:
+            buffer += decoder.finish()
+        if not received and not buffer:
+            raise HTTPException(status_code=400, detail="Empty upload")
+        await asyncio.to_thread(writer.write, bytes(buffer))
+        content_type = (request.headers.get("content-type") or "").split(";")[0].strip() or None
+        entry = await asyncio.to_thread(writer.commit, filename, content_type, not ephemeral)
+        return asset_response(entry)
+    except ValueError as e:
+        await asyncio.to_thread(writer.abort)
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        await asyncio.to_thread(writer.abort)
+        raise
+    except Exception as e:
+        await asyncio.to_thread(writer.abort)
+        logging.error(f"Error streaming upload: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/assets/{name}")
+async def get_asset_info(name: str):
+    """Metadata of an uploaded asset: size, MIME type, dimensions and reference count"""
+    entry = await asyncio.to_thread(asset_store.get, name)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Unknown asset: {name}")
+    return entry
+
+
+@app.delete("/api/assets/{name}")
+async def release_asset(name: str):
+    """Drop one reference to an asset (e.g. the image was removed from a note).
+
+    Collections recount references from workspace links, so this only matters until the next one.
+    """
+    entry = await asyncio.to_thread(asset_store.release, name)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Unknown asset: {name}")
+    return {"status": "success", "refcount": entry["refcount"]}
+
+
 @app.post("/api/files/cleanup-tinycats")
 async def cleanup_tinycats_images():
-    """Clean up old TinyCats images from the assets directory"""
+    """Run the asset garbage collector now.
+
+    TinyCats images are unreferenced assets, so this removes those unused
+    for ASSET_UNREFERENCED_TTL (7 days by default), along with any other
+    unreferenced assets that are expired or beyond the disk quota. An image
+    counts as referenced while a file in one of the known workspaces links to
+    it. The same collection runs in the background every ASSET_GC_INTERVAL
+    seconds.
+    """
     try:
-        assets_dir = "assets"
-        
-        # Check if directory exists
-        if not os.path.exists(assets_dir):
-            return {"status": "success", "message": "No assets directory found"}
-        
-        # Count how many files were deleted
-        deleted_count = 0
-        
-        # Get all tinycats image files
-        for filename in os.listdir(assets_dir):
-            if filename.startswith("tinycats_") and (filename.endswith(".png") or filename.endswith(".jpg")):
-                file_path = os.path.join(assets_dir, filename)
-                try:
-                    # Get file age in days
-                    file_age = (datetime.now() - datetime.fromtimestamp(os.path.getmtime(file_path))).days
-                    
-                    # Delete files older than 7 days
-                    if file_age > 7:
-                        os.remove(file_path)
-                        deleted_count += 1
-                except Exception as inner_e:
-                    logging.warning(f"Error processing file {filename}: {inner_e}")
-        
+        report = await asyncio.to_thread(collect_assets)
         return {
-            "status": "success", 
-            "message": f"Cleaned up {deleted_count} TinyCats images"
+            "status": "success",
+            "message": f"Cleaned up {report['removed']} unreferenced assets ({report['bytes_reclaimed']} bytes)",
+            "report": report,
         }
     except Exception as e:
         logging.error(f"Error cleaning up TinyCats images: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-# --- Centralized Logging Setup ---
-LOG_SERVER_URL = "http://localhost:9999/log"
-log_queue = queue.Queue()
+@app.get("/api/assets")
+async def asset_stats():
+    """Asset count, disk use against the quota and the last garbage collection report"""
+    return await asyncio.to_thread(asset_store.stats)
 
-def send_log_worker():
-    """Worker thread to send logs without blocking the main thread."""
-    while True:
-        try:
-            log_record = log_queue.get()
-            if log_record is None: # Sentinel to stop the worker
-                break
-            
-            log_entry = {
-                "timestamp": datetime.fromtimestamp(log_record.created).isoformat(),
-                "level": log_record.levelname,
-                "message": log_record.getMessage(),
-                "source": "python",
-                "application": "python",
-                "loggerName": log_record.name,
-                "fileName": log_record.filename,
-                "lineNumber": log_record.lineno
-            }
-            
-            # Add exception info if available
-            if log_record.exc_info:
-                exc_type, exc_value, exc_traceback = log_record.exc_info
-                if exc_type and exc_value:
-                    log_entry["error"] = {
-                        "type": exc_type.__name__,
-                        "message": str(exc_value),
-                        "traceback": format_traceback(exc_traceback) if exc_traceback else None
-                    }
-            
-            # Format as a single line of JSON text
-            log_string = json.dumps(log_entry) + '\n' 
-            
-            try:
-                requests.post(LOG_SERVER_URL, 
-                              json={"log": log_string, "type": "python", "application": "python"}, 
-                              timeout=1.0) # Slightly longer timeout
-            except requests.exceptions.RequestException as e:
-                # Fall back to stdout if log server is down
-                print(f"[LOG] {log_entry['level']} - {log_entry['message']}") 
-        except Exception as e:
-            print(f"Error in log sending worker: {e}")
-        finally:
-            log_queue.task_done()
-
-def format_traceback(tb):
-    """Format a traceback object into a list of strings"""
-    import traceback
-    if tb:
-        return traceback.format_tb(tb)
-    return []
-
-class HttpLogHandler(logging.Handler):
-    """A logging handler that sends records to the Node.js log server via a queue."""
-    def __init__(self, url):
-        super().__init__()
-        self.url = url
-
-    def emit(self, record):
-        try:
-            # Put the log record onto the queue for the worker to process
-            log_queue.put(record)
-        except Exception as e:
-            print(f"Error in HttpLogHandler.emit: {e}")
 
+# --- Centralized Logging Setup ---
 # Configure root logger
 root_logger = logging.getLogger()
 root_logger.setLevel(logging.INFO)
@@ -1065,10 +1705,9 @@ file_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(m
 file_handler.setFormatter(file_formatter)
 root_logger.addHandler(file_handler)
 
-# Add HTTP handler for remote logging
-http_handler = HttpLogHandler(LOG_SERVER_URL)
-http_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-http_handler.setFormatter(http_formatter)
+# Add HTTP handler for remote logging: batched, gzipped and spooled to disk while the log server is down
+log_shipper = LogShipper(LOG_SERVER_URL, spool_path=os.path.join(logs_dir, 'python.spool.jsonl'))
+http_handler = ShippingLogHandler(log_shipper)
 root_logger.addHandler(http_handler)
 
 # Add console handler
@@ -1077,29 +1716,102 @@ console_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s -
 console_handler.setFormatter(console_formatter)
 root_logger.addHandler(console_handler)
 
-# Start the log sending worker thread
-log_worker_thread = Thread(target=send_log_worker, daemon=True)
-log_worker_thread.start()
-
 # Set up module-specific loggers
 logger = logging.getLogger("scribe-backend")
 logger.info("Python backend logging initialized and configured to send to Node.js log server.")
 # --- End Centralized Logging Setup ---
 
 
+# --- Metrics ---
+# Components that already keep their own counters are read when /metrics is scraped, not on every call
+metrics_registry.add_collector(
+    "scribe_log_queue_depth", "gauge", "Log records waiting to be shipped to the log server",
+    lambda: [({}, log_shipper.queue.qsize())])
+metrics_registry.add_collector(
+    "scribe_log_records_total", "counter", "Log records by shipping outcome",
+    lambda: [({"outcome": outcome}, log_shipper.stats()[outcome])
+             for outcome in ("shipped", "dropped", "sampled", "spooled")])
+metrics_registry.add_collector(
+    "scribe_client_log_pending_bytes", "gauge", "Frontend log bytes buffered but not yet written",
+    lambda: [({}, client_log.stats()["pending_bytes"])])
+metrics_registry.add_collector(
+    "scribe_provider_in_flight", "gauge", "Provider calls currently running",
+    lambda: [({"provider": provider}, stats["in_flight"]) for provider, stats in provider_stats().items()])
+metrics_registry.add_collector(
+    "scribe_llm_cache_bytes", "gauge", "Size of the cached LLM responses",
+    lambda: [({}, llm_cache.total_bytes)])
+metrics_registry.add_collector(
+    "scribe_chat_sessions", "gauge", "Chat sessions held in memory",
+    lambda: [({}, len(chat_sessions))])
+
+
+def cache_hit_ratios() -> Dict[str, Optional[float]]:
+    """Share of lookups served from each cache; refreshes and bypasses are not lookups"""
+    totals: Dict[str, List[float]] = {}
+    for (cache, result), count in cache_lookups.samples().items():
+        hits, lookups = totals.setdefault(cache, [0.0, 0.0])
+        if result in ("hit", "revalidated"):
+            hits += count
+        if result in ("hit", "revalidated", "miss"):
+            lookups += count
+        totals[cache] = [hits, lookups]
+    return {cache: round(hits / lookups, 4) if lookups else None for cache, (hits, lookups) in totals.items()}
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Metrics in the Prometheus text exposition format"""
+    return Response(metrics_registry.render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/api/metrics")
+async def metrics_summary():
+    """The same metrics as JSON, with latency percentiles and cache hit ratios"""
+    return {"metrics": metrics_registry.summary(), "cache_hit_ratios": cache_hit_ratios()}
+
+
+async def stream_generate_content(model, prompt: str, lookup: Optional[CacheLookup] = None):
+    """Yield a one-shot Gemini completion as SSE messages while it is generated.
+
+    With a cache ``lookup``, a cached response is sent as a single message and
+    a freshly generated one is cached once it has completed.
+    """
+    if lookup is not None and lookup.text is not None:
+        yield sse_event({"text": lookup.text})
+        yield sse_event({"done": True})
+        return
+    try:
+        parts = []
+        async for chunk in stream_provider_call("gemini", model.generate_content, prompt, stream=True):
+            text = chunk_text(chunk)
+            if text:
+                parts.append(text)
+                yield sse_event({"text": text})
+        if lookup is not None:
+            await llm_cache_store(lookup, "".join(parts))
+        yield sse_event({"done": True})
+    except Exception as e:
+        logger.error(f"Error streaming from Gemini API: {e}", exc_info=True)
+        yield sse_event({"error": str(e)})
+
+
 class AIChatRequest(BaseModel):
     user_prompt: str
     system_prompt: str = "You are a helpful assistant."
+    stream: bool = False  # Stream tokens back as Server-Sent Events
+    doc_ids: List[str] = []  # Stored documents (e.g. a scraped page) to include as context
+
+AI_CHAT_MODEL = "gemini-2.0-flash"
 
 @app.post("/api/ai-chat")
-async def handle_ai_chat(request: AIChatRequest):
+async def handle_ai_chat(request: AIChatRequest, http_request: Request, http_response: Response):
     """Handle AI chat requests from the AIChatNode"""
     try:
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
             raise HTTPException(status_code=500, detail="GEMINI_API_KEY not found in environment variables")
         
-        genai.configure(api_key=api_key)
+        genai = await asyncio.to_thread(configure_gemini, api_key)
         
         generation_config = {
             "temperature": 1,
@@ -1110,25 +1822,39 @@ async def handle_ai_chat(request: AIChatRequest):
         
         try:
             model = genai.GenerativeModel(
-                model_name="gemini-2.0-flash",
+                model_name=AI_CHAT_MODEL,
                 generation_config=generation_config
             )
             
             # Combine system prompt and user prompt
-            full_prompt = f"{request.system_prompt}\n\nUser: {request.user_prompt}"
-            
-            # Send the prompt
-            response = model.generate_content(full_prompt)
-            
-            if not response.text:
-                raise HTTPException(status_code=500, detail="Empty response from Gemini API")
-                
-            return {"response": response.text}
+            user_prompt = await attach_documents(request.user_prompt, request.doc_ids)
+            full_prompt = f"{request.system_prompt}\n\nUser: {user_prompt}"
+
+            if request.stream:
+                lookup = await llm_cache_lookup(http_request, "ai_chat", "gemini", AI_CHAT_MODEL,
+                                                generation_config, full_prompt)
+                return sse_response(stream_generate_content(model, full_prompt, lookup),
+                                    headers={"X-LLM-Cache": lookup.status})
+
+            async def generate():
+                # Send the prompt
+                response = await run_provider_call("gemini", model.generate_content, full_prompt)
+                if not response.text:
+                    raise HTTPException(status_code=500, detail="Empty response from Gemini API")
+                return response.text
+
+            text = await cached_llm_text(http_request, http_response, "ai_chat", "gemini", AI_CHAT_MODEL,
+                                         generation_config, full_prompt, generate)
+            return {"response": text}
             
+        except HTTPException:
+            raise
         except Exception as e:
             logging.error(f"Error calling Gemini API: {e}")
             raise HTTPException(status_code=500, detail=str(e))
             
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error in AI chat endpoint: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
@@ -1143,84 +1869,87 @@ async def process_image_with_ai(request: ImageProcessRequest):
             logger.error("GEMINI_API_KEY not found in environment variables")
             raise HTTPException(status_code=500, detail="GEMINI_API_KEY not configured")
 
-        gemini_client = gemini_ai.Client(api_key=api_key)
+        client = await asyncio.to_thread(gemini_client, api_key)
+        types = gemini_types()
 
         # Construct the local file path from the image_url
-        # image_url is like "/assets/image.png", local path should be "assets/image.png"
+        # image_url is like "/assets/image.png", served from the asset store's directory
         if not request.image_url.startswith("/assets/"):
             raise HTTPException(status_code=400, detail="Invalid image_url format. Must start with /assets/")
         
-        local_image_path = request.image_url.lstrip('/') # Remove leading slash
+        asset_name = unquote(urlparse(request.image_url).path[len("/assets/"):])
+        if not asset_name or os.path.basename(asset_name) != asset_name or asset_name in (os.curdir, os.pardir):
+            raise HTTPException(status_code=400, detail="Invalid image_url: must name a file in /assets/")
+        local_image_path = os.path.join(asset_store.directory, asset_name)
         
-        if not os.path.exists(local_image_path):
+        if not os.path.isfile(local_image_path):
             logger.error(f"Image file not found at local path: {local_image_path}")
             raise HTTPException(status_code=404, detail=f"Image file not found: {local_image_path}")
 
         logger.info(f"Processing image: {local_image_path} with prompt: '{request.prompt_text}'")
 
-        # 1. Upload the file to Gemini
-        try:
-            uploaded_files = [
-                gemini_client.files.upload(file=local_image_path),
-            ]
-            logger.info(f"Successfully uploaded image to Gemini: {uploaded_files[0].uri}")
-        except Exception as e:
-            logger.error(f"Error uploading image to Gemini: {e}", exc_info=True)
-            raise HTTPException(status_code=500, detail=f"Failed to upload image to Gemini: {str(e)}")
-
-        # 2. Prepare content for the model
         prompt_to_use = request.prompt_text if request.prompt_text else "Describe this image comprehensively."
-        
-        model_contents = [
-            gemini_types.Content(
-                role="user",
-                parts=[
-                    gemini_types.Part.from_uri(
-                        file_uri=uploaded_files[0].uri,
-                        mime_type=uploaded_files[0].mime_type,
-                    ),
-                    gemini_types.Part.from_text(text=prompt_to_use),
-                ],
-            ),
-        ]
-        
-        generate_content_config = gemini_types.GenerateContentConfig(
+        generate_content_config = types.GenerateContentConfig(
             response_mime_type="text/plain",
         )
-        
         model_name = "gemini-2.5-flash-preview-04-17" # As requested
 
-        # 3. Generate content
-        response_chunks = []
-        try:
-            for chunk in gemini_client.models.generate_content_stream(
-                model=model_name,
-                contents=model_contents,
-                config=generate_content_config,
-            ):
-                if chunk.text is not None: # Check if chunk.text is not None
-                    response_chunks.append(chunk.text)
-            
-            full_response = "".join(response_chunks)
-            logger.info(f"Successfully received response from Gemini model for image.")
+        async def upload(path):
+            return await run_provider_call("gemini", client.files.upload, file=path)
 
-            # 4. Clean up the uploaded file (optional, but good practice)
-            # try:
-            #     gemini_client.files.delete(name=uploaded_files[0].name)
-            #     logger.info(f"Successfully deleted temporary file from Gemini: {uploaded_files[0].name}")
-            # except Exception as e:
-            #     logger.warning(f"Could not delete temporary file from Gemini: {e}", exc_info=True)
+        # Reusing an upload can fail if Gemini dropped the file early; then upload it again once
+        for attempt in range(2):
+            # 1. Upload the file to Gemini, or reuse the upload of the same image content
+            try:
+                uploaded, reused, registry_key = await gemini_files.get_or_upload(api_key, local_image_path, upload)
+                cache_lookups.inc("gemini_files", "hit" if reused else "miss")
+                if reused:
+                    logger.info(f"Reusing Gemini upload {uploaded['uri']} for {local_image_path}")
+                else:
+                    logger.info(f"Successfully uploaded image to Gemini: {uploaded['uri']}")
+            except Exception as e:
+                logger.error(f"Error uploading image to Gemini: {e}", exc_info=True)
+                raise HTTPException(status_code=500, detail=f"Failed to upload image to Gemini: {str(e)}")
+
+            # 2. Prepare content for the model
+            model_contents = [
+                types.Content(
+                    role="user",
+                    parts=[
+                        types.Part.from_uri(
+                            file_uri=uploaded["uri"],
+                            mime_type=uploaded["mime_type"],
+                        ),
+                        types.Part.from_text(text=prompt_to_use),
+                    ],
+                ),
+            ]
 
-            return {"status": "success", "response": full_response}
+            # 3. Generate content
+            response_chunks = []
+            try:
+                async for chunk in stream_provider_call(
+                    "gemini",
+                    client.models.generate_content_stream,
+                    model=model_name,
+                    contents=model_contents,
+                    config=generate_content_config,
+                ):
+                    if chunk.text is not None: # Check if chunk.text is not None
+                        response_chunks.append(chunk.text)
+
+                full_response = "".join(response_chunks)
+                logger.info(f"Successfully received response from Gemini model for image.")
+                # Uploads are kept for follow-up questions; the registry sweep handles expiry
+                return {"status": "success", "response": full_response, "upload_reused": reused}
 
-        except Exception as e:
-            logger.error(f"Error generating content with Gemini model: {e}", exc_info=True)
-            # Attempt to delete file even if generation fails
-            # try:
-            #     gemini_client.files.delete(name=uploaded_files[0].name)
-            # except Exception as del_e:
-            #     logger.warning(f"Failed to delete temporary file after generation error: {del_e}")
-            raise HTTPException(status_code=500, detail=f"Failed to generate content from Gemini: {str(e)}")
+            except Exception as e:
+                if reused and attempt == 0 and not response_chunks:
+                    logger.warning(f"Reused Gemini upload {uploaded['uri']} failed ({e}); uploading again")
+                    await asyncio.to_thread(gemini_files.forget, registry_key)
+                    continue
+                logger.error(f"Error generating content with Gemini model: {e}", exc_info=True)
+                raise HTTPException(status_code=500, detail=f"Failed to generate content from Gemini: {str(e)}")
 
     except HTTPException:
         raise # Re-raise HTTPExceptions directly
@@ -1230,42 +1959,44 @@ async def process_image_with_ai(request: ImageProcessRequest):
 
 
 # PDF Processing Helper Functions
-def extract_text_from_pdf_file(pdf_path: str):
-    """Extract all text from a PDF file using LangChain."""
-    try:
-        loader = PyPDFLoader(pdf_path)
-        documents = loader.load()
-        text = "\\n".join(doc.page_content for doc in documents)
-        return text
-    except Exception as e:
-        logging.error(f"Error extracting text from PDF {pdf_path}: {e}", exc_info=True)
-        return f"Error extracting text: {e}"
+PDF_QA_MODEL = "llama3-8b-8192"  # Or any other suitable model available via Groq
+PDF_QA_CONFIG = {
+    "temperature": 0.7,
+    "max_tokens": 1000,  # Allow for longer answers
+    "top_p": 1,
+}
+
+
+def pdf_question_messages(pdf_context: str, question: str, excerpted: bool = False) -> List[dict]:
+    if excerpted:
+        context_message = f"The following passages were retrieved from the PDF as the most relevant to the question:\n\n{pdf_context}"
+    else:
+        context_message = f"The PDF contains the following text: {pdf_context}"
+    return [
+        {"role": "system", "content": "You are a helpful assistant analyzing PDF content. Answer the user's question based on the provided text from a PDF document."},
+        {"role": "user", "content": context_message},
+        {"role": "user", "content": question}
+    ]
 
-def ask_question_to_pdf_text(pdf_text: str, question: str):
-    """Ask a question based on the content of the PDF using Llama3 via Groq."""
-    if not groq_client:
+
+def ask_question_to_pdf_text(pdf_context: str, question: str, excerpted: bool = False):
+    """Ask a question based on the content of the PDF using Llama3 via Groq.
+
+    `pdf_context` is the document text from build_document_context: the whole
+    text for short documents, otherwise the passages most relevant to the
+    question, sized to fit the model's context window (llama3-8b-8192).
+    """
+    client = groq_client()
+    if not client:
         return "Llama3 client not initialized due to missing LLAMA_API_KEY."
     try:
-        # Truncate pdf_text if it's too long for the context window,
-        # keeping in mind the model's limits (e.g., llama3-8b-8192)
-        # A rough estimate for token to char ratio is 1 token ~ 4 chars.
-        # 8192 tokens * 3 chars/token (conservative) = ~24000 chars.
-        # We also need space for the question and system prompt.
-        max_text_len = 20000 # Max length for the PDF text part of the prompt
-        
-        messages = [
-            {"role": "system", "content": "You are a helpful assistant analyzing PDF content. Answer the user's question based on the provided text from a PDF document."},
-            {"role": "user", "content": f"The PDF contains the following text (potentially truncated): {pdf_text[:max_text_len]}"},
-            {"role": "user", "content": question}
-        ]
-        completion = groq_client.chat.completions.create(
-            model="llama3-8b-8192", # Or any other suitable model available via Groq
-            messages=messages,
-            temperature=0.7,
-            max_tokens=1000, # Allow for longer answers
-            top_p=1,
-            stream=False
+        completion = client.chat.completions.create(
+            model=PDF_QA_MODEL,
+            messages=pdf_question_messages(pdf_context, question, excerpted),
+            stream=False,
+            **PDF_QA_CONFIG
         )
+        record_llm_usage("groq", completion)
         
         if hasattr(completion, 'choices') and len(completion.choices) > 0:
             return completion.choices[0].message.content
@@ -1277,57 +2008,125 @@ def ask_question_to_pdf_text(pdf_text: str, question: str):
         return f"Error interacting with Llama3: {e}"
 
 
+def remove_temp_file(path):
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+def pdf_document_metadata(filename, content_hash, pages):
+    return {"filename": filename, "content_hash": content_hash, "page_count": len(pages)}
+
+
+async def stream_pdf_pages(tmp_pdf_path: str, content_hash: str, filename: str):
+    """Yield extracted pages as SSE messages in page order, then a summary"""
+    pages = []
+    cached = False
+    try:
+        with timed("pdf_extract_stream"):
+            async for batch in iter_pdf_pages(tmp_pdf_path, content_hash):
+                pages.extend(batch["pages"])
+                cached = batch["cached"]
+                yield sse_event(batch)
+        doc_id = await store_document(join_pages(pages), "pdf", pdf_document_metadata(filename, content_hash, pages))
+        yield sse_event({"done": True, "doc_id": doc_id, "content_hash": content_hash,
+                         "page_count": len(pages), "cached": cached})
+    except Exception as e:
+        logging.error(f"Error streaming PDF text extraction: {e}", exc_info=True)
+        yield sse_event({"error": str(e)})
+    finally:
+        await asyncio.to_thread(remove_temp_file, tmp_pdf_path)
+
+
 # PDF Processing Endpoints
 @app.post("/api/pdf/extract-text")
-async def pdf_extract_text(file: UploadFile = File(...)):
+async def pdf_extract_text(file: UploadFile = File(...), stream: bool = Form(False),
+                           include_text: bool = Form(True)):
     """
     Uploads a PDF file, extracts text from it, and returns the extracted text.
+
+    Pages are parsed in worker processes and the result is cached by content
+    hash. With `stream`, pages are sent as Server-Sent Events as they are
+    parsed: `{"pages": [{"page", "text", "ms"}], "total_pages", "cached"}`
+    batches, then `{"done": true, "doc_id", ...}`.
+
+    The text is also kept server-side; pass the returned `doc_id` to
+    /api/pdf/ask, /ask-ai or /api/ai-chat instead of sending the text back.
+    With `include_text` false the text is left out of the response whenever
+    it could be stored.
     """
+    tmp_pdf_path = None
     try:
         # Create a temporary file to store the uploaded PDF
         with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_pdf:
-            shutil.copyfileobj(file.file, tmp_pdf)
             tmp_pdf_path = tmp_pdf.name
-        
-        extracted_text = extract_text_from_pdf_file(tmp_pdf_path)
-        
+        content_hash = await asyncio.to_thread(copy_and_hash, file.file, tmp_pdf_path)
+
+        if stream:
+            response = sse_response(stream_pdf_pages(tmp_pdf_path, content_hash, file.filename))
+            tmp_pdf_path = None  # Removed by the stream once it finishes
+            return response
+
+        with timed("pdf_extract"):
+            result = await extract_pdf(tmp_pdf_path, content_hash)
+    except PDFExtractionError as e:
+        logging.error(f"Error extracting text from PDF: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error extracting text: {e}")
     except Exception as e:
         logging.error(f"Error processing uploaded PDF for text extraction: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to process PDF: {str(e)}")
     finally:
         # Ensure the temporary file is deleted
-        if 'tmp_pdf_path' in locals() and os.path.exists(tmp_pdf_path):
-            os.remove(tmp_pdf_path)
+        await asyncio.to_thread(remove_temp_file, tmp_pdf_path)
         # Close the uploaded file
         if file and hasattr(file, 'file') and not file.file.closed:
             file.file.close()
 
-    if extracted_text.startswith("Error extracting text:"):
-        raise HTTPException(status_code=500, detail=extracted_text)
-        
-    return {"text": extracted_text}
+    pages = result["pages"]
+    text = join_pages(pages)
+    doc_id = await store_document(text, "pdf", pdf_document_metadata(file.filename, content_hash, pages))
+    response = {
+        "doc_id": doc_id,
+        "content_hash": content_hash,
+        "page_count": len(pages),
+        "cached": result["cached"],
+        "page_timings_ms": [page["ms"] for page in pages],
+    }
+    if include_text or doc_id is None:
+        response["text"] = text
+    return response
 
 @app.post("/api/pdf/ask")
-async def pdf_ask_question(request: PDFQuestionRequest):
+async def pdf_ask_question(request: PDFQuestionRequest, http_request: Request, http_response: Response):
     """
-    Receives extracted PDF text and a question, then returns an answer
-    generated by Llama3 via Groq.
+    Receives extracted PDF text (or the doc_id of stored text) and a question,
+    then returns an answer generated by Llama3 via Groq.
     """
-    if not groq_client:
+    if not await asyncio.to_thread(groq_client):
         raise HTTPException(status_code=503, detail="PDF Q&A service is unavailable due to missing API key.")
     try:
-        if not request.pdf_text or not request.pdf_text.strip():
+        pdf_text = request.pdf_text
+        if request.doc_id and not pdf_text:
+            pdf_text = (await load_document(request.doc_id))["text"]
+        if not pdf_text or not pdf_text.strip():
             raise HTTPException(status_code=400, detail="PDF text cannot be empty.")
         if not request.question or not request.question.strip():
             raise HTTPException(status_code=400, detail="Question cannot be empty.")
             
-        answer = ask_question_to_pdf_text(request.pdf_text, request.question)
-        
-        if answer.startswith("Error interacting with Llama3:") or \
-           answer == "Unexpected response structure from Llama3 API." or \
-           answer == "Llama3 client not initialized due to missing LLAMA_API_KEY.":
-            raise HTTPException(status_code=500, detail=answer)
-            
+        # Index the document once and pick the passages relevant to this question
+        pdf_context, excerpted = await asyncio.to_thread(build_document_context, pdf_text, request.question)
+
+        async def generate():
+            answer = await run_provider_call("groq", ask_question_to_pdf_text, pdf_context, request.question, excerpted)
+            if answer.startswith("Error interacting with Llama3:") or \
+               answer == "Unexpected response structure from Llama3 API." or \
+               answer == "Llama3 client not initialized due to missing LLAMA_API_KEY.":
+                raise HTTPException(status_code=500, detail=answer)
+            return answer
+
+        answer = await cached_llm_text(
+            http_request, http_response, "pdf_ask", "groq", PDF_QA_MODEL, PDF_QA_CONFIG,
+            pdf_question_messages(pdf_context, request.question, excerpted), generate,
+        )
         return {"answer": answer}
     except HTTPException:
         raise # Re-raise HTTPExceptions directly
@@ -1339,74 +2138,138 @@ async def pdf_ask_question(request: PDFQuestionRequest):
 # Add new model for web scraping request
 class ScrapeRequest(BaseModel):
     url: str
+    include_text: bool = True  # False: leave the page text out and reference it by doc_id
 
-# Add new endpoint for web scraping
-@app.post("/api/scrape")
-async def scrape_website(request: ScrapeRequest):
-    """Scrape content from a website"""
-    try:
-        # Validate URL
-        parsed_url = urlparse(request.url)
-        if not parsed_url.scheme or not parsed_url.netloc:
-            raise HTTPException(status_code=400, detail="Invalid URL format")
-
-        # Set up headers to mimic a browser
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get(request.url, headers=headers) as response:
-                if response.status != 200:
-                    raise HTTPException(status_code=response.status, detail=f"Failed to fetch website: {response.status}")
+SCRAPE_HEADERS = {
+    # Mimic a browser
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
 
-                html = await response.text()
-                
-                # Parse HTML with BeautifulSoup
-                soup = BeautifulSoup(html, 'html.parser')
-                
-                # Remove script and style elements
-                for script in soup(["script", "style"]):
-                    script.decompose()
-                
-                # Get text content
-                text = soup.get_text(separator='\n', strip=True)
-                
-                # Clean up text
-                lines = (line.strip() for line in text.splitlines())
-                chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-                text = '\n'.join(chunk for chunk in chunks if chunk)
-                
-                # Get title
-                title = soup.title.string if soup.title else "No title found"
-                
-                # Get meta description
-                meta_desc = soup.find('meta', attrs={'name': 'description'})
-                description = meta_desc['content'] if meta_desc else None
-                
-                # Get main content (try to find the main article or content area)
-                main_content = None
-                for tag in ['article', 'main', '[role="main"]', '#content', '.content']:
-                    content = soup.select_one(tag)
-                    if content:
-                        main_content = content.get_text(separator='\n', strip=True)
-                        break
-                
-                return {
-                    "title": title,
-                    "description": description,
-                    "text": text,
-                    "main_content": main_content,
-                    "url": request.url
-                }
 
-    except aiohttp.ClientError as e:
+class ScrapeBatchRequest(BaseModel):
+    urls: List[str] = []
+    seed_url: Optional[str] = None  # Crawl from here (in addition to any urls)
+    max_depth: int = 0  # Follow links this many hops from the start URLs
+    same_domain: bool = True  # Only follow links to the start URLs' sites
+    max_pages: int = SCRAPE_BATCH_MAX_PAGES
+    stream: bool = True  # Send each page as a Server-Sent Event as soon as it is scraped
+
+
+async def scrape_page(url: str, include_links: bool = False):
+    """Fetch (through the shared client and cache), extract and store one page.
+
+    Returns the scrape result and how the fetch was served ("miss", "hit" or
+    "revalidated"). Fetch failures are raised as HTTPException.
+    """
+    # Validate URL
+    parsed_url = urlparse(url)
+    if not parsed_url.scheme or not parsed_url.netloc:
+        raise HTTPException(status_code=400, detail="Invalid URL format")
+
+    try:
+        response = await web_fetcher.fetch(url, headers=SCRAPE_HEADERS)
+        cache_lookups.inc("web", response.cache)
+    except ResponseTooLarge as e:
+        raise HTTPException(status_code=413, detail=f"Website response too large: {str(e)}")
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Timed out fetching website")
+    except FetchError as e:
         raise HTTPException(status_code=500, detail=f"Error fetching website: {str(e)}")
+    if response.status != 200:
+        raise HTTPException(status_code=response.status, detail=f"Failed to fetch website: {response.status}")
+
+    # Parsing large pages takes long enough to stall other requests, so it runs in a thread
+    with timed("extract_page"):
+        page = await asyncio.to_thread(extract_page, response.text(), include_links)
+
+    page["url"] = url
+    page["doc_id"] = await store_document(page["main_content"] or page["text"], "web", {
+        "url": url, "title": page["title"], "description": page["description"],
+    })
+    return page, response.cache
+
+
+# Add new endpoint for web scraping
+@app.post("/api/scrape")
+async def scrape_website(request: ScrapeRequest, http_response: Response):
+    """Scrape content from a website.
+
+    Pages are fetched through the shared web client and its HTTP cache; the
+    X-Cache response header says whether the page was fetched ("miss"),
+    served from the cache ("hit") or confirmed unchanged by a 304
+    ("revalidated").
+
+    With `include_text` false, `text` and `main_content` are left out
+    whenever the page could be stored; send its `doc_id` instead.
+    """
+    try:
+        page, cache = await scrape_page(request.url)
+        http_response.headers["X-Cache"] = cache
+        if not request.include_text and page["doc_id"]:
+            page.pop("text", None)
+            page.pop("main_content", None)
+        return page
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error scraping website: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error scraping website: {str(e)}")
 
 
+@app.post("/api/scrape/batch")
+async def scrape_batch(request: ScrapeBatchRequest):
+    """Scrape many pages concurrently, optionally crawling links from them.
+
+    Each page is scraped exactly like /api/scrape. With `stream` (the
+    default) every page is sent as a Server-Sent Event as soon as it is done,
+    `{"url", "depth", "status", "result" | "error", "ms"}`, followed by
+    `{"done": true, ...}`; otherwise all events are returned together.
+    """
+    start_urls = list(request.urls)
+    if request.seed_url:
+        start_urls.append(request.seed_url)
+    if not start_urls:
+        raise HTTPException(status_code=400, detail="Provide urls or a seed_url")
+    if request.max_depth < 0:
+        raise HTTPException(status_code=400, detail="max_depth cannot be negative")
+    max_pages = max(1, min(request.max_pages, SCRAPE_BATCH_MAX_PAGES))
+
+    async def scrape(url):
+        page, _ = await scrape_page(url, include_links=request.max_depth > 0)
+        return page
+
+    pages = crawl(scrape, start_urls, request.max_depth, request.same_domain, max_pages)
+
+    async def event_stream():
+        started = time.perf_counter()
+        succeeded = failed = 0
+        try:
+            async for event in pages:
+                if event["status"] == "success":
+                    succeeded += 1
+                else:
+                    failed += 1
+                yield sse_event(event)
+            yield sse_event({"done": True, "succeeded": succeeded, "failed": failed,
+                             "ms": round((time.perf_counter() - started) * 1000, 1)})
+        except Exception as e:
+            logging.error(f"Error in batch scrape: {e}", exc_info=True)
+            yield sse_event({"error": str(e)})
+
+    if request.stream:
+        return sse_response(event_stream())
+
+    started = time.perf_counter()
+    results = [event async for event in pages]
+    return {
+        "results": results,
+        "succeeded": sum(1 for event in results if event["status"] == "success"),
+        "failed": sum(1 for event in results if event["status"] != "success"),
+        "ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
 # --- YouTube Helper Endpoints ---
 async def fetch_youtube_transcript(video_url: str):
     try:
@@ -1444,29 +2307,62 @@ async def fetch_youtube_transcript(video_url: str):
         logger.error(f"Error fetching YouTube transcript for {video_url}: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Failed to fetch YouTube transcript: {str(e)}")
 
+async def load_youtube_transcript(youtube_url: Optional[str], doc_id: Optional[str]):
+    """Transcript text and its doc_id, from the store or freshly fetched (and then stored)"""
+    if doc_id:
+        return (await load_document(doc_id))["text"], doc_id
+    if not youtube_url:
+        raise HTTPException(status_code=400, detail="Either youtube_url or doc_id is required.")
+    transcript = await fetch_youtube_transcript(youtube_url)
+    if not transcript:
+        raise HTTPException(status_code=404, detail="Could not retrieve transcript for the video.")
+    return transcript, await store_document(transcript, "youtube", {"url": youtube_url})
+
+
+YOUTUBE_MODEL = "gemini-2.0-flash"
+YOUTUBE_CODE_GENERATION_CONFIG = {"response_mime_type": "application/json"}
+
+
+def is_json_text(text: str) -> bool:
+    try:
+        json.loads(text)
+    except ValueError:
+        return False
+    return True
+
+
 @app.post("/api/youtube/analyze")
-async def youtube_analyze(request: YouTubeAnalyzeRequest):
+async def youtube_analyze(request: YouTubeAnalyzeRequest, http_request: Request, http_response: Response):
     try:
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
             raise HTTPException(status_code=500, detail="GEMINI_API_KEY not found")
-        genai.configure(api_key=api_key)
+        genai = await asyncio.to_thread(configure_gemini, api_key)
 
-        transcript = await fetch_youtube_transcript(request.youtube_url)
-        if not transcript:
-            raise HTTPException(status_code=404, detail="Could not retrieve transcript for the video.")
+        transcript, doc_id = await load_youtube_transcript(request.youtube_url, request.doc_id)
 
         prompt_text = request.prompt if request.prompt else "Provide a detailed analysis and summary of the following YouTube video transcript for note-taking purposes. Break down key concepts, main points, and any actionable information. Format it clearly."
         
         full_prompt = f"Video Transcript:\n\n{transcript}\n\nAnalysis Task:\n{prompt_text}"
 
-        model = genai.GenerativeModel('gemini-2.0-flash')
-        response = await asyncio.to_thread(model.generate_content, full_prompt)
-        
-        if not response.text:
-            raise HTTPException(status_code=500, detail="AI analysis returned an empty response.")
-            
-        return {"analysis_text": response.text}
+        model = genai.GenerativeModel(YOUTUBE_MODEL)
+
+        if request.stream:
+            lookup = await llm_cache_lookup(http_request, "youtube_analyze", "gemini", YOUTUBE_MODEL, None, full_prompt)
+            headers = {"X-LLM-Cache": lookup.status}
+            if doc_id:
+                headers["X-Doc-Id"] = doc_id
+            return sse_response(stream_generate_content(model, full_prompt, lookup), headers=headers)
+
+        async def generate():
+            response = await run_provider_call("gemini", model.generate_content, full_prompt)
+            if not response.text:
+                raise HTTPException(status_code=500, detail="AI analysis returned an empty response.")
+            return response.text
+
+        analysis_text = await cached_llm_text(http_request, http_response, "youtube_analyze", "gemini",
+                                              YOUTUBE_MODEL, None, full_prompt, generate)
+        return {"analysis_text": analysis_text, "doc_id": doc_id}
 
     except HTTPException:
         raise
@@ -1475,16 +2371,14 @@ async def youtube_analyze(request: YouTubeAnalyzeRequest):
         raise HTTPException(status_code=500, detail=f"Error analyzing YouTube video: {str(e)}")
 
 @app.post("/api/youtube/extract-code")
-async def youtube_extract_code(request: YouTubeCodeExtractRequest):
+async def youtube_extract_code(request: YouTubeCodeExtractRequest, http_request: Request, http_response: Response):
     try:
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
             raise HTTPException(status_code=500, detail="GEMINI_API_KEY not found")
-        genai.configure(api_key=api_key)
+        genai = await asyncio.to_thread(configure_gemini, api_key)
 
-        transcript = await fetch_youtube_transcript(request.youtube_url)
-        if not transcript:
-            raise HTTPException(status_code=404, detail="Could not retrieve transcript for the video.")
+        transcript, doc_id = await load_youtube_transcript(request.youtube_url, request.doc_id)
 
         system_prompt = ('''
             You are an AI assistant specialized in extracting code and instructions from YouTube video transcripts.
@@ -1525,34 +2419,43 @@ async def youtube_extract_code(request: YouTubeCodeExtractRequest):
         full_prompt = f"{system_prompt}\n\nVideo Transcript:\n\n{transcript}"
 
         model = genai.GenerativeModel(
-            model_name='gemini-2.0-flash', 
-            generation_config=genai.types.GenerationConfig(response_mime_type="application/json")
+            model_name=YOUTUBE_MODEL,
+            generation_config=genai.types.GenerationConfig(**YOUTUBE_CODE_GENERATION_CONFIG)
         )
-        response = await asyncio.to_thread(model.generate_content, full_prompt)
-        
-        if not response.text:
-            raise HTTPException(status_code=500, detail="AI code extraction returned an empty response.")
+
+        async def generate():
+            response = await run_provider_call("gemini", model.generate_content, full_prompt)
+            if not response.text:
+                raise HTTPException(status_code=500, detail="AI code extraction returned an empty response.")
+            return response.text
+
+        response_text = await cached_llm_text(http_request, http_response, "youtube_extract_code", "gemini",
+                                              YOUTUBE_MODEL, YOUTUBE_CODE_GENERATION_CONFIG, full_prompt, generate,
+                                              cacheable=is_json_text)
         
         try:
             # The model is configured to return JSON, so we parse it directly.
-            json_response = json.loads(response.text)
+            json_response = json.loads(response_text)
             # Validate basic structure
             if (not isinstance(json_response.get('extracted_code'), list) or 
                not isinstance(json_response.get('instructions'), str)):
-                logger.error(f"AI response is not in the expected JSON format. Response: {response.text}")
+                logger.error(f"AI response is not in the expected JSON format. Response: {response_text}")
                 # Fallback: Try to wrap the raw text in a basic structure if it's not JSON
                 # This is a very basic fallback, ideally the model always returns valid JSON.
                 return {
                     "extracted_code": [],
-                    "instructions": "Could not parse AI response. Raw output: " + response.text
+                    "instructions": "Could not parse AI response. Raw output: " + response_text,
+                    "doc_id": doc_id
                 }
+            json_response["doc_id"] = doc_id
             return json_response
         except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse JSON response from AI: {e}. Response: {response.text}")
+            logger.error(f"Failed to parse JSON response from AI: {e}. Response: {response_text}")
             # If JSON parsing fails, return the raw text as instructions for debugging or simple cases
             return {
                 "extracted_code": [],
-                "instructions": "Failed to parse AI response. Raw output: " + response.text
+                "instructions": "Failed to parse AI response. Raw output: " + response_text,
+                "doc_id": doc_id
             }
 
     except HTTPException:
@@ -0,0 +1,248 @@
+"""PDF text extraction off the event loop, in parallel and cached.
+
+Pages are split into small ranges and parsed by a pool of worker processes
+(pypdf is pure Python, so threads would serialize on the GIL), and results are
+yielded in page order as soon as each range is done, so callers can stream
+the first pages while the rest of a large book is still being parsed.
+
+Every extraction records how long each page took, and the result is cached on
+disk under the SHA-256 of the PDF bytes, so uploading the same file again
+returns without parsing anything.
+
+Settings:
+    PDF_EXTRACT_WORKERS     worker processes (default: CPU count, at most 4)
+    PDF_PAGES_PER_TASK      pages parsed per task / streamed per batch (default 8)
+    PDF_CACHE_DIR           directory for cached extractions (default "pdf_cache")
+    PDF_CACHE_MAX_ENTRIES   cached documents kept on disk (default 200)
+"""
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, List, Optional
+
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "8"))
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", "pdf_cache")
+PDF_CACHE_MAX_ENTRIES = int(os.getenv("PDF_CACHE_MAX_ENTRIES", "200"))
+
+_MEMORY_CACHE_ENTRIES = 8
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class PDFExtractionError(Exception):
+    """The PDF could not be opened or parsed"""
+
+
+# --- Worker process side ---
+
+# Each worker keeps the document it parsed last open: a worker usually gets
+# several ranges of the same PDF, and opening it again re-reads the xref table
+_open_reader = {"key": None, "reader": None}
+
+
+def _reader_for(pdf_path: str):
+    from pypdf import PdfReader
+    stats = os.stat(pdf_path)
+    key = (pdf_path, stats.st_mtime_ns, stats.st_size)
+    if _open_reader["key"] != key:
+        _open_reader["reader"] = PdfReader(pdf_path)
+        _open_reader["key"] = key
+    return _open_reader["reader"]
+
+
+def _count_pages(pdf_path: str) -> int:
+    return len(_reader_for(pdf_path).pages)
+
+
+def _extract_page_range(pdf_path: str, start: int, end: int) -> List[dict]:
+    """Text of pages ``start``..``end - 1`` with the time each took to extract"""
+    reader = _reader_for(pdf_path)
+    pages = []
+    for number in range(start, end):
+        started = time.perf_counter()
+        try:
+            text = reader.pages[number].extract_text() or ""
+            error = None
+        except Exception as e:  # One broken page should not lose the rest of the document
+            text, error = "", str(e)
+        page = {"page": number + 1, "text": text, "ms": round((time.perf_counter() - started) * 1000, 2)}
+        if error:
+            page["error"] = error
+        pages.append(page)
+    return pages
+
+
+# --- Pool ---
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Workers only need this module and pypdf; with the spawn start method
+            # (Windows/macOS) main.py's __main__ guard keeps them from starting a server
+            _pool = ProcessPoolExecutor(max_workers=PDF_EXTRACT_WORKERS)
+        return _pool
+
+
+def shutdown_pdf_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+# --- Cache ---
+
+class _ExtractionCache:
+    """Extraction results by content hash: a few in memory, the rest gzipped on disk"""
+
+    def __init__(self, directory: str = PDF_CACHE_DIR, max_entries: int = PDF_CACHE_MAX_ENTRIES):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, content_hash: str) -> str:
+        return os.path.join(self.directory, f"{content_hash}.json.gz")
+
+    def get(self, content_hash: str) -> Optional[dict]:
+        with self._lock:
+            result = self._memory.get(content_hash)
+            if result is not None:
+                self._memory.move_to_end(content_hash)
+                return result
+        path = self._path(content_hash)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                result = json.load(f)
+            os.utime(path)  # Mark as recently used for pruning
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logging.warning(f"Discarding unreadable PDF cache entry {path}: {e}")
+            return None
+        self._remember(content_hash, result)
+        return result
+
+    def _remember(self, content_hash: str, result: dict):
+        with self._lock:
+            self._memory[content_hash] = result
+            self._memory.move_to_end(content_hash)
+            while len(self._memory) > _MEMORY_CACHE_ENTRIES:
+                self._memory.popitem(last=False)
+
+    def put(self, content_hash: str, result: dict):
+        self._remember(content_hash, result)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path(content_hash)
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with gzip.open(temp_path, "wt", encoding="utf-8") as f:
+                json.dump(result, f)
+            os.replace(temp_path, path)
+            self._prune()
+        except OSError as e:
+            logging.error(f"Could not cache PDF extraction {content_hash}: {e}", exc_info=True)
+
+    def _prune(self):
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".json.gz"):
+                    entries.append((entry.stat().st_mtime, entry.path))
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort()
+        for _, path in entries[:len(entries) - self.max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+extraction_cache = _ExtractionCache()
+
+
+# --- Public API ---
+
+def copy_and_hash(source, destination_path: str) -> str:
+    """Copy a file object to ``destination_path``, hashing it on the way; returns the SHA-256"""
+    digest = hashlib.sha256()
+    with open(destination_path, "wb") as out:
+        for block in iter(lambda: source.read(_HASH_CHUNK_SIZE), b""):
+            digest.update(block)
+            out.write(block)
+    return digest.hexdigest()
+
+
+def join_pages(pages: List[dict]) -> str:
+    return "\n".join(page["text"] for page in pages)
+
+
+async def iter_pdf_pages(pdf_path: str, content_hash: str) -> AsyncIterator[dict]:
+    """Yield batches ``{"pages": [...], "total_pages", "cached"}`` in page order.
+
+    A cached document is yielded as one batch. Otherwise page ranges are
+    parsed in parallel and each batch is yielded as soon as it and all earlier
+    ones are done; the complete result is cached at the end. Cancelling the
+    iteration cancels the ranges not yet started.
+    """
+    cached = await asyncio.to_thread(extraction_cache.get, content_hash)
+    if cached is not None:
+        yield {"pages": cached["pages"], "total_pages": len(cached["pages"]), "cached": True}
+        return
+
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+    started = time.perf_counter()
+    try:
+        total_pages = await loop.run_in_executor(pool, _count_pages, pdf_path)
+    except Exception as e:
+        raise PDFExtractionError(f"Could not open PDF: {e}") from e
+
+    step = max(1, PDF_PAGES_PER_TASK)
+    futures = [
+        loop.run_in_executor(pool, _extract_page_range, pdf_path, start, min(start + step, total_pages))
+        for start in range(0, total_pages, step)
+    ]
+    pages: List[dict] = []
+    try:
+        for future in futures:
+            try:
+                batch = await future
+            except Exception as e:
+                raise PDFExtractionError(f"Could not parse PDF: {e}") from e
+            pages.extend(batch)
+            yield {"pages": batch, "total_pages": total_pages, "cached": False}
+    finally:
+        for future in futures:
+            future.cancel()
+
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+    slowest = ", ".join(f"{page['page']} ({page['ms']} ms)"
+                        for page in sorted(pages, key=lambda page: page["ms"], reverse=True)[:3])
+    logging.info(f"Extracted {total_pages} PDF pages in {elapsed_ms} ms using {PDF_EXTRACT_WORKERS} workers; "
+                 f"slowest pages: {slowest}")
+    await asyncio.to_thread(extraction_cache.put, content_hash, {"pages": pages, "elapsed_ms": elapsed_ms})
+
+
+async def extract_pdf(pdf_path: str, content_hash: str) -> dict:
+    """Whole-document extraction: ``{"pages": [...], "cached": bool}``"""
+    pages: List[dict] = []
+    cached = False
+    async for batch in iter_pdf_pages(pdf_path, content_hash):
+        pages.extend(batch["pages"])
+        cached = batch["cached"]
+    return {"pages": pages, "cached": cached}
@@ -0,0 +1,141 @@
+"""Passage retrieval for PDF Q&A.
+
+Instead of sending the first 20,000 characters of a document with every
+question, the text is split once into overlapping word windows and indexed
+with BM25. Each question then gets only the best-matching passages that fit a
+token budget, in document order, so any part of the document can be answered
+and prompts stay small. Documents that fit the budget whole are sent whole.
+
+Indexes are kept for the most recently asked-about documents, keyed by a hash
+of the text, so follow-up questions reuse them.
+
+Settings:
+    PDF_CONTEXT_TOKEN_BUDGET   estimated tokens of document text per question (default 3500)
+    PDF_CHUNK_WORDS            words per passage (default 180)
+    PDF_CHUNK_OVERLAP_WORDS    words shared by consecutive passages (default 40)
+"""
+import hashlib
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, List, Tuple
+
+from search_index import tokenize
+
+PDF_CONTEXT_TOKEN_BUDGET = int(os.getenv("PDF_CONTEXT_TOKEN_BUDGET", "3500"))
+PDF_CHUNK_WORDS = int(os.getenv("PDF_CHUNK_WORDS", "180"))
+PDF_CHUNK_OVERLAP_WORDS = int(os.getenv("PDF_CHUNK_OVERLAP_WORDS", "40"))
+
+MAX_CACHED_INDEXES = 16
+_CHARS_PER_TOKEN = 4  # Rough average for English text
+_BM25_K1 = 1.2
+_BM25_B = 0.75
+_WORD_RE = re.compile(r"\S+")
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // _CHARS_PER_TOKEN + 1
+
+
+class PassageIndex:
+    """BM25 index over overlapping word windows of one document"""
+
+    def __init__(self, text: str, chunk_words: int = PDF_CHUNK_WORDS, overlap_words: int = PDF_CHUNK_OVERLAP_WORDS):
+        self.text = text
+        self.passages: List[Tuple[int, int]] = []  # (start char, end char)
+        self.lengths: List[int] = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}  # term -> [(passage, term frequency)]
+
+        words = [(m.start(), m.end()) for m in _WORD_RE.finditer(text)]
+        step = max(1, chunk_words - overlap_words)
+        for first in range(0, max(1, len(words)), step):
+            window = words[first:first + chunk_words]
+            if not window:
+                break
+            start, end = window[0][0], window[-1][1]
+            counts = Counter(tokenize(text[start:end]))
+            number = len(self.passages)
+            self.passages.append((start, end))
+            self.lengths.append(sum(counts.values()))
+            for term, count in counts.items():
+                self.postings.setdefault(term, []).append((number, count))
+            if first + chunk_words >= len(words):
+                break
+        self.average_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+
+    def score(self, query: str) -> Dict[int, float]:
+        """BM25 score of every passage sharing at least one term with the query"""
+        scores: Dict[int, float] = {}
+        passage_count = len(self.passages)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (passage_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for number, frequency in postings:
+                norm = _BM25_K1 * (1 - _BM25_B + _BM25_B * self.lengths[number] / (self.average_length or 1))
+                scores[number] = scores.get(number, 0.0) + idf * frequency * (_BM25_K1 + 1) / (frequency + norm)
+        return scores
+
+    def select(self, query: str, token_budget: int = PDF_CONTEXT_TOKEN_BUDGET) -> List[str]:
+        """Best passages for ``query`` within ``token_budget``, in document order.
+
+        Overlapping or adjacent picks are merged into one excerpt. If nothing
+        matches, the beginning of the document is used.
+        """
+        scores = self.score(query)
+        ranked = sorted(scores, key=lambda number: scores[number], reverse=True)
+        if not ranked:
+            ranked = list(range(len(self.passages)))
+        chosen = []
+        used = 0
+        for number in ranked:
+            start, end = self.passages[number]
+            cost = estimate_tokens(self.text[start:end])
+            if used + cost > token_budget:
+                if chosen:
+                    continue
+                end = start + token_budget * _CHARS_PER_TOKEN  # A single oversized passage is cut to fit
+                cost = token_budget
+            chosen.append((start, end))
+            used += cost
+            if used >= token_budget:
+                break
+
+        excerpts: List[List[int]] = []
+        for start, end in sorted(chosen):
+            if excerpts and start <= excerpts[-1][1] + 1:
+                excerpts[-1][1] = max(excerpts[-1][1], end)
+            else:
+                excerpts.append([start, end])
+        return [self.text[start:end] for start, end in excerpts]
+
+
+_indexes: "OrderedDict[str, PassageIndex]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_passage_index(text: str) -> PassageIndex:
+    """Index for a document, built on first use and kept for recent documents"""
+    key = hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            return index
+    index = PassageIndex(text)
+    with _indexes_lock:
+        _indexes[key] = index
+        while len(_indexes) > MAX_CACHED_INDEXES:
+            _indexes.popitem(last=False)
+    return index
+
+
+def build_document_context(text: str, question: str, token_budget: int = PDF_CONTEXT_TOKEN_BUDGET) -> Tuple[str, bool]:
+    """Document text to send with a question; returns (context, whether it is excerpted)"""
+    if estimate_tokens(text) <= token_budget:
+        return text, False
+    excerpts = get_passage_index(text).select(question, token_budget)
+    return "\n\n[...]\n\n".join(excerpts), True
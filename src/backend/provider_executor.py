@@ -0,0 +1,168 @@
+"""Execution layer for the blocking AI provider SDKs.
+
+The Gemini (`google.generativeai`, `google.genai`) and Groq SDKs used by the
+backend are synchronous. Every provider call goes through this module so it
+runs on a bounded thread pool instead of the event loop, and so each provider
+has its own cap on in-flight requests. Each call's latency, outcome and
+reported token usage are recorded in `metrics`.
+
+Limits are read from the environment:
+    PROVIDER_THREAD_POOL_SIZE  total worker threads shared by all providers (default 16)
+    GEMINI_MAX_CONCURRENCY     in-flight Gemini calls (default 8)
+    GROQ_MAX_CONCURRENCY       in-flight Groq calls (default 4)
+"""
+import asyncio
+import functools
+import logging
+import os
+import time
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from typing import Dict, Optional
+
+from metrics import llm_calls, llm_latency, record_llm_usage
+
+DEFAULT_PROVIDER_LIMIT = 4
+
+PROVIDER_LIMITS: Dict[str, int] = {
+    "gemini": int(os.getenv("GEMINI_MAX_CONCURRENCY", "8")),
+    "groq": int(os.getenv("GROQ_MAX_CONCURRENCY", "4")),
+}
+
+provider_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("PROVIDER_THREAD_POOL_SIZE", "16")),
+    thread_name_prefix="provider",
+)
+
+_semaphores: Dict[str, asyncio.Semaphore] = {}
+_in_flight: Dict[str, int] = {}
+_STREAM_END = object()
+
+
+def _provider_semaphore(provider: str) -> asyncio.Semaphore:
+    """Get (or lazily create) the concurrency limiter for a provider"""
+    if provider not in _semaphores:
+        limit = PROVIDER_LIMITS.get(provider, DEFAULT_PROVIDER_LIMIT)
+        _semaphores[provider] = asyncio.Semaphore(limit)
+        _in_flight[provider] = 0
+    return _semaphores[provider]
+
+
+async def _run_in_pool(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(provider_pool, functools.partial(func, *args, **kwargs))
+
+
+async def run_provider_call(provider: str, func, *args, **kwargs):
+    """Run a blocking provider call on the pool, waiting for a free provider slot first"""
+    async with _provider_semaphore(provider):
+        _in_flight[provider] += 1
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await _run_in_pool(func, *args, **kwargs)
+            outcome = "ok"
+            record_llm_usage(provider, result)
+            return result
+        finally:
+            _in_flight[provider] -= 1
+            llm_latency.observe(time.perf_counter() - started, provider, "call")
+            llm_calls.inc(provider, outcome)
+
+
+def _stop_stream(stream, iterator, pending: Optional[Future]):
+    """Close a stream the consumer abandoned so the remote generation stops (blocking)"""
+    if pending is not None:
+        # A generator cannot be closed while another thread is inside next()
+        try:
+            result = pending.result()
+        except CancelledError:
+            result = None  # Cancelled before it started
+        except Exception:
+            return  # The call failed, so nothing was left open
+        if stream is None:
+            stream = result
+    try:
+        if iterator is None and stream is not None:
+            iterator = iter(stream)
+        for target, method in ((iterator, "close"), (stream, "close"), (stream, "cancel")):
+            stop = getattr(target, method, None)
+            if callable(stop):
+                stop()
+    except Exception as e:
+        logging.warning(f"Error closing an abandoned provider stream: {e}")
+
+
+async def stream_provider_call(provider: str, func, *args, **kwargs):
+    """Run a blocking call that returns an iterator and yield its items asynchronously.
+
+    The provider slot is held until the stream is exhausted or the consumer
+    stops iterating, since the remote generation is in progress until then.
+    A stream the consumer abandons is closed on the pool, and the slot is
+    only released once that is done.
+    """
+    semaphore = _provider_semaphore(provider)
+    await semaphore.acquire()
+    loop = asyncio.get_running_loop()
+    _in_flight[provider] += 1
+    started = time.perf_counter()
+    outcome = "error"
+    last_item = None
+    stream = iterator = pending = None
+
+    def release():
+        _in_flight[provider] -= 1
+        semaphore.release()
+
+    def release_soon(_):
+        try:
+            loop.call_soon_threadsafe(release)
+        except RuntimeError:
+            pass  # The event loop has already closed
+
+    try:
+        pending = provider_pool.submit(func, *args, **kwargs)
+        stream = await asyncio.wrap_future(pending)
+        iterator = iter(stream)
+        while True:
+            pending = provider_pool.submit(next, iterator, _STREAM_END)
+            item = await asyncio.wrap_future(pending)
+            pending = None
+            if item is _STREAM_END:
+                break
+            last_item = item
+            yield item
+        outcome = "ok"
+        # Gemini reports the usage of the whole stream on its last chunk
+        record_llm_usage(provider, last_item)
+    except (GeneratorExit, asyncio.CancelledError):
+        outcome = "cancelled"
+        raise
+    finally:
+        llm_latency.observe(time.perf_counter() - started, provider, "stream")
+        llm_calls.inc(provider, outcome)
+        if outcome != "cancelled":
+            release()
+        else:
+            # Not awaited, so a cancelled consumer cannot skip it; the slot is freed when it completes
+            try:
+                closing = provider_pool.submit(_stop_stream, stream, iterator, pending)
+            except RuntimeError:  # The pool has shut down
+                release()
+            else:
+                closing.add_done_callback(release_soon)
+
+
+def provider_stats() -> Dict[str, dict]:
+    """Current limit and in-flight count for every provider that has been used"""
+    return {
+        provider: {
+            "limit": PROVIDER_LIMITS.get(provider, DEFAULT_PROVIDER_LIMIT),
+            "in_flight": _in_flight.get(provider, 0),
+        }
+        for provider in _semaphores
+    }
+
+
+def shutdown_provider_pool():
+    """Stop accepting new provider work; in-flight calls are left to finish"""
+    provider_pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,107 @@
+"""Provider SDKs and clients, imported on first use instead of at startup.
+
+google.generativeai, google.genai and groq (with httpx) account for most of
+the time it takes to import main.py, and a backend answering workspace,
+search or log requests never touches them. Call sites get the SDK or client
+from here, so the app is serving requests before any of them is loaded.
+
+``preload`` imports them all; main.py runs it on a worker thread after
+startup, so the first LLM request normally finds them loaded. With
+PROVIDER_PRELOAD off they are loaded by the first request that needs each
+one, and that request pays for the import.
+
+Settings:
+    PROVIDER_PRELOAD     import the provider SDKs in the background after startup (default 1)
+    GEMINI_API_ENDPOINT  serve google.generativeai calls from another endpoint over REST, e.g. the
+                         local stand-in used by benchmarks/load_benchmark.py; google.genai and Groq
+                         read GOOGLE_GEMINI_BASE_URL and GROQ_BASE_URL themselves
+    LLAMA_API_KEY        Groq API key for PDF Q&A
+
+GEMINI_API_ENDPOINT and LLAMA_API_KEY are read on first use, after main.py
+has loaded .env.
+"""
+import importlib
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+PROVIDER_PRELOAD = os.getenv("PROVIDER_PRELOAD", "1").lower() not in ("0", "false", "no", "off")
+
+# Imported by preload; none of them should be loaded by `import main`
+PROVIDER_MODULES = ("google.generativeai", "google.genai", "groq", "httpx")
+
+_groq_lock = threading.Lock()
+_groq = {"built": False, "client": None}
+
+
+def generativeai():
+    """The google.generativeai module"""
+    import google.generativeai as genai
+    return genai
+
+
+def configure_gemini(api_key: Optional[str]):
+    """genai.configure, pointed at GEMINI_API_ENDPOINT when it is set; returns the genai module"""
+    genai = generativeai()
+    endpoint = os.getenv("GEMINI_API_ENDPOINT")
+    if endpoint:
+        genai.configure(api_key=api_key, transport="rest", client_options={"api_endpoint": endpoint})
+    else:
+        genai.configure(api_key=api_key)
+    return genai
+
+
+def gemini_client(api_key: str):
+    """A google.genai client (used for file uploads and image prompts)"""
+    from google import genai
+    return genai.Client(api_key=api_key)
+
+
+def gemini_types():
+    """The google.genai.types module"""
+    from google.genai import types
+    return types
+
+
+def _build_groq_client():
+    api_key = os.getenv("LLAMA_API_KEY")
+    if not api_key:
+        # Log a warning instead of raising an error to allow other functionalities
+        logging.warning("LLAMA_API_KEY not found in .env file. PDF Q&A feature will not work.")
+        return None
+    try:
+        import httpx
+        from groq import Groq
+        # Explicitly create an httpx client.
+        # This allows httpx to use its default proxy handling (e.g., from environment variables)
+        # and bypasses potential issues with Groq's internal client wrapper mis-passing the 'proxies' argument.
+        client = Groq(api_key=api_key, http_client=httpx.Client())
+        logging.info("Groq client initialized successfully with custom httpx client.")
+        return client
+    except Exception as e:
+        logging.error(f"Failed to initialize Groq client: {e}", exc_info=True)
+        return None
+
+
+def groq_client():
+    """The shared Groq client for Llama3 PDF Q&A, built on first use; None if it is unavailable"""
+    if not _groq["built"]:
+        with _groq_lock:
+            if not _groq["built"]:
+                _groq["client"] = _build_groq_client()
+                _groq["built"] = True
+    return _groq["client"]
+
+
+def preload():
+    """Import the provider SDKs and build the Groq client now rather than on first use"""
+    started = time.perf_counter()
+    for name in PROVIDER_MODULES:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            logging.warning(f"Could not preload {name}: {e}")
+    groq_client()
+    logging.info(f"Provider SDKs loaded in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,368 @@
+"""Full-text search over the text files of a workspace.
+
+``WorkspaceSearchIndex`` is a positional inverted index (term -> path ->
+token positions) over the workspace's text files, supporting:
+
+* ranked results (BM25) with all query terms required,
+* phrase queries in double quotes (``"exact words"``),
+* snippets around the first matches, read from the top hits only.
+
+The index is kept current by replaying the workspace ``WorkspaceChangeFeed``
+(backend writes, renames and deletes, plus watcher events), so it never needs
+a full rebuild while the backend runs. Without a watcher, external edits are
+picked up by a periodic mtime revalidation instead. The index is saved to
+``SEARCH_INDEX_DIR`` and, on restart, only files whose size or mtime changed
+are re-read.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+SEARCH_INDEX_DIR = os.getenv("SEARCH_INDEX_DIR", "search_index")
+SEARCH_MAX_FILE_BYTES = int(os.getenv("SEARCH_MAX_FILE_BYTES", str(2 * 1024 * 1024)))
+# Without a watcher, re-stat the workspace this often to catch external edits
+SEARCH_REVALIDATE_INTERVAL = float(os.getenv("SEARCH_REVALIDATE_INTERVAL", "300"))
+
+TEXT_EXTENSIONS = {
+    "md", "markdown", "txt", "text", "canvas", "json", "csv", "tsv", "rst", "org", "tex",
+    "html", "htm", "xml", "css", "js", "jsx", "ts", "tsx", "py", "java", "c", "h", "cpp",
+    "hpp", "go", "rs", "rb", "php", "sh", "yaml", "yml", "toml", "ini", "cfg", "sql",
+}
+SKIPPED_DIRECTORIES = {".git", "node_modules", "__pycache__", ".venv", "venv", ".idea", ".vscode"}
+
+_FORMAT_VERSION = 1
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_PHRASE_RE = re.compile(r'"([^"]+)"')
+_BM25_K1 = 1.2
+_BM25_B = 0.75
+_SNIPPET_RADIUS = 80
+_MAX_SNIPPETS = 2
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def parse_query(query: str) -> Tuple[List[str], List[List[str]]]:
+    """Split a query into loose terms and quoted phrases (each a list of terms)"""
+    phrases = [tokenize(p) for p in _PHRASE_RE.findall(query)]
+    phrases = [p for p in phrases if p]
+    terms = tokenize(_PHRASE_RE.sub(" ", query))
+    return terms, phrases
+
+
+def is_indexable(rel_path: str) -> bool:
+    parts = rel_path.split(os.sep)
+    if any(part in SKIPPED_DIRECTORIES or part.startswith(".") for part in parts[:-1]):
+        return False
+    _, ext = os.path.splitext(parts[-1])
+    return ext.lower()[1:] in TEXT_EXTENSIONS
+
+
+class WorkspaceSearchIndex:
+    """Positional inverted index over one workspace, fed by its change feed"""
+
+    def __init__(self, tree_index, storage_dir: str = SEARCH_INDEX_DIR):
+        self.tree_index = tree_index
+        self.root = tree_index.root
+        self.storage_path = os.path.join(
+            storage_dir, hashlib.sha1(self.root.encode("utf-8")).hexdigest()[:16] + ".json.gz"
+        )
+        self.postings: Dict[str, Dict[str, List[int]]] = {}  # term -> path -> positions
+        self.docs: Dict[str, dict] = {}  # path -> {"mtime_ns", "size", "length", "terms"}
+        self.total_length = 0
+        self.synced_epoch: Optional[str] = None
+        self.synced_version = 0
+        self.ready = False
+        self.dirty = False
+        self.last_validated = 0.0
+        self._lock = threading.RLock()
+
+    # --- Document maintenance ---
+
+    def _full_path(self, rel_path: str) -> str:
+        return os.path.join(self.root, rel_path)
+
+    def _remove_doc(self, rel_path: str):
+        doc = self.docs.pop(rel_path, None)
+        if doc is None:
+            return
+        self.total_length -= doc["length"]
+        for term in doc["terms"]:
+            paths = self.postings.get(term)
+            if paths is not None:
+                paths.pop(rel_path, None)
+                if not paths:
+                    del self.postings[term]
+        self.dirty = True
+
+    def _remove_prefix(self, rel_path: str):
+        prefix = rel_path + os.sep
+        for path in [p for p in self.docs if p == rel_path or p.startswith(prefix)]:
+            self._remove_doc(path)
+
+    def _index_file(self, rel_path: str, stats: Optional[os.stat_result] = None):
+        """(Re)index one file if it is a text file within the size limit"""
+        self._remove_doc(rel_path)
+        if not is_indexable(rel_path):
+            return
+        full_path = self._full_path(rel_path)
+        try:
+            stats = stats or os.stat(full_path)
+            if stats.st_size > SEARCH_MAX_FILE_BYTES:
+                return
+            with open(full_path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except (OSError, UnicodeDecodeError):
+            return
+        positions: Dict[str, List[int]] = {}
+        tokens = tokenize(text)
+        for position, term in enumerate(tokens):
+            positions.setdefault(term, []).append(position)
+        for term, term_positions in positions.items():
+            self.postings.setdefault(term, {})[rel_path] = term_positions
+        self.docs[rel_path] = {
+            "mtime_ns": stats.st_mtime_ns,
+            "size": stats.st_size,
+            "length": len(tokens),
+            "terms": list(positions),
+        }
+        self.total_length += len(tokens)
+        self.dirty = True
+
+    def _walk_files(self, rel_dir: str = ""):
+        """Yield (relative path, stat) for every candidate file under rel_dir"""
+        start = self._full_path(rel_dir) if rel_dir else self.root
+        for dirpath, dirnames, filenames in os.walk(start):
+            dirnames[:] = [d for d in dirnames if d not in SKIPPED_DIRECTORIES and not d.startswith(".")]
+            for filename in filenames:
+                full_path = os.path.join(dirpath, filename)
+                rel_path = os.path.relpath(full_path, self.root)
+                if not is_indexable(rel_path):
+                    continue
+                try:
+                    yield rel_path, os.stat(full_path)
+                except OSError:
+                    continue
+
+    def _index_path(self, rel_path: str):
+        full_path = self._full_path(rel_path)
+        if os.path.isdir(full_path):
+            for file_path, stats in self._walk_files(rel_path):
+                self._index_file(file_path, stats)
+        else:
+            self._index_file(rel_path)
+
+    def _revalidate(self):
+        """Bring the index in line with the disk, re-reading only changed files"""
+        seen = set()
+        for rel_path, stats in self._walk_files():
+            seen.add(rel_path)
+            doc = self.docs.get(rel_path)
+            if doc is None or doc["mtime_ns"] != stats.st_mtime_ns or doc["size"] != stats.st_size:
+                self._index_file(rel_path, stats)
+        for rel_path in [p for p in self.docs if p not in seen]:
+            self._remove_doc(rel_path)
+        self.last_validated = time.monotonic()
+
+    # --- Syncing with the change feed ---
+
+    def _apply_change(self, change: dict):
+        path = change["path"]
+        if change["op"] == "remove":
+            self._remove_prefix(path)
+        elif change["op"] == "rename":
+            self._remove_prefix(change.get("old_path") or path)
+            self._index_path(path)
+        else:
+            self._index_path(path)
+
+    def sync(self):
+        """Load or build the index on first use, then apply pending workspace changes"""
+        with self._lock:
+            feed = self.tree_index.changes
+            if not self.ready:
+                # Take the feed position first so changes made during the build are replayed
+                self.synced_epoch, self.synced_version = feed.epoch, feed.version
+                self._load()
+                self._revalidate()
+                self.ready = True
+            pending = feed.changes_since(self.synced_version, self.synced_epoch)
+            if pending["reset"]:
+                self._revalidate()
+            else:
+                for change in pending["changes"]:
+                    self._apply_change(change)
+            self.synced_epoch, self.synced_version = pending["epoch"], pending["version"]
+            if (not self.tree_index.watching
+                    and time.monotonic() - self.last_validated > SEARCH_REVALIDATE_INTERVAL):
+                self._revalidate()
+
+    # --- Persistence ---
+
+    def _load(self):
+        try:
+            with gzip.open(self.storage_path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logging.warning(f"Discarding unreadable search index {self.storage_path}: {e}")
+            return
+        if data.get("format") != _FORMAT_VERSION or data.get("root") != self.root:
+            return
+        for rel_path, doc in data["docs"].items():
+            positions = doc.pop("positions")
+            for term, term_positions in positions.items():
+                self.postings.setdefault(term, {})[rel_path] = term_positions
+            doc["terms"] = list(positions)
+            self.docs[rel_path] = doc
+            self.total_length += doc["length"]
+        logging.info(f"Loaded search index for {self.root} ({len(self.docs)} documents)")
+
+    def save(self):
+        """Write the index to disk if it changed since the last save"""
+        with self._lock:
+            if not self.ready or not self.dirty:
+                return
+            docs = {}
+            for rel_path, doc in self.docs.items():
+                docs[rel_path] = {
+                    "mtime_ns": doc["mtime_ns"],
+                    "size": doc["size"],
+                    "length": doc["length"],
+                    "positions": {term: self.postings[term][rel_path] for term in doc["terms"]},
+                }
+            data = {"format": _FORMAT_VERSION, "root": self.root, "docs": docs}
+            self.dirty = False
+        os.makedirs(os.path.dirname(self.storage_path) or ".", exist_ok=True)
+        temp_path = self.storage_path + ".tmp"
+        with gzip.open(temp_path, "wt", encoding="utf-8", compresslevel=5) as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(temp_path, self.storage_path)
+
+    # --- Querying ---
+
+    def _phrase_matches(self, phrase: List[str], rel_path: str) -> bool:
+        first_positions = self.postings[phrase[0]][rel_path]
+        following = [set(self.postings[term][rel_path]) for term in phrase[1:]]
+        return any(
+            all(start + offset + 1 in positions for offset, positions in enumerate(following))
+            for start in first_positions
+        )
+
+    def _snippets(self, rel_path: str, needles: List[str]) -> List[str]:
+        try:
+            with open(self._full_path(rel_path), "r", encoding="utf-8") as f:
+                text = f.read(SEARCH_MAX_FILE_BYTES)
+        except (OSError, UnicodeDecodeError):
+            return []
+        lowered = text.lower()
+        snippets = []
+        covered_until = -1
+        matches = sorted(
+            (m.start(), m.end())
+            for needle in needles
+            for m in re.finditer(r"\b" + r"\W+".join(map(re.escape, needle.split())) + r"\b", lowered)
+        )
+        for start, end in matches:
+            if start < covered_until:
+                continue
+            left = max(0, start - _SNIPPET_RADIUS)
+            right = min(len(text), end + _SNIPPET_RADIUS)
+            snippet = " ".join(text[left:right].split())
+            snippets.append(("..." if left else "") + snippet + ("..." if right < len(text) else ""))
+            covered_until = right
+            if len(snippets) >= _MAX_SNIPPETS:
+                break
+        return snippets
+
+    def search(self, query: str, limit: int = 20) -> dict:
+        """Ranked documents containing every term and phrase of the query"""
+        self.sync()
+        terms, phrases = parse_query(query)
+        all_terms = terms + [t for phrase in phrases for t in phrase]
+        if not all_terms:
+            return {"total": 0, "results": []}
+        with self._lock:
+            if any(term not in self.postings for term in all_terms):
+                return {"total": 0, "results": []}
+            # Intersect posting lists, smallest first
+            unique_terms = sorted(set(all_terms), key=lambda t: len(self.postings[t]))
+            candidates = set(self.postings[unique_terms[0]])
+            for term in unique_terms[1:]:
+                candidates &= self.postings[term].keys()
+                if not candidates:
+                    return {"total": 0, "results": []}
+            candidates = [p for p in candidates if all(self._phrase_matches(ph, p) for ph in phrases)]
+
+            doc_count = len(self.docs)
+            average_length = self.total_length / doc_count if doc_count else 1
+            term_weights = Counter(all_terms)
+            scored = []
+            for rel_path in candidates:
+                length = self.docs[rel_path]["length"] or 1
+                score = 0.0
+                for term, weight in term_weights.items():
+                    postings = self.postings[term]
+                    frequency = len(postings[rel_path])
+                    idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                    norm = frequency + _BM25_K1 * (1 - _BM25_B + _BM25_B * length / average_length)
+                    score += weight * idf * frequency * (_BM25_K1 + 1) / norm
+                scored.append((score, rel_path))
+            scored.sort(key=lambda item: (-item[0], item[1]))
+            top = scored[:limit]
+
+        needles = [" ".join(phrase) for phrase in phrases] + terms
+        results = [
+            {
+                "id": rel_path,
+                "name": os.path.basename(rel_path),
+                "score": round(score, 4),
+                "snippets": self._snippets(rel_path, needles),
+            }
+            for score, rel_path in top
+        ]
+        return {"total": len(scored), "results": results}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "root": self.root,
+                "ready": self.ready,
+                "documents": len(self.docs),
+                "terms": len(self.postings),
+                "version": self.synced_version,
+            }
+
+
+_search_indexes: Dict[str, WorkspaceSearchIndex] = {}
+_search_indexes_lock = threading.Lock()
+
+
+def get_search_index(tree_index) -> WorkspaceSearchIndex:
+    """Search index for a workspace tree index (one per workspace root)"""
+    with _search_indexes_lock:
+        index = _search_indexes.get(tree_index.root)
+        if index is None or index.tree_index is not tree_index:
+            index = WorkspaceSearchIndex(tree_index)
+            _search_indexes[tree_index.root] = index
+        return index
+
+
+def save_search_indexes():
+    with _search_indexes_lock:
+        indexes = list(_search_indexes.values())
+    for index in indexes:
+        try:
+            index.save()
+        except Exception as e:
+            logging.error(f"Error saving search index for {index.root}: {e}", exc_info=True)
@@ -0,0 +1,235 @@
+"""Bounded store for Ask AI chat sessions.
+
+Each session keeps the Gemini chat history as plain ``{"role", "parts"}``
+dicts, which ``model.start_chat(history=...)`` accepts directly. The store:
+
+* evicts the least recently used sessions once ``max_sessions`` or the
+  ``max_bytes`` memory budget (JSON size of all histories) is exceeded,
+* expires sessions idle for longer than ``ttl_seconds``,
+* optionally writes sessions through to SQLite, so that sessions evicted from
+  memory, or lost in a restart, are lazily reloaded on next use.
+
+Settings are read from the environment by ``ChatSessionStore.from_env``:
+    CHAT_SESSION_MAX_SESSIONS  sessions kept in memory (default 500)
+    CHAT_SESSION_MAX_BYTES     memory budget for histories (default 64 MiB)
+    CHAT_SESSION_TTL_SECONDS   idle time before a session expires (default 7 days)
+    CHAT_SESSION_DB            SQLite file for persistence (unset = memory only)
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+# Expired rows are purged from SQLite after this many writes
+_PURGE_EVERY_WRITES = 200
+
+
+def _content_to_dict(content) -> dict:
+    """Convert a Gemini history entry (proto Content or dict) into a plain dict"""
+    if isinstance(content, dict):
+        parts = content.get("parts", [])
+        return {
+            "role": content.get("role", "user"),
+            "parts": [{"text": p.get("text", "") if isinstance(p, dict) else str(p)} for p in parts],
+        }
+    return {
+        "role": getattr(content, "role", None) or "model",
+        "parts": [{"text": getattr(part, "text", "")} for part in getattr(content, "parts", [])],
+    }
+
+
+def serialize_history(history) -> List[dict]:
+    """Plain-dict copy of a chat history, safe to persist and to pass to start_chat"""
+    return [_content_to_dict(content) for content in history]
+
+
+class ChatSessionStore:
+    """LRU/TTL bounded chat session store with optional SQLite write-through"""
+
+    def __init__(self, max_sessions: int = 500, max_bytes: int = 64 * 1024 * 1024,
+                 ttl_seconds: float = 7 * 24 * 3600, db_path: Optional[str] = None):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        # session_id -> {"history": [...], "size": int, "last_access": float}
+        self._sessions: "OrderedDict[str, dict]" = OrderedDict()
+        self._total_bytes = 0
+        self._writes_since_purge = 0
+        self._lock = threading.RLock()
+        self._db = None
+        if db_path:
+            self._open_db()
+
+    @classmethod
+    def from_env(cls) -> "ChatSessionStore":
+        return cls(
+            max_sessions=int(os.getenv("CHAT_SESSION_MAX_SESSIONS", "500")),
+            max_bytes=int(os.getenv("CHAT_SESSION_MAX_BYTES", str(64 * 1024 * 1024))),
+            ttl_seconds=float(os.getenv("CHAT_SESSION_TTL_SECONDS", str(7 * 24 * 3600))),
+            db_path=os.getenv("CHAT_SESSION_DB") or None,
+        )
+
+    # --- SQLite persistence ---
+
+    def _open_db(self):
+        try:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS chat_sessions ("
+                "session_id TEXT PRIMARY KEY, history TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._db.commit()
+            self._purge_expired_rows()
+        except sqlite3.Error as e:
+            logging.error(f"Could not open chat session database {self.db_path}: {e}", exc_info=True)
+            self._db = None
+
+    def _purge_expired_rows(self):
+        if not self._db:
+            return
+        cutoff = time.time() - self.ttl_seconds
+        try:
+            self._db.execute("DELETE FROM chat_sessions WHERE updated_at < ?", (cutoff,))
+            self._db.commit()
+        except sqlite3.Error as e:
+            logging.error(f"Could not purge expired chat sessions: {e}", exc_info=True)
+        self._writes_since_purge = 0
+
+    def _persist(self, session_id: str, encoded_history: str, updated_at: float):
+        if not self._db:
+            return
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO chat_sessions (session_id, history, updated_at) VALUES (?, ?, ?)",
+                (session_id, encoded_history, updated_at),
+            )
+            self._db.commit()
+            self._writes_since_purge += 1
+            if self._writes_since_purge >= _PURGE_EVERY_WRITES:
+                self._purge_expired_rows()
+        except sqlite3.Error as e:
+            logging.error(f"Could not persist chat session {session_id}: {e}", exc_info=True)
+
+    def _load(self, session_id: str) -> Optional[List[dict]]:
+        if not self._db:
+            return None
+        try:
+            row = self._db.execute(
+                "SELECT history, updated_at FROM chat_sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logging.error(f"Could not load chat session {session_id}: {e}", exc_info=True)
+            return None
+        if not row:
+            return None
+        encoded_history, updated_at = row
+        if time.time() - updated_at > self.ttl_seconds:
+            self._unpersist(session_id)
+            return None
+        history = json.loads(encoded_history)
+        self._remember(session_id, history, len(encoded_history))
+        return history
+
+    def _unpersist(self, session_id: str):
+        if not self._db:
+            return
+        try:
+            self._db.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+            self._db.commit()
+        except sqlite3.Error as e:
+            logging.error(f"Could not delete chat session {session_id}: {e}", exc_info=True)
+
+    # --- In-memory LRU ---
+
+    def _remember(self, session_id: str, history: List[dict], size: int):
+        self._forget(session_id)
+        self._sessions[session_id] = {"history": history, "size": size, "last_access": time.time()}
+        self._total_bytes += size
+        self._evict()
+
+    def _forget(self, session_id: str):
+        entry = self._sessions.pop(session_id, None)
+        if entry:
+            self._total_bytes -= entry["size"]
+
+    def _evict(self):
+        """Drop least recently used sessions until both limits hold (persisted copies survive).
+
+        The most recently used session is always kept, even if it alone exceeds the budget.
+        """
+        while len(self._sessions) > 1 and (len(self._sessions) > self.max_sessions or self._total_bytes > self.max_bytes):
+            session_id, entry = self._sessions.popitem(last=False)
+            self._total_bytes -= entry["size"]
+
+    def _is_expired(self, entry: dict) -> bool:
+        return time.time() - entry["last_access"] > self.ttl_seconds
+
+    # --- Public API ---
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get_history(session_id) is not None
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get_history(self, session_id: str) -> Optional[List[dict]]:
+        """History for a session, rehydrating it from SQLite if needed; None if unknown"""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                if self._is_expired(entry):
+                    self.delete(session_id)
+                    return None
+                entry["last_access"] = time.time()
+                self._sessions.move_to_end(session_id)
+                return list(entry["history"])
+            history = self._load(session_id)
+            return list(history) if history is not None else None
+
+    def set_history(self, session_id: str, history):
+        """Replace a session's history (accepts Gemini proto Content objects or dicts)"""
+        plain_history = serialize_history(history)
+        encoded_history = json.dumps(plain_history)
+        with self._lock:
+            self._remember(session_id, plain_history, len(encoded_history))
+            self._persist(session_id, encoded_history, time.time())
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._forget(session_id)
+            self._unpersist(session_id)
+
+    def expire_idle(self) -> int:
+        """Remove expired sessions from memory and disk; returns how many were in memory"""
+        with self._lock:
+            expired = [sid for sid, entry in self._sessions.items() if self._is_expired(entry)]
+            for session_id in expired:
+                self._forget(session_id)
+            self._purge_expired_rows()
+            return len(expired)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions_in_memory": len(self._sessions),
+                "bytes_in_memory": self._total_bytes,
+                "max_sessions": self.max_sessions,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "persistent": self._db is not None,
+            }
+
+    def close(self):
+        with self._lock:
+            if self._db:
+                self._db.close()
+                self._db = None
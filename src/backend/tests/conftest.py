@@ -0,0 +1,45 @@
+"""Shared fixtures for the backend tests.
+
+main.py keeps its state (workspace config, caches, stores, assets) relative
+to the working directory and creates it at import time, so the tests import
+it from a scratch directory and never touch the real state.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Before main is imported: nothing to preload, and no log server to ship to
+os.environ.setdefault("PROVIDER_PRELOAD", "0")
+os.environ.setdefault("LOG_SERVER_URL", "http://127.0.0.1:9/log")
+
+
+@pytest.fixture(scope="session")
+def backend():
+    """The imported main module, running in a scratch working directory"""
+    previous = os.getcwd()
+    state_dir = tempfile.mkdtemp(prefix="scribe-test-state-")
+    os.chdir(state_dir)
+    try:
+        import main
+        yield main
+    finally:
+        os.chdir(previous)
+
+
+@pytest.fixture(scope="session")
+def client(backend):
+    from fastapi.testclient import TestClient
+    return TestClient(backend.app)
+
+
+@pytest.fixture
+def workspace(client, tmp_path):
+    """An empty workspace directory, set as the current workspace"""
+    response = client.post("/api/workspace/set", json={"directory": str(tmp_path)})
+    assert response.status_code == 200, response.text
+    return tmp_path
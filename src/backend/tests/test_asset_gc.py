@@ -0,0 +1,45 @@
+"""Asset garbage collection counts links in workspace files as references"""
+import os
+
+import pytest
+
+
+def upload(client, data: bytes) -> str:
+    response = client.post("/api/files/upload", files={"file": ("pasted.png", data, "image/png")})
+    assert response.status_code == 200, response.text
+    return os.path.basename(response.json()["path"])
+
+
+@pytest.fixture
+def assets(backend, monkeypatch):
+    monkeypatch.setattr(backend.asset_store, "link_grace", 0)
+    return backend.asset_store
+
+
+def test_unlinked_uploads_over_quota_are_reclaimed(client, workspace, assets, monkeypatch):
+    names = [upload(client, bytes([n]) * 10_000) for n in range(4)]
+    kept = names[0]
+    client.post("/api/files/write", json={
+        "path": "note.html", "content": f'<p>Diagram</p><img src="http://localhost:8000/assets/{kept}">'})
+    monkeypatch.setattr(assets, "quota_bytes", 10_000)
+
+    report = client.post("/api/files/cleanup-tinycats").json()["report"]
+
+    assert report["links_counted"]
+    assert report["evicted_for_quota"] >= 3
+    assert not report["over_quota"]
+    remaining = os.listdir(assets.directory)
+    assert kept in remaining
+    assert not set(names[1:]) & set(remaining)
+    assert client.get(f"/api/assets/{kept}").json()["refcount"] == 1
+
+
+def test_recent_uploads_are_kept_until_the_grace_period_ends(client, workspace, assets, monkeypatch):
+    names = [upload(client, bytes([n]) * 10_000) for n in range(10, 13)]
+    monkeypatch.setattr(assets, "quota_bytes", 0)
+    monkeypatch.setattr(assets, "link_grace", 3600)
+
+    report = client.post("/api/files/cleanup-tinycats").json()["report"]
+
+    assert report["removed"] == 0
+    assert set(names) <= set(os.listdir(assets.directory))
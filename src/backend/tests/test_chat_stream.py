@@ -0,0 +1,68 @@
+"""Streaming /ask-ai keeps model setup and session history off the event loop"""
+import threading
+from types import SimpleNamespace
+
+
+class FakeChat:
+    def __init__(self, threads):
+        self.history = []
+        self.threads = threads
+
+    def send_message(self, question, stream=False):
+        return None
+
+
+def test_streamed_answer_sets_up_and_saves_the_session_in_threads(backend, client, monkeypatch):
+    threads = {}
+    chat = FakeChat(threads)
+
+    def start_scribe_chat(session_id):
+        threads["setup"] = threading.current_thread()
+        return chat
+
+    def set_history(session_id, history):
+        threads["saved"] = threading.current_thread()
+        threads["history"] = history
+
+    async def stream_provider_call(provider, func, question, **kwargs):
+        threads["loop"] = threading.current_thread()
+        chat.history = [{"role": "user", "parts": [{"text": question}]},
+                        {"role": "model", "parts": [{"text": "Hello there"}]}]
+        for text in ("Hello", " there"):
+            yield SimpleNamespace(text=text)
+
+    monkeypatch.setattr(backend.ScribeAIResponse, "start_scribe_chat", staticmethod(start_scribe_chat))
+    monkeypatch.setattr(backend.chat_sessions, "set_history", set_history)
+    monkeypatch.setattr(backend, "stream_provider_call", stream_provider_call)
+
+    response = client.post("/ask-ai", json={"question": "Hi", "session_id": "stream-test", "stream": True})
+
+    assert response.status_code == 200
+    assert '"done": true' in response.text
+    assert threads["history"] == chat.history
+    assert threads["setup"] is not threads["loop"]
+    assert threads["saved"] is not threads["loop"]
+
+
+def test_failed_answers_delete_the_session_in_threads(backend, client, monkeypatch):
+    threads = {"deleted": []}
+
+    def start_scribe_chat(session_id):
+        raise RuntimeError("Gemini is unavailable")
+
+    def delete(session_id):
+        threads["deleted"].append(threading.current_thread())
+
+    async def attach_documents(question, doc_ids):
+        threads["loop"] = threading.current_thread()
+        return question
+
+    monkeypatch.setattr(backend.ScribeAIResponse, "start_scribe_chat", staticmethod(start_scribe_chat))
+    monkeypatch.setattr(backend.chat_sessions, "delete", delete)
+    monkeypatch.setattr(backend, "attach_documents", attach_documents)
+
+    for stream in (True, False):
+        client.post("/ask-ai", json={"question": "Hi", "session_id": "failing", "stream": stream})
+
+    assert len(threads["deleted"]) == 2
+    assert all(thread is not threads["loop"] for thread in threads["deleted"])
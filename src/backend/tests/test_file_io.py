@@ -0,0 +1,28 @@
+"""Only SCRIBE's own temp files are hidden from listings"""
+import os
+
+from file_io import atomic_write_text, is_atomic_write_temp, make_staging_dir
+
+
+def test_user_dotfiles_ending_in_tmp_are_not_treated_as_temp_files():
+    for name in (".notes.tmp", ".draft.txt.tmp", ".scribe-batch-x.tmp", ".a.scribe-1234.tmp"):
+        assert not is_atomic_write_temp(name)
+
+
+def test_atomic_write_temp_names_are_recognised(tmp_path, monkeypatch):
+    seen = []
+    real_replace = os.replace
+    monkeypatch.setattr(os, "replace", lambda src, dst: (seen.append(src), real_replace(src, dst)))
+
+    atomic_write_text(str(tmp_path / "notes.md"), "hello")
+
+    assert len(seen) == 1 and is_atomic_write_temp(seen[0])
+    assert is_atomic_write_temp(make_staging_dir(str(tmp_path)))
+
+
+def test_listing_shows_user_dotfiles_ending_in_tmp(client, workspace):
+    (workspace / ".notes.tmp").write_text("mine")
+
+    response = client.get("/api/files/list", params={"directory": str(workspace)})
+
+    assert ".notes.tmp" in [item["name"] for item in response.json()["items"]]
@@ -0,0 +1,36 @@
+"""PATCH /api/files/write applies edits at the offsets the client saw in GET /api/files/read"""
+
+
+def utf16_offset(text: str, index: int) -> int:
+    """Offset of text[index] in UTF-16 code units, as a JavaScript client would compute it"""
+    return len(text[:index].encode("utf-16-le")) // 2
+
+
+def test_patch_crlf_file(client, workspace):
+    (workspace / "notes.md").write_bytes("first line\r\nsecond – line\r\nthird line\r\n".encode("utf-8"))
+
+    read = client.get("/api/files/read", params={"path": "notes.md"}).json()
+    content = read["content"]
+    assert content == "first line\r\nsecond – line\r\nthird line\r\n"
+
+    start = content.index("third")
+    edit = {"start": utf16_offset(content, start), "end": utf16_offset(content, start + len("third")),
+            "text": "THIRD"}
+    response = client.patch("/api/files/write", json={"path": "notes.md", "base_version": read["version"],
+                                                     "edits": [edit]})
+    assert response.status_code == 200, response.text
+
+    assert (workspace / "notes.md").read_bytes() == "first line\r\nsecond – line\r\nTHIRD line\r\n".encode("utf-8")
+    assert client.get("/api/files/read", params={"path": "notes.md"}).json()["content"] == \
+        "first line\r\nsecond – line\r\nTHIRD line\r\n"
+
+
+def test_patch_against_stale_version_conflicts(client, workspace):
+    (workspace / "notes.md").write_text("one\n", encoding="utf-8")
+    read = client.get("/api/files/read", params={"path": "notes.md"}).json()
+    client.post("/api/files/write", json={"path": "notes.md", "content": "changed elsewhere\n"})
+
+    response = client.patch("/api/files/write", json={"path": "notes.md", "base_version": read["version"],
+                                                     "edits": [{"start": 0, "end": 3, "text": "two"}]})
+    assert response.status_code == 409
+    assert (workspace / "notes.md").read_text(encoding="utf-8") == "changed elsewhere\n"
@@ -0,0 +1,49 @@
+"""Base64 uploads and image processing resolve images in the asset store"""
+import base64
+import os
+
+import pytest
+
+
+def test_base64_upload_is_decoded_into_the_assets_directory(backend, client):
+    data = bytes(range(256)) * 4000  # Spans several decoder chunks
+    response = client.post("/api/files/upload-base64", json={
+        "base64_data": "data:image/png;base64," + base64.b64encode(data).decode(),
+        "filename": "tinycats-slide.png",
+    })
+
+    assert response.status_code == 200, response.text
+    with open(os.path.join(backend.asset_store.directory, "tinycats-slide.png"), "rb") as f:
+        assert f.read() == data
+    assert backend.asset_store.get("tinycats-slide.png")["size"] == len(data)
+
+
+def test_invalid_base64_upload_is_rejected_without_leaving_a_file(backend, client):
+    response = client.post("/api/files/upload-base64", json={"base64_data": "not*base64", "filename": "bad.png"})
+
+    assert response.status_code == 400
+    assert not os.path.exists(os.path.join(backend.asset_store.directory, "bad.png"))
+
+
+@pytest.fixture
+def image_client(backend, client, monkeypatch):
+    """The client, with a Gemini key set and no Gemini SDK calls"""
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    monkeypatch.setattr(backend, "gemini_client", lambda api_key: None)
+    monkeypatch.setattr(backend, "gemini_types", lambda: None)
+    return client
+
+
+@pytest.mark.parametrize("image_url", ["/assets/../main.py", "/assets/", "/assets/%2E%2E%2Fconfig.json"])
+def test_image_url_must_name_a_file_in_the_assets_directory(image_client, image_url):
+    response = image_client.post("/api/image/process", json={"image_url": image_url})
+
+    assert response.status_code == 400
+
+
+def test_image_is_looked_up_in_the_asset_store_directory(backend, image_client, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)  # Not where the assets are
+    response = image_client.post("/api/image/process", json={"image_url": "/assets/missing.png"})
+
+    assert response.status_code == 404
+    assert os.path.join(backend.asset_store.directory, "missing.png") in response.json()["detail"]
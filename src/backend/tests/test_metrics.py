@@ -0,0 +1,14 @@
+"""/metrics renders from in-memory state, without querying the LLM cache"""
+
+
+def test_metrics_report_the_llm_cache_size_without_querying_it(backend, client, monkeypatch):
+    def stats():
+        raise AssertionError("/metrics must not query the LLM cache")
+
+    monkeypatch.setattr(backend.llm_cache, "stats", stats)
+    monkeypatch.setattr(backend.llm_cache, "_total_bytes", 1234)
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert "scribe_llm_cache_bytes 1234" in response.text
@@ -0,0 +1,44 @@
+"""Provider streams hold their slot until the remote stream is closed"""
+import asyncio
+import threading
+
+import provider_executor
+from provider_executor import provider_stats, stream_provider_call
+
+
+def test_abandoned_stream_is_closed_before_its_slot_is_released():
+    closed = threading.Event()
+
+    def generate(count):
+        try:
+            for n in range(count):
+                yield n
+        finally:
+            closed.set()
+
+    remote = generate(1000)  # Kept alive here, so only an explicit close() ends it
+
+    async def consume_one():
+        stream = stream_provider_call("closing-test", lambda: remote)
+        assert await stream.__anext__() == 0
+        await stream.aclose()
+        for _ in range(200):
+            if provider_stats()["closing-test"]["in_flight"] == 0:
+                break
+            await asyncio.sleep(0.01)
+        return provider_stats()["closing-test"]["in_flight"]
+
+    in_flight = asyncio.run(consume_one())
+
+    assert closed.is_set()
+    assert in_flight == 0
+    provider_executor._semaphores.pop("closing-test")
+
+
+def test_finished_stream_releases_its_slot():
+    async def consume_all():
+        items = [item async for item in stream_provider_call("finished-test", iter, [1, 2, 3])]
+        return items, provider_stats()["finished-test"]["in_flight"]
+
+    assert asyncio.run(consume_all()) == ([1, 2, 3], 0)
+    provider_executor._semaphores.pop("finished-test")
@@ -0,0 +1,23 @@
+"""The default HTML extraction engine matches the BeautifulSoup extraction"""
+import pytest
+
+from web_extract import extract_page, resolve_engine
+
+# Malformed markup that libxml2 repairs differently from html.parser
+PAGES = {
+    "stray_end_tags": "<p>a</div></span>b</p>",
+    "text_outside_body": "<html>x<head><title>t</title></head>y<body>z</body>w</html>",
+    "unclosed": "<html><head><title>T</title><body><p>one<p>two<div>three",
+    "main_content": '<main><p>m1</p><article><p>a</p></article></main><div id=content>c</div>',
+    "links": '<a href="/x">one</a><a href=\'y\'>two</a><a>three</a>',
+}
+
+
+def test_auto_uses_the_stream_engine():
+    assert resolve_engine("auto") == "stream"
+
+
+@pytest.mark.parametrize("name", sorted(PAGES))
+def test_stream_engine_matches_bs4(name):
+    html = PAGES[name]
+    assert extract_page(html, True, engine="stream") == extract_page(html, True, engine="bs4")
@@ -0,0 +1,30 @@
+"""Only the workspace root gets a filesystem watcher"""
+import pytest
+
+from workspace_index import Observer, get_tree_index
+
+pytestmark = pytest.mark.skipif(Observer is None, reason="watchdog is not installed")
+
+
+def test_listing_another_directory_does_not_watch_it(client, workspace, tmp_path_factory):
+    other = tmp_path_factory.mktemp("other")
+    (other / "a.txt").write_text("a")
+
+    response = client.get("/api/files/list", params={"directory": str(other)})
+
+    assert [item["name"] for item in response.json()["items"]] == ["a.txt"]
+    assert "ETag" not in response.headers
+    assert not get_tree_index(str(other)).watching
+
+
+def test_switching_workspaces_moves_the_watcher(client, workspace, tmp_path_factory):
+    assert client.get("/api/workspace/browse").headers.get("ETag")
+    first = get_tree_index(str(workspace))
+    assert first.watching
+
+    second = tmp_path_factory.mktemp("second")
+    client.post("/api/workspace/set", json={"directory": str(second)})
+    client.get("/api/workspace/browse")
+
+    assert get_tree_index(str(second)).watching
+    assert not first.watching
@@ -0,0 +1,116 @@
+"""Concurrent multi-page scraping: a list of URLs, optionally crawled further.
+
+``crawl`` takes a ``scrape(url)`` coroutine (the same fetch-and-extract used
+by ``/api/scrape``) and runs it over the start URLs and, up to ``max_depth``
+links away, the pages they link to. Results are yielded as each page
+completes rather than in request order.
+
+Concurrency is bounded twice: by ``SCRAPE_BATCH_CONCURRENCY`` pages in flight
+across all batches in the process, and by the web client's per-host
+connection cap and request pacing, so a crawl of one site stays polite while
+pages from different hosts proceed in parallel.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Deque, Iterable, Optional, Set, Tuple
+from urllib.parse import urldefrag, urljoin, urlsplit
+
+SCRAPE_BATCH_CONCURRENCY = int(os.getenv("SCRAPE_BATCH_CONCURRENCY", "16"))
+SCRAPE_BATCH_MAX_PAGES = int(os.getenv("SCRAPE_BATCH_MAX_PAGES", "200"))
+
+# Shared by every batch on the event loop; created lazily so it binds to the running loop
+_global_slots: Optional[asyncio.Semaphore] = None
+
+
+def _slots() -> asyncio.Semaphore:
+    global _global_slots
+    if _global_slots is None:
+        _global_slots = asyncio.Semaphore(SCRAPE_BATCH_CONCURRENCY)
+    return _global_slots
+
+
+def normalize_url(url: str, base: Optional[str] = None) -> Optional[str]:
+    """Absolute http(s) URL without its fragment, or None for anything else"""
+    absolute = urljoin(base, url.strip()) if base else url.strip()
+    absolute, _ = urldefrag(absolute)
+    parts = urlsplit(absolute)
+    if parts.scheme not in ("http", "https") or not parts.netloc:
+        return None
+    return absolute
+
+
+def site_of(url: str) -> str:
+    """Host name used for same-domain checks, ignoring a leading "www." """
+    host = (urlsplit(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+async def crawl(
+    scrape: Callable[[str], Awaitable[dict]],
+    start_urls: Iterable[str],
+    max_depth: int = 0,
+    same_domain: bool = True,
+    max_pages: int = SCRAPE_BATCH_MAX_PAGES,
+) -> AsyncIterator[dict]:
+    """Scrape ``start_urls`` and linked pages, yielding one event per page as it finishes.
+
+    ``scrape(url)`` returns the page result with a ``links`` list, which is
+    used to go deeper and is not passed on. Events are
+    ``{"url", "depth", "status": "success", "result": {...}}`` or
+    ``{"url", "depth", "status": "error", "status_code", "error"}``.
+    """
+    seen: Set[str] = set()
+    queue: Deque[Tuple[str, int]] = deque()  # (url, depth) not yet started
+    rejected = []
+    for url in start_urls:
+        normalized = normalize_url(url)
+        if not normalized:
+            rejected.append(url)
+        elif normalized not in seen and len(seen) < max_pages:
+            seen.add(normalized)
+            queue.append((normalized, 0))
+    allowed_sites = {site_of(url) for url, _ in queue}
+    for url in rejected:
+        yield {"url": url, "depth": 0, "status": "error", "status_code": 400,
+               "error": "Only absolute http(s) URLs can be scraped", "ms": 0.0}
+
+    async def run(url: str, depth: int) -> dict:
+        async with _slots():
+            started = time.perf_counter()
+            try:
+                result = await scrape(url)
+            except Exception as e:
+                if not hasattr(e, "status_code"):
+                    logging.error(f"Error scraping {url}: {e}", exc_info=True)
+                return {"url": url, "depth": depth, "status": "error",
+                        "status_code": getattr(e, "status_code", 500), "error": getattr(e, "detail", None) or str(e),
+                        "ms": round((time.perf_counter() - started) * 1000, 1)}
+            return {"url": url, "depth": depth, "status": "success", "result": result,
+                    "ms": round((time.perf_counter() - started) * 1000, 1)}
+
+    running = set()
+    try:
+        while queue or running:
+            # Start everything queued; the global semaphore bounds what actually runs
+            while queue:
+                url, depth = queue.popleft()
+                running.add(asyncio.ensure_future(run(url, depth)))
+            done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                event = task.result()
+                links = event.get("result", {}).pop("links", []) if event["status"] == "success" else []
+                if event["depth"] < max_depth:
+                    for link in links:
+                        normalized = normalize_url(link, event["url"])
+                        if (not normalized or normalized in seen or len(seen) >= max_pages
+                                or (same_domain and site_of(normalized) not in allowed_sites)):
+                            continue
+                        seen.add(normalized)
+                        queue.append((normalized, event["depth"] + 1))
+                yield event
+    finally:
+        for task in running:
+            task.cancel()
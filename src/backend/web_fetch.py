@@ -0,0 +1,363 @@
+"""Shared HTTP client for fetching web pages, with an on-disk HTTP cache.
+
+``WebFetcher`` owns one ``aiohttp.ClientSession`` for the lifetime of the app,
+so fetches reuse keep-alive connections and cached DNS lookups, and the
+connector caps connections overall and per host. Bodies are read in chunks
+and abandoned as soon as they exceed ``SCRAPE_MAX_BYTES``.
+
+Successful GET responses are cached in ``HTTP_CACHE_DIR`` following the
+response's caching headers: fresh entries (``Cache-Control: max-age`` or
+``Expires``) are served without any request, stale entries with an ``ETag`` or
+``Last-Modified`` are revalidated with a conditional request (a 304 costs no
+body), and ``no-store`` responses are never written. The cache is evicted
+least recently used first beyond ``HTTP_CACHE_MAX_BYTES``.
+
+aiohttp is imported when the first session is created, which keeps it out of
+the backend's startup; network errors are raised as ``FetchError`` so callers
+need not import it either.
+
+Settings:
+    SCRAPE_MAX_CONNECTIONS   open connections in total (default 100)
+    SCRAPE_MAX_PER_HOST      open connections per host (default 8)
+    SCRAPE_TIMEOUT           seconds per fetch (default 30)
+    SCRAPE_MAX_BYTES         largest body accepted (default 5 MiB)
+    SCRAPE_HOST_INTERVAL     minimum seconds between requests to one host (default 0.5)
+    HTTP_CACHE_DIR           cache directory (default "http_cache", empty disables)
+    HTTP_CACHE_MAX_BYTES     cache size budget (default 256 MiB)
+"""
+import asyncio
+import calendar
+import email.utils
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, Optional
+from urllib.parse import urlsplit
+
+if TYPE_CHECKING:
+    import aiohttp
+
+SCRAPE_MAX_CONNECTIONS = int(os.getenv("SCRAPE_MAX_CONNECTIONS", "100"))
+SCRAPE_MAX_PER_HOST = int(os.getenv("SCRAPE_MAX_PER_HOST", "8"))
+SCRAPE_TIMEOUT = float(os.getenv("SCRAPE_TIMEOUT", "30"))
+SCRAPE_MAX_BYTES = int(os.getenv("SCRAPE_MAX_BYTES", str(5 * 1024 * 1024)))
+SCRAPE_HOST_INTERVAL = float(os.getenv("SCRAPE_HOST_INTERVAL", "0.5"))
+HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR", "http_cache")
+HTTP_CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+_READ_CHUNK_SIZE = 64 * 1024
+# Response headers kept with a cache entry
+_CACHED_HEADERS = ("content-type", "etag", "last-modified", "cache-control", "expires", "date")
+
+
+class ResponseTooLarge(Exception):
+    """The response body exceeded the size cap"""
+
+    def __init__(self, limit: int):
+        super().__init__(f"Response is larger than {limit} bytes")
+        self.limit = limit
+
+
+class FetchError(Exception):
+    """The request failed with a connection, TLS or protocol error"""
+
+
+@dataclass
+class FetchResult:
+    url: str
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+    cache: str = "miss"  # "miss", "hit" (served from cache) or "revalidated" (304)
+    stored_at: float = field(default_factory=time.time)
+
+    @property
+    def content_type(self) -> str:
+        return self.headers.get("content-type", "")
+
+    @property
+    def charset(self) -> Optional[str]:
+        for param in self.content_type.split(";")[1:]:
+            name, _, value = param.strip().partition("=")
+            if name.lower() == "charset" and value:
+                return value.strip('"\'')
+        return None
+
+    def text(self) -> str:
+        """Body decoded with the declared charset, else UTF-8, else Windows-1252"""
+        charset = self.charset
+        if charset:
+            try:
+                return self.body.decode(charset, errors="replace")
+            except LookupError:
+                pass
+        try:
+            return self.body.decode("utf-8")
+        except UnicodeDecodeError:
+            return self.body.decode("cp1252", errors="replace")
+
+
+def _parse_cache_control(value: str) -> Dict[str, Optional[str]]:
+    directives = {}
+    for part in value.split(","):
+        name, _, argument = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"') or None
+    return directives
+
+
+def _http_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    parsed = email.utils.parsedate(value)
+    return calendar.timegm(parsed) if parsed else None
+
+
+def freshness_lifetime(headers: Dict[str, str]) -> Optional[float]:
+    """Seconds a response may be reused without revalidation; None if it must not be stored"""
+    directives = _parse_cache_control(headers.get("cache-control", ""))
+    if "no-store" in directives:
+        return None
+    if "no-cache" in directives:
+        return 0.0
+    max_age = directives.get("max-age")
+    if max_age is not None:
+        try:
+            return max(0.0, float(max_age))
+        except ValueError:
+            return 0.0
+    expires = _http_date(headers.get("expires"))
+    if expires is not None:
+        date = _http_date(headers.get("date")) or time.time()
+        return max(0.0, expires - date)
+    return 0.0
+
+
+class HTTPCache:
+    """Disk cache of response bodies plus a JSON sidecar of metadata per URL"""
+
+    def __init__(self, directory: Optional[str] = HTTP_CACHE_DIR, max_bytes: int = HTTP_CACHE_MAX_BYTES):
+        self.directory = directory or None
+        self.max_bytes = max_bytes
+        self._sizes: "OrderedDict[str, int]" = OrderedDict()  # key -> bytes on disk, LRU first
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        if self.directory:
+            self._scan()
+
+    def _scan(self):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            entries = []
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith(".json"):
+                        key = entry.name[:-len(".json")]
+                        stats = entry.stat()
+                        body_path = self._body_path(key)
+                        size = stats.st_size + (os.path.getsize(body_path) if os.path.exists(body_path) else 0)
+                        entries.append((stats.st_mtime, key, size))
+        except OSError as e:
+            logging.error(f"Could not open HTTP cache {self.directory}: {e}", exc_info=True)
+            self.directory = None
+            return
+        for _, key, size in sorted(entries):
+            self._sizes[key] = size
+            self._total_bytes += size
+
+    @staticmethod
+    def key(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _body_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.body")
+
+    def get(self, url: str) -> Optional[dict]:
+        """``{"meta": {...}, "body": bytes}`` for a cached URL, or None"""
+        if not self.directory:
+            return None
+        key = self.key(url)
+        with self._lock:
+            if key not in self._sizes:
+                return None
+            self._sizes.move_to_end(key)
+        try:
+            with open(self._meta_path(key), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(self._body_path(key), "rb") as f:
+                body = f.read()
+            os.utime(self._meta_path(key))  # Keeps LRU order across restarts
+        except (OSError, ValueError):
+            self.remove(url)
+            return None
+        if meta.get("url") != url:
+            return None
+        return {"meta": meta, "body": body}
+
+    def put(self, url: str, meta: dict, body: Optional[bytes] = None):
+        """Store an entry; ``body=None`` only refreshes the metadata of an existing entry"""
+        if not self.directory:
+            return
+        key = self.key(url)
+        try:
+            if body is not None:
+                temp_body = f"{self._body_path(key)}.{threading.get_ident()}.tmp"
+                with open(temp_body, "wb") as f:
+                    f.write(body)
+                os.replace(temp_body, self._body_path(key))
+            temp_meta = f"{self._meta_path(key)}.{threading.get_ident()}.tmp"
+            with open(temp_meta, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.replace(temp_meta, self._meta_path(key))
+            size = os.path.getsize(self._meta_path(key)) + os.path.getsize(self._body_path(key))
+        except OSError as e:
+            logging.error(f"Could not write HTTP cache entry for {url}: {e}", exc_info=True)
+            return
+        evicted = []
+        with self._lock:
+            self._total_bytes += size - self._sizes.pop(key, 0)
+            self._sizes[key] = size
+            while len(self._sizes) > 1 and self._total_bytes > self.max_bytes:
+                evicted_key, evicted_size = self._sizes.popitem(last=False)
+                self._total_bytes -= evicted_size
+                evicted.append(evicted_key)
+        for evicted_key in evicted:
+            self._delete_files(evicted_key)
+
+    def remove(self, url: str):
+        key = self.key(url)
+        with self._lock:
+            self._total_bytes -= self._sizes.pop(key, 0)
+        self._delete_files(key)
+
+    def _delete_files(self, key: str):
+        for path in (self._meta_path(key), self._body_path(key)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._sizes), "bytes": self._total_bytes, "max_bytes": self.max_bytes}
+
+
+class HostRateLimiter:
+    """Spaces out request starts to each host by at least ``interval`` seconds"""
+
+    def __init__(self, interval: float = SCRAPE_HOST_INTERVAL):
+        self.interval = interval
+        self._next_start: Dict[str, float] = {}
+
+    async def wait(self, host: str):
+        # Reserving the slot involves no await, so concurrent callers on the loop queue up in order
+        now = time.monotonic()
+        start = max(now, self._next_start.get(host, 0.0))
+        self._next_start[host] = start + self.interval
+        if len(self._next_start) > 10000:
+            self._next_start = {h: t for h, t in self._next_start.items() if t > now}
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+class WebFetcher:
+    """App-lifetime pooled HTTP client with a response size cap, HTTP cache and per-host pacing"""
+
+    def __init__(self, cache: Optional[HTTPCache] = None, max_bytes: int = SCRAPE_MAX_BYTES,
+                 rate_limiter: Optional[HostRateLimiter] = None):
+        self.cache = cache if cache is not None else HTTPCache()
+        self.max_bytes = max_bytes
+        self.rate_limiter = rate_limiter if rate_limiter is not None else HostRateLimiter()
+        self._session: Optional["aiohttp.ClientSession"] = None
+
+    def _get_session(self) -> "aiohttp.ClientSession":
+        # Created lazily so it binds to the running event loop
+        if self._session is None or self._session.closed:
+            import aiohttp
+            connector = aiohttp.TCPConnector(
+                limit=SCRAPE_MAX_CONNECTIONS,
+                limit_per_host=SCRAPE_MAX_PER_HOST,
+                ttl_dns_cache=300,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=SCRAPE_TIMEOUT),
+            )
+        return self._session
+
+    async def _read_body(self, response: "aiohttp.ClientResponse") -> bytes:
+        declared = response.content_length
+        if declared is not None and declared > self.max_bytes:
+            raise ResponseTooLarge(self.max_bytes)
+        chunks = []
+        received = 0
+        async for chunk in response.content.iter_chunked(_READ_CHUNK_SIZE):
+            received += len(chunk)
+            if received > self.max_bytes:
+                raise ResponseTooLarge(self.max_bytes)
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    async def fetch(self, url: str, headers: Optional[Dict[str, str]] = None) -> FetchResult:
+        """GET a URL through the cache; raises ResponseTooLarge or FetchError"""
+        cached = await asyncio.to_thread(self.cache.get, url)
+        request_headers = dict(headers or {})
+        if cached is not None:
+            meta = cached["meta"]
+            if time.time() < meta["fresh_until"]:
+                return FetchResult(url, meta["status"], meta["headers"], cached["body"], "hit", meta["stored_at"])
+            if meta["headers"].get("etag"):
+                request_headers["If-None-Match"] = meta["headers"]["etag"]
+            if meta["headers"].get("last-modified"):
+                request_headers["If-Modified-Since"] = meta["headers"]["last-modified"]
+
+        # Only requests that reach the network are paced; cache hits returned above
+        await self.rate_limiter.wait(urlsplit(url).netloc.lower())
+        import aiohttp
+        try:
+            async with self._get_session().get(url, headers=request_headers) as response:
+                response_headers = {name: response.headers[name] for name in _CACHED_HEADERS if name in response.headers}
+                if response.status == 304 and cached is not None:
+                    meta = cached["meta"]
+                    meta["headers"].update(response_headers)
+                    lifetime = freshness_lifetime(meta["headers"])
+                    if lifetime is None:
+                        await asyncio.to_thread(self.cache.remove, url)
+                    else:
+                        meta["fresh_until"] = time.time() + lifetime
+                        await asyncio.to_thread(self.cache.put, url, meta)
+                    return FetchResult(url, meta["status"], meta["headers"], cached["body"], "revalidated", meta["stored_at"])
+
+                body = await self._read_body(response)
+                result = FetchResult(str(response.url), response.status, response_headers, body)
+        except aiohttp.ClientError as e:
+            raise FetchError(str(e)) from e
+
+        if response.status == 200:
+            lifetime = freshness_lifetime(response_headers)
+            validatable = "etag" in response_headers or "last-modified" in response_headers
+            if lifetime is not None and (lifetime > 0 or validatable):
+                meta = {
+                    "url": url,
+                    "status": response.status,
+                    "headers": response_headers,
+                    "stored_at": result.stored_at,
+                    "fresh_until": result.stored_at + lifetime,
+                }
+                await asyncio.to_thread(self.cache.put, url, meta, body)
+            elif cached is not None:
+                await asyncio.to_thread(self.cache.remove, url)
+        return result
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
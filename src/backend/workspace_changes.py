@@ -0,0 +1,111 @@
+"""Versioned feed of workspace changes.
+
+Every change to a workspace (made through the backend or seen by the
+filesystem watcher) is appended to a ``WorkspaceChangeFeed`` with a
+monotonically increasing version. Clients remember the last version they saw
+and ask only for what changed since then, instead of re-fetching the whole tree.
+
+Only the most recent ``WORKSPACE_FEED_SIZE`` changes are kept; a client that
+falls further behind is told to ``reset`` (re-fetch the full listing). Each
+feed has a random ``epoch`` so clients can tell when versions restarted, e.g.
+after a backend restart or a workspace switch.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import List, Optional
+from uuid import uuid4
+
+WORKSPACE_FEED_SIZE = int(os.getenv("WORKSPACE_FEED_SIZE", "10000"))
+
+# A change reported by both the backend and the watcher (in either order)
+# within this many seconds is recorded once, so our own writes are not
+# reported twice. Back-to-back duplicates from one source are merged too.
+_ECHO_WINDOW = 2.0
+
+# Atomic saves reach the watcher as a rename onto the target, which it cannot
+# tell apart from an overwrite, so "add" and "modify" echo each other.
+_ECHO_OPS = {"add": "write", "modify": "write"}
+
+
+class WorkspaceChangeFeed:
+    """Thread-safe, bounded change log with async waiters for long-poll/SSE"""
+
+    def __init__(self, max_changes: int = WORKSPACE_FEED_SIZE):
+        self.epoch = uuid4().hex[:12]
+        self.version = 0
+        self._changes = deque(maxlen=max_changes)
+        self._recent = {}  # (echo op, path, old_path) -> (monotonic time, from_watcher, change)
+        self._lock = threading.Lock()
+        self._waiters = set()  # (loop, asyncio.Event)
+
+    def record(self, op: str, path: str, old_path: Optional[str] = None,
+               item_type: Optional[str] = None, from_watcher: bool = False) -> int:
+        """Append a change and wake waiting clients; returns the new version"""
+        now = time.monotonic()
+        with self._lock:
+            key = (_ECHO_OPS.get(op, op), path, old_path)
+            recent = self._recent.get(key)
+            if recent is not None and now - recent[0] < _ECHO_WINDOW:
+                is_echo = recent[1] != from_watcher
+                is_repeat = bool(self._changes) and self._changes[-1] is recent[2]
+                if is_echo or is_repeat:
+                    if op == "add":
+                        recent[2]["op"] = "add"  # The backend knows the file is new
+                    return self.version
+            if len(self._recent) > 1000:
+                self._recent = {k: v for k, v in self._recent.items() if now - v[0] < _ECHO_WINDOW}
+            self.version += 1
+            change = {
+                "version": self.version,
+                "op": op,
+                "path": path,
+                "type": item_type,
+                "timestamp": time.time(),
+            }
+            if old_path is not None:
+                change["old_path"] = old_path
+            self._changes.append(change)
+            self._recent[key] = (now, from_watcher, change)
+            waiters = list(self._waiters)
+        for loop, event in waiters:
+            loop.call_soon_threadsafe(event.set)
+        return self.version
+
+    def new_epoch(self):
+        """Start a new epoch, telling clients to re-fetch: changes may have gone unrecorded"""
+        with self._lock:
+            self.epoch = uuid4().hex[:12]
+
+    def changes_since(self, version: int, epoch: Optional[str] = None) -> dict:
+        """Changes after ``version``, or a reset marker if they are no longer retained"""
+        with self._lock:
+            current = self.version
+            oldest_retained = self._changes[0]["version"] if self._changes else current + 1
+            reset = ((epoch is not None and epoch != self.epoch) or version > current
+                     or (version < current and version + 1 < oldest_retained))
+            changes: List[dict] = [] if reset else [c for c in self._changes if c["version"] > version]
+        return {"epoch": self.epoch, "version": current, "reset": reset, "changes": changes}
+
+    async def wait_for_change(self, version: int, timeout: float) -> bool:
+        """Wait until the feed moves past ``version``; False on timeout"""
+        if self.version > version:
+            return True
+        event = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), event)
+        with self._lock:
+            self._waiters.add(waiter)
+        try:
+            while self.version <= version:
+                event.clear()
+                if self.version > version:
+                    break
+                await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
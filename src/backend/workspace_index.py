@@ -0,0 +1,321 @@
+"""Cached directory tree index for workspace listings.
+
+Listing a workspace used to walk every directory and stat every entry on each
+request. ``WorkspaceTreeIndex`` keeps one cached listing per directory and only
+rescans a directory when it may have changed:
+
+* with ``watchdog`` installed (inotify on Linux), a filesystem observer
+  invalidates the affected directories as soon as something changes;
+* otherwise a cached listing is reused while the directory's own mtime is
+  unchanged (adds, removes and renames bump it) and the listing is younger
+  than ``WORKSPACE_INDEX_MAX_AGE`` seconds, which bounds how stale the size and
+  modified time of files edited in place by other programs can get.
+
+Only the current workspace root is watched: ``get_tree_index`` starts the
+observer when asked to ``watch`` a directory and stops the others, so other
+directories a client lists are served with mtime validation. Starting an
+observer walks the whole tree, so callers on the event loop run
+``get_tree_index`` in a worker thread.
+
+Mutations made through the backend call ``record_change`` directly. Each
+index also owns the workspace's ``WorkspaceChangeFeed``, which the backend
+and the watcher both feed.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from file_io import is_atomic_write_temp, in_temp_area
+from workspace_changes import WorkspaceChangeFeed
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # Optional: fall back to mtime validation only
+    FileSystemEventHandler = object
+    Observer = None
+
+WORKSPACE_INDEX_MAX_AGE = float(os.getenv("WORKSPACE_INDEX_MAX_AGE", "30"))
+MAX_INDEXED_WORKSPACES = 4
+
+# watchdog event type -> change feed op
+_WATCHER_OPS = {"created": "add", "deleted": "remove", "moved": "rename", "modified": "modify"}
+
+
+def _relative_dir_key(path: str) -> str:
+    """Normalized key for a directory relative to the index root ("" is the root)"""
+    key = os.path.normpath(path) if path else ""
+    return "" if key in (".", os.curdir) else key
+
+
+class _WatchdogHandler(FileSystemEventHandler):
+    def __init__(self, index: "WorkspaceTreeIndex"):
+        super().__init__()
+        self.index = index
+
+    def _relative(self, path) -> str:
+        return os.path.relpath(os.fsdecode(path), self.index.root)
+
+    def on_any_event(self, event):
+        op = _WATCHER_OPS.get(event.event_type)
+        if op is None:
+            return  # opened/closed carry no change
+        src_path = self._relative(event.src_path)
+        dest_path = self._relative(event.dest_path) if op == "rename" else None
+        if in_temp_area(src_path):
+            if op == "rename" and not in_temp_area(dest_path):
+                # An atomic save renaming its temp file over the target, or a rollback restoring an item
+                if event.is_directory:
+                    self.index.record_change("add", dest_path, item_type="folder", from_watcher=True)
+                else:
+                    self.index.record_change("modify", dest_path, item_type="file", from_watcher=True)
+            return
+        if op == "rename" and in_temp_area(dest_path):
+            # Moved into a batch staging directory: gone from the workspace
+            op = "remove"
+        if event.is_directory and op == "modify":
+            # A directory's own mtime changed; its entries are reported separately
+            self.index.invalidate_listing(src_path)
+            return
+        item_type = "folder" if event.is_directory else "file"
+        if op == "rename":
+            self.index.record_change(op, dest_path, src_path, item_type, from_watcher=True)
+        else:
+            self.index.record_change(op, src_path, item_type=item_type, from_watcher=True)
+
+
+class WorkspaceTreeIndex:
+    """In-memory, lazily filled index of one workspace directory tree"""
+
+    def __init__(self, root: str, max_age: float = WORKSPACE_INDEX_MAX_AGE, watch: bool = True):
+        self.root = root
+        self.max_age = max_age
+        # relative dir -> {"mtime_ns": int, "scanned_at": float, "items": [item, ...]}
+        self._dirs: Dict[str, dict] = {}
+        self._lock = threading.RLock()
+        self.changes = WorkspaceChangeFeed()
+        self._observer = None
+        self.watch = watch
+        if watch:
+            self._start_watcher()
+
+    # --- Watcher ---
+
+    def _start_watcher(self):
+        if Observer is None:
+            return
+        try:
+            observer = Observer()
+            observer.schedule(_WatchdogHandler(self), self.root, recursive=True)
+            observer.daemon = True
+            observer.start()
+            self._observer = observer
+            logging.info(f"Watching workspace for changes: {self.root}")
+        except Exception as e:
+            logging.warning(f"Could not watch workspace {self.root}, using mtime validation: {e}")
+            self._observer = None
+
+    @property
+    def watching(self) -> bool:
+        return self._observer is not None and self._observer.is_alive()
+
+    def start_watching(self):
+        """Watch the tree from now on (no-op if already asked to)"""
+        if self.watch:
+            return
+        self.watch = True
+        with self._lock:
+            # Changes made while unwatched were neither seen nor recorded
+            self._dirs.clear()
+            self.changes.new_epoch()
+        self._start_watcher()
+
+    def close(self):
+        self.watch = False
+        if self._observer:
+            self._observer.stop()
+            self._observer = None
+
+    # --- Scanning ---
+
+    def _scan_directory(self, rel_dir: str, mtime_ns: int) -> dict:
+        """List one directory and stat its entries"""
+        full_dir = os.path.join(self.root, rel_dir) if rel_dir else self.root
+        items = []
+        with os.scandir(full_dir) as entries:
+            for entry in entries:
+                if is_atomic_write_temp(entry.name):
+                    continue  # An in-progress save, about to be renamed over its target
+                try:
+                    stats = entry.stat()
+                    is_dir = entry.is_dir()
+                except OSError:
+                    continue  # Vanished or unreadable between listing and stat
+                relative_path = os.path.join(rel_dir, entry.name) if rel_dir else entry.name
+                modified = datetime.fromtimestamp(stats.st_mtime).isoformat()
+                if is_dir:
+                    items.append({
+                        "id": relative_path,
+                        "name": entry.name,
+                        "type": "folder",
+                        "modified": modified,
+                    })
+                else:
+                    _, ext = os.path.splitext(entry.name)
+                    items.append({
+                        "id": relative_path,
+                        "name": entry.name,
+                        "type": "file",
+                        "size": stats.st_size,
+                        "extension": ext.lower()[1:] if ext else "",
+                        "modified": modified,
+                    })
+        listing = {"mtime_ns": mtime_ns, "scanned_at": time.monotonic(), "items": items}
+        self._dirs[rel_dir] = listing
+        return listing
+
+    def _listing(self, rel_dir: str) -> List[dict]:
+        """Cached listing for a directory, rescanning it if it may be stale"""
+        with self._lock:
+            cached = self._dirs.get(rel_dir)
+            if cached is not None and self.watching:
+                return cached["items"]
+            full_dir = os.path.join(self.root, rel_dir) if rel_dir else self.root
+            mtime_ns = os.stat(full_dir).st_mtime_ns
+            if (cached is not None and cached["mtime_ns"] == mtime_ns
+                    and time.monotonic() - cached["scanned_at"] < self.max_age):
+                return cached["items"]
+            return self._scan_directory(rel_dir, mtime_ns)["items"]
+
+    def tree(self, rel_dir: str = "", depth: Optional[int] = None) -> List[dict]:
+        """Nested items under ``rel_dir`` in the shape of the old recursive listing.
+
+        ``depth`` limits how many folder levels are expanded (1 = direct children
+        only). Folders beyond it carry ``"children": []`` and
+        ``"children_loaded": False``; clients expand them by asking for that
+        folder's ``id`` as ``rel_dir``.
+        """
+        rel_dir = _relative_dir_key(rel_dir)
+        try:
+            listing = self._listing(rel_dir)
+        except OSError as e:
+            logging.error(f"Error reading directory structure: {e}", exc_info=True)
+            return []
+        items = []
+        for item in listing:
+            if item["type"] != "folder":
+                items.append(item)
+                continue
+            folder = dict(item)
+            if depth is None or depth > 1:
+                folder["children"] = self.tree(item["id"], None if depth is None else depth - 1)
+            else:
+                folder["children"] = []
+                folder["children_loaded"] = False
+            items.append(folder)
+        return items
+
+    # --- Invalidation ---
+
+    def invalidate(self, rel_path: str):
+        """Forget cached listings affected by a change at ``rel_path``.
+
+        The parent listing is dropped (entry added, removed or resized) along
+        with ``rel_path`` itself and everything below it, in case it was a
+        directory that was removed or moved. Higher ancestors are dropped only
+        if their listing lacks the child on the way down, i.e. when the change
+        created intermediate directories.
+        """
+        rel_path = _relative_dir_key(rel_path)
+        if rel_path.startswith(os.pardir):
+            return
+        parent = _relative_dir_key(os.path.dirname(rel_path))
+        prefix = rel_path + os.sep
+        with self._lock:
+            self._dirs.pop(parent, None)
+            child = parent
+            while child:
+                ancestor = _relative_dir_key(os.path.dirname(child))
+                cached = self._dirs.get(ancestor)
+                if cached is not None and any(item["id"] == child for item in cached["items"]):
+                    break
+                self._dirs.pop(ancestor, None)
+                child = ancestor
+            if rel_path:
+                for key in [k for k in self._dirs if k == rel_path or k.startswith(prefix)]:
+                    del self._dirs[key]
+            else:
+                self._dirs.clear()
+
+    def record_change(self, op: str, rel_path: str, old_rel_path: Optional[str] = None,
+                      item_type: Optional[str] = None, from_watcher: bool = False) -> int:
+        """Invalidate the affected listings and append the change to the feed"""
+        rel_path = _relative_dir_key(rel_path)
+        if rel_path.startswith(os.pardir):
+            return self.changes.version
+        self.invalidate(rel_path)
+        if old_rel_path is not None:
+            old_rel_path = _relative_dir_key(old_rel_path)
+            self.invalidate(old_rel_path)
+        return self.changes.record(op, rel_path, old_rel_path, item_type, from_watcher=from_watcher)
+
+    def invalidate_listing(self, rel_dir: str):
+        """Forget the cached listing of a single directory"""
+        with self._lock:
+            self._dirs.pop(_relative_dir_key(rel_dir), None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "root": self.root,
+                "cached_directories": len(self._dirs),
+                "watching": self.watching,
+                "version": self.changes.version,
+            }
+
+
+_indexes: "OrderedDict[str, WorkspaceTreeIndex]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_tree_index(directory: str, watch: bool = False) -> WorkspaceTreeIndex:
+    """Index for a directory, built on first use and kept for the most recent workspaces.
+
+    With ``watch`` (the workspace root) the directory is watched for changes
+    and every other index stops watching. Blocking: starting an observer
+    walks the tree.
+    """
+    root = os.path.normpath(os.path.abspath(directory))
+    with _indexes_lock:
+        index = _indexes.get(root)
+        if index is None:
+            index = WorkspaceTreeIndex(root, watch=False)
+            _indexes[root] = index
+            while len(_indexes) > MAX_INDEXED_WORKSPACES:
+                _, evicted = _indexes.popitem(last=False)
+                evicted.close()
+        else:
+            _indexes.move_to_end(root)
+        if watch and not index.watch:
+            for other in _indexes.values():
+                if other is not index:
+                    other.close()
+            index.start_watching()
+        return index
+
+
+def record_workspace_change(directory: str, op: str, rel_path: str,
+                            old_rel_path: Optional[str] = None, item_type: Optional[str] = None) -> int:
+    """Record a change made through the backend under ``directory``; returns the new version"""
+    return get_tree_index(directory).record_change(op, rel_path, old_rel_path, item_type)
+
+
+def close_tree_indexes():
+    with _indexes_lock:
+        for index in _indexes.values():
+            index.close()
+        _indexes.clear()
@@ -213,6 +213,7 @@ const AskAI = ({ messages, setMessages }) => {
 
             // --- START: Prepare file contents for AI ---
             let fileContentsStringForAI = "";
+            let attachedDocIds = [];
             if (selectedFiles.length > 0) {
                 const MAX_FILE_SIZE_FOR_CONTENT_INCLUSION = 80 * 1024; // 80KB limit
 
@@ -229,6 +230,8 @@ const AskAI = ({ messages, setMessages }) => {
                             try {
                                 const formData = new FormData();
                                 formData.append('file', file);
+                                // The text stays on the server; the question refers to it by doc_id
+                                formData.append('include_text', 'false');
                                 const response = await fetch('http://localhost:8000/api/pdf/extract-text', {
                                     method: 'POST',
                                     body: formData,
@@ -238,7 +241,11 @@ const AskAI = ({ messages, setMessages }) => {
                                     throw new Error(errorData.detail || `PDF extraction failed with status ${response.status}`);
                                 }
                                 const result = await response.json();
-                                resolve({ name: file.name, content: result.text || "[No text extracted from PDF]" });
+                                if (result.doc_id) {
+                                    resolve({ name: file.name, docId: result.doc_id });
+                                } else {
+                                    resolve({ name: file.name, content: result.text || "[No text extracted from PDF]" });
+                                }
                             } catch (error) {
                                 console.error(`Error processing PDF ${file.name} via endpoint:`, error);
                                 resolve({ name: file.name, content: `[Error extracting text from PDF: ${file.name} - ${error.message}]` });
@@ -274,7 +281,13 @@ const AskAI = ({ messages, setMessages }) => {
                     const allFileDetails = await Promise.all(fileReadPromises);
                     let tempContentString = "\n\n--- Attached Files ---";
                     allFileDetails.forEach(detail => {
-                        tempContentString += `\n\nFile: ${detail.name}\nContent:\n${detail.content}`;
+                        if (detail.docId) {
+                            // Appended to the question by the backend from the document store
+                            attachedDocIds.push(detail.docId);
+                            tempContentString += `\n\nFile: ${detail.name}\n[Attached as a document below]`;
+                        } else {
+                            tempContentString += `\n\nFile: ${detail.name}\nContent:\n${detail.content}`;
+                        }
                     });
                     tempContentString += "\n--- End of Attached Files ---";
                     fileContentsStringForAI = tempContentString;
@@ -297,6 +310,7 @@ const AskAI = ({ messages, setMessages }) => {
                 method: 'POST', headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({
                     question: questionForAI,
+                    doc_ids: attachedDocIds,
                     session_id: sessionId,
                     conversation_history: formattedHistory
                 }),
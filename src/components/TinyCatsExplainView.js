@@ -7,7 +7,6 @@ import '../css/TinyCatsExplainView.css';
 
 const LOCAL_STORAGE_KEY = 'tinyCatsGenerationHistory';
 const MAX_HISTORY_ITEMS = 20;
-const ASSETS_PATH = 'assets';
 
 const TinyCatsExplainView = ({ isVisible, onClose, theme }) => {
   const [userInput, setUserInput] = useState('');
@@ -71,20 +70,17 @@ const TinyCatsExplainView = ({ isVisible, onClose, theme }) => {
       const timestamp = new Date().toISOString().replace(/[-:T.Z]/g, '');
       const filename = `tinycats_${id}_${timestamp}.png`;
       
-      // Convert base64 data (remove the data:image/png;base64, prefix)
-      const base64Image = base64Data.replace(/^data:image\/\w+;base64,/, '');
-      
+      // Decode the data URL into binary locally and send the raw bytes, instead of
+      // the ~33% larger base64 text inside a JSON body
+      const imageBlob = await (await fetch(base64Data)).blob();
+
       // Send the image data to backend to save
-      const response = await fetch('http://localhost:8000/api/files/upload-base64', {
+      const response = await fetch(`http://localhost:8000/api/files/upload-stream?ephemeral=true&filename=${encodeURIComponent(filename)}`, {
         method: 'POST',
         headers: {
-          'Content-Type': 'application/json',
+          'Content-Type': imageBlob.type || 'image/png',
         },
-        body: JSON.stringify({ 
-          filename: filename, 
-          base64_data: base64Image,
-          directory: ASSETS_PATH
-        }),
+        body: imageBlob,
       });
       
       if (!response.ok) {
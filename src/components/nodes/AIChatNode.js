@@ -82,6 +82,22 @@ const AIChatNode = ({ data, isConnectable, id }) => {
     setIsEditingSystem(false);
   };
 
+  // Stored documents (PDF text, scraped pages) referenced by upstream nodes.
+  // The backend appends their text to the prompt, so it is not sent from here.
+  const collectDocIds = (inputData) => {
+    if (!inputData || typeof inputData !== 'object') return [];
+    const sources = [
+      inputData,
+      inputData.scrapedContent,
+      inputData.webScraper,
+      inputData.document,
+      inputData.combinedData && inputData.combinedData.webData,
+      inputData.combinedData && inputData.combinedData.documentData,
+    ];
+    const docIds = sources.filter(source => source && source.doc_id).map(source => source.doc_id);
+    return [...new Set(docIds)];
+  };
+
   // Helper to create a composite prompt using incoming data
   const createEnhancedPrompt = (basePrompt, inputData) => {
     console.log('Creating enhanced prompt with:', { basePrompt, inputData });
@@ -334,7 +350,8 @@ const AIChatNode = ({ data, isConnectable, id }) => {
         },
         body: JSON.stringify({
           system_prompt: systemPrompt,
-          user_prompt: currentPrompt
+          user_prompt: currentPrompt,
+          doc_ids: collectDocIds(inputData)
         })
       });
 
@@ -5,6 +5,7 @@ import { Handle, Position } from 'reactflow';
 import '../../css/Nodes.css';
 import { Bot, Copy, Download, CheckCircle, AlertCircle, RefreshCw as ProcessingIcon, Code, FileText, File } from 'lucide-react';
 import { useTheme } from '../../ThemeContext'; // Import useTheme hook
+import { resolveDocumentText } from '../../utils/flowUtils';
 
 const AIOutputNode = ({ data, isConnectable, id }) => {
   const { theme } = useTheme(); // Access the current theme
@@ -118,6 +119,17 @@ const AIOutputNode = ({ data, isConnectable, id }) => {
       return null;
     }
     
+    // Handle PDF text extraction data
+    if (inputData.text && inputData.filename) {
+      setContentType('pdf');
+      setSourceInfo({
+        type: 'PDF',
+        filename: inputData.filename,
+        filesize: inputData.filesize
+      });
+      return inputData.text;
+    }
+    
     // Handle web scraping data
     if (inputData.title || inputData.text || inputData.main_content) {
       setContentType('web');
@@ -130,17 +142,6 @@ const AIOutputNode = ({ data, isConnectable, id }) => {
       return inputData.main_content || inputData.text;
     }
     
-    // Handle PDF text extraction data
-    if (inputData.text && inputData.filename) {
-      setContentType('pdf');
-      setSourceInfo({
-        type: 'PDF',
-        filename: inputData.filename,
-        filesize: inputData.filesize
-      });
-      return inputData.text;
-    }
-    
     // Handle AI chat response data
     if (inputData.response) {
       setContentType('ai');
@@ -312,8 +313,11 @@ const AIOutputNode = ({ data, isConnectable, id }) => {
         setIsProcessing(true);
         setNodeState('processing');
         
+        // PDF and scraper nodes pass their text by doc_id; fetch it for display
+        const resolvedData = await resolveDocumentText(inputData);
+        
         // Process the input data to extract displayable content
-        const processedText = processIncomingData(inputData);
+        const processedText = processIncomingData(resolvedData);
         
         // Small delay to show processing state
         await new Promise(resolve => setTimeout(resolve, 200)); 
@@ -8,6 +8,8 @@ const PDFNode = ({ data, isConnectable, id }) => {
   const [preview, setPreview] = useState(data.preview || null);
   const [isUploading, setIsUploading] = useState(false);
   const [extractedText, setExtractedText] = useState(data.extractedText || null);
+  // Handle to the text kept by the backend; downstream nodes send this instead of the text
+  const [docId, setDocId] = useState(data.docId || null);
   const [extractionError, setExtractionError] = useState(data.extractionError || null);
   const fileInputRef = useRef(null);
   
@@ -20,17 +22,18 @@ const PDFNode = ({ data, isConnectable, id }) => {
     nodeIdRef.current = id;
   }, [id]);
   
-  // Update data when file, preview, extractedText, or error changes
+  // Update data when file, preview, extractedText, docId, or error changes
   useEffect(() => {
     if (data.onChange) {
       data.onChange({ 
         file, 
         preview, 
         extractedText, 
+        docId,
         extractionError 
       });
     }
-  }, [file, preview, extractedText, extractionError, data]);
+  }, [file, preview, extractedText, docId, extractionError, data]);
   
   // Handle flow execution state changes
   useEffect(() => {
@@ -59,18 +62,20 @@ const PDFNode = ({ data, isConnectable, id }) => {
       setNodeState('processing');
       
       // If we already have extracted text for this file, use it
-      if (extractedText && !extractionError) {
+      if ((docId || extractedText) && !extractionError) {
         return { 
           success: true, 
-          text: extractedText,
+          ...(docId ? { doc_id: docId } : { text: extractedText }),
           filename: fileToProcess.name,
           filesize: fileToProcess.size
         };
       }
       
-      // Otherwise, extract the text
+      // Otherwise, extract the text. It stays on the server and is passed on by doc_id;
+      // the response only carries the text if it could not be stored.
       const formData = new FormData();
       formData.append('file', fileToProcess);
+      formData.append('include_text', 'false');
 
       const response = await fetch('http://localhost:8000/api/pdf/extract-text', {
         method: 'POST',
@@ -83,12 +88,13 @@ const PDFNode = ({ data, isConnectable, id }) => {
       }
 
       const result = await response.json();
-      setExtractedText(result.text);
+      setDocId(result.doc_id || null);
+      setExtractedText(result.text || null);
       setExtractionError(null);
       
       return {
         success: true,
-        text: result.text,
+        ...(result.doc_id ? { doc_id: result.doc_id } : { text: result.text }),
         filename: fileToProcess.name,
         filesize: fileToProcess.size,
         contentType: fileToProcess.type
@@ -114,6 +120,7 @@ const PDFNode = ({ data, isConnectable, id }) => {
     setFile(null);
     setPreview(null);
     setExtractedText(null);
+    setDocId(null);
     setExtractionError(null);
     
     const fileType = selectedFile.type;
@@ -159,6 +166,7 @@ const PDFNode = ({ data, isConnectable, id }) => {
       setFile(selectedFile);
       setPreview(null); // Ensure preview is null
       setExtractedText(null); // Ensure no old extracted text remains
+      setDocId(null);
       setExtractionError(null); // Ensure no old error remains
       setIsUploading(false);
     }
@@ -208,8 +216,8 @@ const PDFNode = ({ data, isConnectable, id }) => {
       
       return unregister; // Clean up registration when node unmounts
     }
-    // Re-register if registerNodeForFlow changes
-  }, [data.registerNodeForFlow, file]);
+    // Re-register if registerNodeForFlow, the file or its doc_id changes
+  }, [data.registerNodeForFlow, file, docId]);
   
   const handleUploadClick = () => {
     fileInputRef.current.click();
@@ -219,6 +227,7 @@ const PDFNode = ({ data, isConnectable, id }) => {
     setFile(null);
     setPreview(null);
     setExtractedText(null);
+    setDocId(null);
     setExtractionError(null);
   };
   
@@ -313,8 +322,8 @@ const PDFNode = ({ data, isConnectable, id }) => {
                   <div className="extraction-status">
                     {isUploading && <span>Extracting text...</span>}
                     {extractionError && <span className="error-text">Error: {extractionError}</span>}
-                    {extractedText && !isUploading && !extractionError && <span className="success-text">Text extracted</span>}
-                    {!extractedText && !isUploading && !extractionError && <span>Ready to extract text (if re-upload)</span>}
+                    {(docId || extractedText) && !isUploading && !extractionError && <span className="success-text">Text extracted</span>}
+                    {!docId && !extractedText && !isUploading && !extractionError && <span>Ready to extract text (if re-upload)</span>}
                   </div>
                 )}
               </div>
@@ -133,7 +133,8 @@ const WaitNode = ({ data, isConnectable, id }) => {
                 title: data.title,
                 url: data.url,
                 content: data.main_content || data.text || (data.scrapedContent ? data.scrapedContent.main_content : null),
-                description: data.description || (data.scrapedContent ? data.scrapedContent.description : null)
+                description: data.description || (data.scrapedContent ? data.scrapedContent.description : null),
+                doc_id: data.doc_id || (data.scrapedContent ? data.scrapedContent.doc_id : null)
               };
             }
             
@@ -141,6 +142,7 @@ const WaitNode = ({ data, isConnectable, id }) => {
             if (sourceId.includes('pdf') || (data && (data.type === 'document' || data.contentType === 'pdf' || data.nodeType === 'pdfNode'))) {
               aiReadyData.document = {
                 text: data.text,
+                doc_id: data.doc_id,
                 filename: data.filename,
                 filesize: data.filesize,
                 contentType: data.contentType || 'pdf'
@@ -294,7 +296,8 @@ const WaitNode = ({ data, isConnectable, id }) => {
             content: sourceData.main_content || sourceData.text || 
                     (sourceData.scrapedContent ? sourceData.scrapedContent.main_content : null),
             description: sourceData.description || 
-                        (sourceData.scrapedContent ? sourceData.scrapedContent.description : null)
+                        (sourceData.scrapedContent ? sourceData.scrapedContent.description : null),
+            doc_id: sourceData.doc_id || (sourceData.scrapedContent ? sourceData.scrapedContent.doc_id : null)
           };
         }
         
@@ -302,6 +305,7 @@ const WaitNode = ({ data, isConnectable, id }) => {
         if (sourceId.includes('pdf') || (sourceData && (sourceData.type === 'document' || sourceData.contentType === 'pdf'))) {
           combinedData.documentData = {
             text: sourceData.text,
+            doc_id: sourceData.doc_id,
             filename: sourceData.filename,
             filesize: sourceData.filesize,
             type: 'document'
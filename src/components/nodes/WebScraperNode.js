@@ -74,7 +74,8 @@ const WebScraperNode = ({ data, isConnectable, id }) => {
       const response = await fetch('http://localhost:8000/api/scrape', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ url })
+        // The page text stays on the server; downstream nodes send its doc_id instead
+        body: JSON.stringify({ url, include_text: false })
       });
       
       if (!response.ok) {
@@ -115,4 +115,65 @@ export const getConnectedNodes = (nodeId, edges, direction = 'both') => {
   }
   
   return Array.from(connectedNodes);
-}; 
\ No newline at end of file
+}; 
+const fetchDocumentText = async (docId) => {
+  const response = await fetch(`http://localhost:8000/api/docs/${encodeURIComponent(docId)}`);
+  if (!response.ok) {
+    throw new Error(`Failed to load document ${docId}: HTTP ${response.status}`);
+  }
+  const stored = await response.json();
+  return stored.text;
+};
+
+/**
+ * Fill in the text of documents that upstream nodes pass by doc_id only
+ * (extracted PDF text, scraped pages), for nodes that display it.
+ * Covers PDF and web scraper output, directly or as combined by a WaitNode
+ * (`webScraper`, `document` and `combined`/`combinedData`).
+ * @param {Object} inputData - Data received from the previous node
+ * @returns {Promise<Object>} - A copy with `text` (documents), `main_content`
+ *   (scraped pages) or `content` (combined web data) filled in where missing
+ */
+export const resolveDocumentText = async (inputData) => {
+  if (!inputData || typeof inputData !== 'object') return inputData;
+
+  const requests = new Map(); // doc_id -> Promise of its text (or null)
+  const textFor = (docId) => {
+    if (!requests.has(docId)) {
+      requests.set(docId, fetchDocumentText(docId).catch(error => {
+        console.error(error);
+        return null;
+      }));
+    }
+    return requests.get(docId);
+  };
+  const fill = async (source, field) => {
+    if (!source || !source.doc_id || source.text || source.main_content || source.content) return source;
+    const text = await textFor(source.doc_id);
+    return text ? { ...source, [field]: text } : source;
+  };
+  const isDocument = (source) => !!(source.filename || source.type === 'document' || source.contentType === 'pdf');
+
+  // A WaitNode's combined view of its inputs, under either of the names it is passed as
+  const combinedKey = ['combinedData', 'combined'].find(key => inputData[key] && typeof inputData[key] === 'object');
+  const combinedData = combinedKey ? inputData[combinedKey] : null;
+  const [top, scrapedContent, webScraper, doc, webData, documentData] = await Promise.all([
+    fill(inputData, isDocument(inputData) ? 'text' : 'main_content'),
+    fill(inputData.scrapedContent, 'main_content'),
+    fill(inputData.webScraper, 'content'),
+    fill(inputData.document, 'text'),
+    fill(combinedData && combinedData.webData, 'content'),
+    fill(combinedData && combinedData.documentData, 'text'),
+  ]);
+
+  const result = { ...top };
+  if (scrapedContent) result.scrapedContent = scrapedContent;
+  if (webScraper) result.webScraper = webScraper;
+  if (doc) result.document = doc;
+  if (webData || documentData) {
+    result[combinedKey] = { ...combinedData };
+    if (webData) result[combinedKey].webData = webData;
+    if (documentData) result[combinedKey].documentData = documentData;
+  }
+  return result;
+};